@@ -0,0 +1,280 @@
+# Shared HTTP client for the oracle-service backend (transactions, sanctions, mixers, darknet).
+# Keeps keep-alive connections pooled across tools and requests, applies the configured timeouts,
+# retries transient failures with exponential backoff and limits the number of in-flight calls.
+# Large array responses can be streamed: stream_items / astream_items parse the body incrementally
+# and yield its array items as they arrive, without holding the whole document.
+
+import asyncio
+import codecs
+import json
+import re
+import threading
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core import metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session = None
+_session_lock = threading.Lock()
+_semaphore = None
+
+# One async client per event loop, httpx clients cannot be shared between loops. It is closed when
+# the loop shuts down.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _url(path: str) -> str:
+    return f"{settings.AML_BACKEND_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def _endpoint(path: str) -> str:
+    # Metric label: the first path segment ("transactions", "sanctions", ...) keeps the cardinality bounded
+    return path.strip("/").split("/", 1)[0]
+
+
+def _record_response(path: str, span, response):
+    span.set("http.status_code", response.status_code)
+    metrics.inc("aml_backend_response_bytes_total", {"endpoint": _endpoint(path)}, len(response.content))
+
+
+def _timeout():
+    return (settings.AML_BACKEND_CONNECT_TIMEOUT, settings.AML_BACKEND_READ_TIMEOUT)
+
+
+def get_session() -> requests.Session:
+    global _session, _semaphore
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=settings.AML_BACKEND_RETRIES,
+                    backoff_factor=settings.AML_BACKEND_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=frozenset(["GET"]),
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=settings.AML_BACKEND_POOL_SIZE,
+                    pool_maxsize=settings.AML_BACKEND_POOL_SIZE,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _semaphore = threading.BoundedSemaphore(settings.AML_BACKEND_MAX_CONCURRENCY)
+                _session = session
+    return _session
+
+
+def get(path: str, params: dict = None, headers: dict = None) -> requests.Response:
+    """
+    GETs a backend path over the pooled session and returns the raw response (after raise_for_status).
+    """
+    session = get_session()
+    with _semaphore, metrics.span("backend GET", "aml_backend_request_duration_seconds", endpoint=_endpoint(path)) as span:
+        response = session.get(_url(path), params=params, headers=headers, timeout=_timeout())
+        _record_response(path, span, response)
+        response.raise_for_status()
+        return response
+
+
+def get_json(path: str, params: dict = None) -> dict:
+    """
+    GETs a backend path (e.g. "/transactions/<address>") over the pooled session and returns the JSON body.
+    """
+    return get(path, params).json()
+
+
+STREAM_READ_SIZE = 65536
+
+
+_DELIMITERS = (" ", "\t", "\r", "\n", ",", "]")
+
+
+class JsonArrayReader:
+    """
+    Incremental parser of the items of one top-level array ("key": [...]) of a JSON object fed as text.
+    The text before the array is skipped, so only the array items are ever decoded.
+    """
+
+    def __init__(self, key: str):
+        self._start = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, text: str) -> list:
+        self._buffer += text
+        if not self._in_array:
+            match = self._start.search(self._buffer)
+            if match is None:
+                # Keep a tail long enough to hold a key split across reads
+                self._buffer = self._buffer[-256:]
+                return []
+            self._buffer = self._buffer[match.end():]
+            self._in_array = True
+
+        items = []
+        buffer = self._buffer
+        position = 0
+        while not self.done:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                self.done = True
+                break
+            try:
+                item, end = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Incomplete item, wait for more text
+                break
+            if isinstance(item, (int, float)) and not isinstance(item, bool) and buffer[end:end + 1] not in _DELIMITERS:
+                # A number is only complete once what follows it arrived ("-0" may still become "-0.5")
+                break
+            items.append(item)
+            position = end
+        self._buffer = buffer[position:]
+        return items
+
+    def close(self):
+        if not self.done:
+            raise ValueError("Truncated or malformed JSON response: the array was not closed.")
+
+
+def stream_items(path: str, key: str, params: dict = None):
+    """
+    GETs a backend path and yields the items of its top-level `key` array as they arrive. Connection
+    and status errors are retried like get(); a response that breaks off mid-stream raises.
+    """
+    session = get_session()
+    with metrics.span("backend GET", "aml_backend_request_duration_seconds", endpoint=_endpoint(path)) as span:
+        # A concurrency slot is only held while reading from the network, not while the consumer works
+        # on the items (which may call the backend itself) or leaves the generator suspended
+        with _semaphore:
+            response = session.get(_url(path), params=params, timeout=_timeout(), stream=True)
+        received = 0
+        try:
+            span.set("http.status_code", response.status_code)
+            response.raise_for_status()
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            reader = JsonArrayReader(key)
+            reads = response.iter_content(STREAM_READ_SIZE)
+            while True:
+                with _semaphore:
+                    data = next(reads, None)
+                if data is None:
+                    break
+                received += len(data)
+                yield from reader.feed(decoder.decode(data))
+                if reader.done:
+                    return
+            reader.close()
+        finally:
+            response.close()
+            metrics.inc("aml_backend_response_bytes_total", {"endpoint": _endpoint(path)}, received)
+
+
+class AsyncBackendClient:
+    def __init__(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.AML_BACKEND_READ_TIMEOUT, connect=settings.AML_BACKEND_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.AML_BACKEND_POOL_SIZE,
+                max_keepalive_connections=settings.AML_BACKEND_POOL_SIZE,
+            ),
+        )
+        self.semaphore = asyncio.Semaphore(settings.AML_BACKEND_MAX_CONCURRENCY)
+
+    async def get_json(self, path: str, params: dict = None) -> dict:
+        attempt = 0
+        while True:
+            try:
+                async with self.semaphore:
+                    with metrics.span("backend GET", "aml_backend_request_duration_seconds", endpoint=_endpoint(path)) as span:
+                        response = await self.client.get(_url(path), params=params)
+                        _record_response(path, span, response)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.json()
+                if attempt >= settings.AML_BACKEND_RETRIES:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt >= settings.AML_BACKEND_RETRIES:
+                    raise
+            await asyncio.sleep(settings.AML_BACKEND_BACKOFF * (2 ** attempt))
+            attempt += 1
+
+    async def stream_items(self, path: str, key: str, params: dict = None):
+        # Not retried: items may already have been consumed when the stream fails. Like stream_items, the
+        # semaphore is only held around the network reads.
+        with metrics.span("backend GET", "aml_backend_request_duration_seconds", endpoint=_endpoint(path)) as span:
+            received = 0
+            request = self.client.build_request("GET", _url(path), params=params)
+            async with self.semaphore:
+                response = await self.client.send(request, stream=True)
+            try:
+                span.set("http.status_code", response.status_code)
+                response.raise_for_status()
+                decoder = codecs.getincrementaldecoder("utf-8")()
+                reader = JsonArrayReader(key)
+                reads = response.aiter_bytes(STREAM_READ_SIZE)
+                while True:
+                    async with self.semaphore:
+                        data = await anext(reads, None)
+                    if data is None:
+                        break
+                    received += len(data)
+                    for item in reader.feed(decoder.decode(data)):
+                        yield item
+                    if reader.done:
+                        return
+                reader.close()
+            finally:
+                await response.aclose()
+                metrics.inc("aml_backend_response_bytes_total", {"endpoint": _endpoint(path)}, received)
+
+
+async def _close_on_shutdown(client: httpx.AsyncClient):
+    # Registered with the loop as an async generator: loop.shutdown_asyncgens() (asyncio.run calls it
+    # before closing the loop) finalizes it, which closes the client's pooled connections
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+def get_async_client() -> AsyncBackendClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = _async_clients[loop] = AsyncBackendClient()
+        client.closer = _close_on_shutdown(client.client)
+        # Runs it to its yield right away, nothing in it awaits
+        try:
+            client.closer.asend(None).send(None)
+        except StopIteration:
+            pass
+    return client
+
+
+async def aget_json(path: str, params: dict = None) -> dict:
+    """
+    Async variant of get_json, using a pooled httpx client bound to the running event loop.
+    """
+    return await get_async_client().get_json(path, params)
+
+
+def astream_items(path: str, key: str, params: dict = None):
+    """
+    Async variant of stream_items (an async generator), using the event loop's pooled httpx client.
+    """
+    return get_async_client().stream_items(path, key, params)
@@ -0,0 +1,203 @@
+# Compact, incrementally built transaction graph shared by the multi-hop checks.
+#
+# Nodes are the process-wide address IDs of core/agents/transactions.py. Edges (sender, receiver,
+# timestamp, amount) are stored once as parallel NumPy columns and indexed twice in CSR form: a
+# forward index grouped by sender and a reverse index grouped by receiver, each time-ordered within a
+# row. That is about 48 bytes per edge. Batches are appended as addresses are loaded; appended edges
+# sit in a growable buffer, indexed by sender and receiver with a dict of positions, and are merged
+# into the CSR arrays once it outgrows them, so a trace that loads addresses one by one re-sorts its
+# edges O(log E) times only and a lookup never scans the buffer. Neighbour and k-hop queries read the
+# rows of the queried addresses only. Loaded addresses are flagged in a boolean mask over the (dense)
+# address IDs, so appending a chunk costs O(chunk) whatever the number of loaded addresses.
+
+import numpy as np
+
+from core.agents.transactions import TransactionBatch
+
+# Pending edges are merged into the CSR index once there are more of them than this or than indexed edges
+COMPACT_MIN_EDGES = 1024
+
+_DTYPES = {"senders": np.int64, "receivers": np.int64, "timestamps": np.int64, "amounts": np.float64}
+
+
+def _empty(size: int = 0) -> dict:
+    return {column: np.empty(size, dtype=dtype) for column, dtype in _DTYPES.items()}
+
+
+class TransactionGraph:
+    """
+    Directed transaction graph over address IDs. An address is "loaded" once its whole batch of
+    transactions was added, after which all of its edges (both directions) are in the graph.
+    """
+
+    def __init__(self):
+        self._loaded = set()
+        self._loaded_mask = np.zeros(64, dtype=bool)
+        self._edges = _empty()
+        self._pending = _empty(64)
+        self._pending_len = 0
+        # Positions of the pending edges per sender and per receiver, as lists of arrays
+        self._pending_rows = {"senders": {}, "receivers": {}}
+        # Sorted node IDs of the indexed edges, CSR row pointers and time-ordered edge positions
+        self._nodes = np.empty(0, dtype=np.int64)
+        self._forward = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self._reverse = (np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64))
+
+    def __contains__(self, address_id: int) -> bool:
+        return address_id in self._loaded
+
+    def __len__(self) -> int:
+        return len(self._loaded)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._edges["senders"]) + self._pending_len
+
+    def add(self, address_id: int, batch: TransactionBatch) -> np.ndarray:
+        """
+        Loads the transactions of an address and returns the positions (in the batch) of those that
+        were new to the graph. Transactions with an already loaded counterparty were added with it.
+        """
+        new = self.append(address_id, batch)
+        self.mark_loaded(address_id)
+        return new
+
+    def append(self, address_id: int, batch: TransactionBatch) -> np.ndarray:
+        """
+        Like add() for one chunk of the address's transactions; call mark_loaded() after the last one.
+        """
+        if address_id in self._loaded:
+            return np.empty(0, dtype=np.int64)
+        counterparties = batch.counterparties(address_id)
+        known = counterparties < len(self._loaded_mask)
+        loaded = np.zeros(len(counterparties), dtype=bool)
+        loaded[known] = self._loaded_mask[counterparties[known]]
+        new = np.flatnonzero(~loaded | (counterparties == address_id))
+        if len(new):
+            self._append(batch.senders[new], batch.receivers[new], batch.timestamps[new], batch.amounts[new])
+        return new
+
+    def mark_loaded(self, address_id: int):
+        self._loaded.add(address_id)
+        if address_id >= len(self._loaded_mask):
+            grown = np.zeros(max(address_id + 1, 2 * len(self._loaded_mask)), dtype=bool)
+            grown[:len(self._loaded_mask)] = self._loaded_mask
+            self._loaded_mask = grown
+        self._loaded_mask[address_id] = True
+
+    def _append(self, *columns):
+        start = self._pending_len
+        size = start + len(columns[0])
+        capacity = len(self._pending["senders"])
+        if size > capacity:
+            grown = _empty(max(size, 2 * capacity))
+            for column in _DTYPES:
+                grown[column][:self._pending_len] = self._pending[column][:self._pending_len]
+            self._pending = grown
+        for column, values in zip(_DTYPES, columns):
+            self._pending[column][start:size] = values
+        self._pending_len = size
+        for key, rows in self._pending_rows.items():
+            order = np.argsort(self._pending[key][start:size], kind="stable")
+            nodes, first = np.unique(self._pending[key][start:size][order], return_index=True)
+            for node, positions in zip(nodes.tolist(), np.split(order + start, first[1:])):
+                rows.setdefault(node, []).append(positions)
+        if size > max(COMPACT_MIN_EDGES, len(self._edges["senders"])):
+            self.compact()
+
+    def compact(self):
+        """
+        Merges the pending edges into the CSR index.
+        """
+        if not self._pending_len:
+            return
+        self._edges = {
+            column: np.concatenate([self._edges[column], self._pending[column][:self._pending_len]])
+            for column in _DTYPES
+        }
+        self._pending_len = 0
+        self._pending_rows = {"senders": {}, "receivers": {}}
+        senders, receivers, timestamps = self._edges["senders"], self._edges["receivers"], self._edges["timestamps"]
+        self._nodes = np.unique(np.concatenate([senders, receivers]))
+        self._forward = self._csr(np.searchsorted(self._nodes, senders), timestamps)
+        self._reverse = self._csr(np.searchsorted(self._nodes, receivers), timestamps)
+
+    def _csr(self, rows: np.ndarray, timestamps: np.ndarray):
+        order = np.lexsort((timestamps, rows))
+        pointers = np.zeros(len(self._nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(self._nodes)), out=pointers[1:])
+        return pointers, order
+
+    def _row(self, address_id: int, index) -> np.ndarray:
+        position = np.searchsorted(self._nodes, address_id)
+        if position == len(self._nodes) or self._nodes[position] != address_id:
+            return np.empty(0, dtype=np.int64)
+        pointers, order = index
+        return order[pointers[position]:pointers[position + 1]]
+
+    def _select(self, key: str, address_id: int, index, other: str, columns=("timestamps", "amounts")):
+        # (counterparties, *columns) of the indexed and pending edges whose `key` is the address
+        rows = self._row(address_id, index)
+        edges = self._edges
+        selected = [tuple(edges[column][rows] for column in (other, *columns))]
+        parts = self._pending_rows[key].get(address_id)
+        if parts:
+            positions = np.concatenate(parts) if len(parts) > 1 else parts[0]
+            pending = self._pending
+            selected.append(tuple(pending[column][positions] for column in (other, *columns)))
+        return selected
+
+    @staticmethod
+    def _merge(selected: list):
+        if len(selected) == 1:
+            return selected[0]
+        counterparties, timestamps, amounts = (np.concatenate(parts) for parts in zip(*selected))
+        order = np.argsort(timestamps, kind="stable")
+        return counterparties[order], timestamps[order], amounts[order]
+
+    def out_edges(self, address_id: int):
+        """
+        (receivers, timestamps, amounts) of the address's outgoing transactions, oldest first.
+        """
+        return self._merge(self._select("senders", address_id, self._forward, "receivers"))
+
+    def in_edges(self, address_id: int):
+        """
+        (senders, timestamps, amounts) of the address's incoming transactions, oldest first.
+        """
+        return self._merge(self._select("receivers", address_id, self._reverse, "senders"))
+
+    def edges(self, address_id: int):
+        """
+        (counterparties, timestamps, amounts) of all transactions of the address in either direction,
+        oldest first. A transaction to itself is listed once.
+        """
+        incoming = []
+        for senders, timestamps, amounts in self._select("receivers", address_id, self._reverse, "senders"):
+            keep = senders != address_id
+            incoming.append((senders[keep], timestamps[keep], amounts[keep]))
+        return self._merge(self._select("senders", address_id, self._forward, "receivers") + incoming)
+
+    def neighbors(self, address_ids) -> np.ndarray:
+        """
+        Counterparties of every edge touching the given addresses, once per edge and side.
+        """
+        parts = [np.empty(0, dtype=np.int64)]
+        for address_id in np.unique(np.asarray(address_ids, dtype=np.int64)).tolist():
+            for key, index, other in (("senders", self._forward, "receivers"), ("receivers", self._reverse, "senders")):
+                parts.extend(counterparties for counterparties, in self._select(key, address_id, index, other, columns=()))
+        return np.concatenate(parts)
+
+    def k_hop(self, address_id: int, k: int) -> np.ndarray:
+        """
+        IDs of the addresses reachable from the address in at most k hops (either direction), in
+        the graph as loaded so far.
+        """
+        reached = np.array([address_id], dtype=np.int64)
+        frontier = reached
+        for _ in range(k):
+            frontier = np.setdiff1d(self.neighbors(frontier), reached)
+            if not len(frontier):
+                break
+            reached = np.union1d(reached, frontier)
+        return np.setdiff1d(reached, [address_id])
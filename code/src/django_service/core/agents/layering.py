@@ -0,0 +1,188 @@
+# Iterative, bounded cycle-finding engine used by check_layering.
+#
+# The TransactionBatch of every visited address is loaded once into a TransactionGraph
+# (core/agents/graph_index.py) whose time-ordered (counterparty ID, epoch seconds) edges are read by
+# array slicing. Cycles through the origin are then searched over address IDs with an explicit-stack
+# DFS that mutates a single path / visited set instead of copying them at every edge. Walks are time-respecting (each hop happens no earlier than the previous one), can be
+# pruned to the rapid window, and stop once the node or edge budget is spent.
+
+import bisect
+import logging
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from core.agents.graph_index import TransactionGraph
+from core.agents.transactions import TransactionBatch, addresses
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LayeringConfig:
+    max_hops: int = 3
+    # Time (in seconds) considered a "rapid" transfer
+    rapid_window: int = 300
+    # Only follow hops that keep the cycle within rapid_window
+    prune_to_rapid_window: bool = False
+    time_respecting: bool = True
+    # Addresses whose transactions may be fetched / edges that may be examined per trace
+    max_nodes: int = 500
+    max_edges: int = 20000
+
+    @classmethod
+    def from_settings(cls, max_hops: int = 3, rapid_window: int = 300):
+        return cls(
+            max_hops=max_hops,
+            rapid_window=rapid_window,
+            prune_to_rapid_window=settings.AML_LAYERING_PRUNE_TO_RAPID_WINDOW,
+            time_respecting=settings.AML_LAYERING_TIME_RESPECTING,
+            max_nodes=settings.AML_LAYERING_MAX_NODES,
+            max_edges=settings.AML_LAYERING_MAX_EDGES,
+        )
+
+
+@dataclass
+class Cycle:
+    path: tuple
+    duration: float
+    rapid: bool
+
+    @property
+    def evidence(self) -> str:
+        if self.rapid:
+            return f"Rapid layering cycle: {' -> '.join(self.path)} in {int(self.duration)}s"
+        return f"Cyclic transfer: {' -> '.join(self.path)} over {int(self.duration)}s"
+
+
+@dataclass
+class LayeringResult:
+    cycles: list = field(default_factory=list)
+    nodes_expanded: int = 0
+    edges_examined: int = 0
+    # True when the node or edge budget stopped the search early
+    truncated: bool = False
+
+    @property
+    def evidence(self) -> list:
+        return [cycle.evidence for cycle in self.cycles]
+
+    @property
+    def score(self) -> float:
+        score = sum(0.8 if cycle.rapid else 0.3 for cycle in self.cycles)
+        return min(score, 1.0)
+
+    @property
+    def decision(self) -> bool:
+        return any(cycle.rapid for cycle in self.cycles) or self.score >= 0.8
+
+
+class AdjacencyIndex:
+    """
+    Per-trace view of a TransactionGraph: address ID -> (counterparty IDs, timestamps) sorted by
+    timestamp. `fetch` returns the TransactionBatch of an address and is called for addresses the
+    graph has not loaded yet; when it returns None the address has no edges for this trace and is
+    left unloaded.
+    """
+
+    def __init__(self, fetch, graph: TransactionGraph = None):
+        self.fetch = fetch
+        self.graph = graph if graph is not None else TransactionGraph()
+        self._edges = {}
+
+    def __contains__(self, address_id: int) -> bool:
+        return address_id in self._edges
+
+    def __len__(self) -> int:
+        return len(self._edges)
+
+    def edges(self, address_id: int):
+        if address_id not in self._edges:
+            if address_id not in self.graph:
+                address = addresses.name(address_id)
+                try:
+                    transactions = self.fetch(address)
+                except Exception as e:
+                    logger.warning("API error for %s: %s", address, e)
+                    transactions = TransactionBatch.empty()
+                if transactions is None:
+                    self._edges[address_id] = ([], [])
+                    return self._edges[address_id]
+                self.graph.add(address_id, transactions)
+            counterparties, timestamps, _ = self.graph.edges(address_id)
+            self._edges[address_id] = (counterparties.tolist(), timestamps.tolist())
+        return self._edges[address_id]
+
+
+def _canonical(path: list) -> tuple:
+    # Rotate so the smallest address ID is first (the closing origin is dropped before rotating)
+    nodes = path[:-1]
+    min_idx = min(range(len(nodes)), key=lambda i: nodes[i])
+    return tuple(nodes[min_idx:] + nodes[:min_idx])
+
+
+def find_cycles(origin: str, index: AdjacencyIndex, config: LayeringConfig) -> LayeringResult:
+    """
+    Finds the distinct cycles of more than two hops that leave and return to `origin` within
+    config.max_hops intermediate addresses.
+    """
+    result = LayeringResult()
+    recorded = set()
+    origin = addresses.intern(origin)
+    path = [origin]
+    visited = {origin}
+    # Frame: [address, counterparties, timestamps, next edge position, cycle start ts, last hop ts]
+    counterparties, timestamps = index.edges(origin)
+    stack = [[origin, counterparties, timestamps, 0, None, None]]
+    result.nodes_expanded = 1
+
+    while stack:
+        frame = stack[-1]
+        address, counterparties, timestamps, position, start_ts, last_ts = frame
+        if position >= len(counterparties):
+            stack.pop()
+            path.pop()
+            if address != origin:
+                visited.discard(address)
+            continue
+        frame[3] = position + 1
+
+        result.edges_examined += 1
+        if result.edges_examined > config.max_edges:
+            result.truncated = True
+            break
+
+        counterparty, ts = counterparties[position], timestamps[position]
+        first_ts = ts if start_ts is None else start_ts
+        if config.prune_to_rapid_window and ts - first_ts > config.rapid_window:
+            # Edges are time sorted, every later edge is out of the window as well
+            frame[3] = len(counterparties)
+            continue
+        if counterparty == address:
+            continue
+
+        if counterparty == origin:
+            # Only count cycles that are longer than 2 (not direct send/receive)
+            if len(path) >= 3:
+                cycle_path = path + [origin]
+                canonical = _canonical(cycle_path)
+                if canonical not in recorded:
+                    recorded.add(canonical)
+                    duration = max(0.0, ts - first_ts)
+                    result.cycles.append(Cycle(tuple(addresses.names(cycle_path)), duration, duration <= config.rapid_window))
+            continue
+
+        if counterparty in visited or len(path) > config.max_hops:
+            continue
+        if counterparty not in index and len(index) >= config.max_nodes:
+            result.truncated = True
+            continue
+
+        next_counterparties, next_timestamps = index.edges(counterparty)
+        result.nodes_expanded += 1
+        start = bisect.bisect_left(next_timestamps, ts) if config.time_respecting else 0
+        path.append(counterparty)
+        visited.add(counterparty)
+        stack.append([counterparty, next_counterparties, next_timestamps, start, first_ts, ts])
+
+    return result
@@ -1,6 +1,11 @@
+import operator
+from typing import Annotated, List, Union
+from typing_extensions import NotRequired
 from langgraph.prebuilt.chat_agent_executor import AgentState
 
 class AmlState(AgentState):
     wallet_address: str
     max_hops: int
-    risk_score: int
\ No newline at end of file
+    risk_score: int
+    # Summary strings / result objects appended by the checks of the fast-path pipeline
+    analysis_results: NotRequired[Annotated[List[Union[str, dict]], operator.add]]
@@ -0,0 +1,181 @@
+# Scoring layer in front of the reasoning model.
+#
+# The analysis results are normalized into a set of finding labels ("direct:sanctioned",
+# "exposure:mixer:hop1", "structuring", ...). The configurable rule/weight scorer answers whenever
+# every finding is recognised; computing it is cheaper than any lookup, so it is never cached. Only
+# findings it cannot read (e.g. free text written by the ReAct agent) are sent to the LLM, and those
+# scores are cached with the label set as content address: in an in-process LRU and then in the
+# RiskScoreCache table. The key also covers the scoring settings and the model, so changing either
+# never serves scores computed before.
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from core import metrics
+from core.models import RiskScoreCache
+
+FINDING_PATTERNS = (
+    (re.compile(r"^Wallet .+ is directly flagged as (\w+)\.$"), lambda m: f"direct:{m[1].lower()}"),
+    (re.compile(r"^(\w+) entity transaction\(s\) detected for address at hop (\d+)\.$"), lambda m: f"exposure:{m[1].lower()}:hop{m[2]}"),
+    (re.compile(r"^Flagged transactions detected for wallet .+\.$"), lambda m: "exposure"),
+    (re.compile(r"^No sanctioned, mixer, or darknet entity transactions detected\.$"), lambda m: "sanctions:clear"),
+    (re.compile(r"^Structuring behaviour detected"), lambda m: "structuring"),
+    (re.compile(r"^No structuring behaviour detected\.$"), lambda m: "structuring:clear"),
+    (re.compile(r"^Layering analysis: (\d+) cycles detected$"), lambda m: "layering:clear" if m[1] == "0" else "layering:cycles"),
+    (re.compile(r"^Rapid layering cycle"), lambda m: "layering:rapid"),
+    (re.compile(r"^Cyclic transfer"), lambda m: "layering:cyclic"),
+)
+
+EXPOSURE_LABEL = re.compile(r"^exposure:(\w+):hop(\d+)$")
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _messages(analysis_results: list) -> list:
+    messages = []
+    for item in analysis_results:
+        if isinstance(item, str):
+            messages.append(item)
+        elif isinstance(item, dict):
+            if isinstance(item.get("message"), str):
+                messages.append(item["message"])
+            for check in item.get("failedChecks", []):
+                if isinstance(check, dict) and isinstance(check.get("message"), str):
+                    messages.append(check["message"])
+    return messages
+
+
+def normalize_findings(analysis_results: list) -> tuple:
+    """
+    Maps every analysis message to a finding label; unrecognised messages are kept as
+    "text:<normalized message>" so they still take part in the cache key.
+    """
+    labels = set()
+    for message in _messages(analysis_results):
+        # A multi-line result (e.g. layering summary + cycle evidence) holds one finding per line
+        for line in message.splitlines() or [message]:
+            line = " ".join(line.split())
+            for pattern, label in FINDING_PATTERNS:
+                match = pattern.match(line)
+                if match:
+                    labels.add(label(match))
+                    break
+            else:
+                labels.add(f"text:{line.lower()}")
+    return tuple(sorted(labels))
+
+
+def short_circuit_findings(labels: tuple) -> tuple:
+    """
+    Returns the findings that trigger the short-circuit policy (AML_SHORT_CIRCUIT_FINDINGS).
+    """
+    return tuple(label for label in labels if label in settings.AML_SHORT_CIRCUIT_FINDINGS)
+
+
+def scoring_config(model_name: str = None) -> str:
+    """
+    Hashes the settings a score depends on: the rule scorer's and, for a score of the reasoning model, its name.
+    """
+    config = {
+        "rules": settings.AML_SCORING_RULES_ENABLED,
+        "weights": settings.AML_SCORING_WEIGHTS,
+        "hop_decay": settings.AML_SCORING_HOP_DECAY,
+        "combination_bonus": settings.AML_SCORING_COMBINATION_BONUS,
+        "model": model_name or "",
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def findings_key(labels: tuple, config: str) -> str:
+    return hashlib.sha256("\n".join((config, *labels)).encode()).hexdigest()
+
+
+def _weight(label: str):
+    weights = settings.AML_SCORING_WEIGHTS
+    if label in weights:
+        return weights[label]
+    match = EXPOSURE_LABEL.match(label)
+    if match and f"exposure:{match[1]}" in weights:
+        # Exposure further away from the wallet weighs less
+        return max(0, weights[f"exposure:{match[1]}"] - settings.AML_SCORING_HOP_DECAY * (int(match[2]) - 1))
+    return None
+
+
+def rule_score(labels: tuple):
+    """
+    Scores the findings with the configured weights: the heaviest finding plus a bonus for each
+    additional risk finding, between 1 and 10. Returns None when any finding has no weight.
+    """
+    if any(label.startswith("exposure:") for label in labels):
+        # The generic exposure summary is already detailed per category and hop
+        labels = tuple(label for label in labels if label != "exposure")
+    weights = []
+    for label in labels:
+        weight = _weight(label)
+        if weight is None:
+            return None
+        weights.append(weight)
+    risk_weights = sorted((weight for weight in weights if weight > 0), reverse=True)
+    if not risk_weights:
+        return 1
+    score = risk_weights[0] + settings.AML_SCORING_COMBINATION_BONUS * (len(risk_weights) - 1)
+    return int(max(1, min(10, score)))
+
+
+def get_cached_score(key: str):
+    with _lru_lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            metrics.cache_lookup("score", True)
+            return _lru[key]
+    entry = RiskScoreCache.objects.filter(key=key).values_list("risk_score", flat=True).first()
+    metrics.cache_lookup("score", entry is not None)
+    if entry is not None:
+        _remember(key, entry)
+    return entry
+
+
+async def aget_cached_score(key: str):
+    with _lru_lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            metrics.cache_lookup("score", True)
+            return _lru[key]
+    entry = await RiskScoreCache.objects.filter(key=key).values_list("risk_score", flat=True).afirst()
+    metrics.cache_lookup("score", entry is not None)
+    if entry is not None:
+        _remember(key, entry)
+    return entry
+
+
+def _remember(key: str, risk_score: int):
+    with _lru_lock:
+        _lru[key] = risk_score
+        _lru.move_to_end(key)
+        while len(_lru) > settings.AML_SCORING_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+def cache_score(key: str, risk_score: int):
+    _remember(key, risk_score)
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="riskscorecache"):
+        RiskScoreCache.objects.update_or_create(key=key, defaults={"risk_score": risk_score})
+
+
+async def acache_score(key: str, risk_score: int):
+    _remember(key, risk_score)
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="riskscorecache"):
+        await RiskScoreCache.objects.aupdate_or_create(key=key, defaults={"risk_score": risk_score})
+
+
+def clear_cache():
+    # Drops both halves of the cache (the benchmarks start every measurement cold)
+    with _lru_lock:
+        _lru.clear()
+    RiskScoreCache.objects.all().delete()
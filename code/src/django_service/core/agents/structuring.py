@@ -0,0 +1,122 @@
+# Vectorized structuring detector over many senders at once.
+#
+# Input is a TransactionBatch (or a typed columnar frame: sender, amount as float64, timestamp as
+# datetime64). Transactions
+# below the per-transaction limit are sorted once by (sender, timestamp); the rolling window sum of
+# every transaction is then a difference of two prefix sums, with the window start found by one
+# np.searchsorted over a combined (sender, timestamp rank) key.
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+
+@dataclass(frozen=True)
+class StructuringConfig:
+    # Transactions strictly below this amount count towards a window
+    transaction_limit: float = 10000
+    # A window whose sum is strictly above this amount is reported
+    threshold: float = 10000
+    window: pd.Timedelta = pd.Timedelta("24h")
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            transaction_limit=settings.AML_STRUCTURING_TRANSACTION_LIMIT,
+            threshold=settings.AML_STRUCTURING_THRESHOLD,
+            window=pd.Timedelta(settings.AML_STRUCTURING_WINDOW),
+        )
+
+
+BREACH_COLUMNS = ["sender", "window_start", "window_end", "total_amount", "transaction_count"]
+
+
+def to_structuring_frame(transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Converts backend transaction records (string amounts, ISO timestamps) into the typed frame
+    expected by detect_structuring.
+    """
+    if transactions.empty:
+        return pd.DataFrame({
+            "sender": pd.Series(dtype=object),
+            "amount": pd.Series(dtype="float64"),
+            "timestamp": pd.Series(dtype="datetime64[ns, UTC]"),
+        })
+    return pd.DataFrame({
+        "sender": transactions["sender"].astype(object),
+        "amount": pd.to_numeric(transactions["amount"], errors="coerce").astype("float64"),
+        "timestamp": pd.to_datetime(transactions["timestamp"], utc=True),
+    })
+
+
+def _naive_utc(timestamps: pd.Series) -> pd.Series:
+    if timestamps.dt.tz is not None:
+        return timestamps.dt.tz_convert("UTC").dt.tz_localize(None)
+    return timestamps
+
+
+def detect_structuring(frame: pd.DataFrame, config: StructuringConfig = None) -> pd.DataFrame:
+    """
+    Returns one row per transaction whose trailing window (window_start, window_end] of sub-limit
+    transactions from the same sender sums above the threshold, with the window's total and count.
+    """
+    return _detect(
+        frame["sender"].to_numpy(),
+        frame["amount"].to_numpy(dtype="float64"),
+        _naive_utc(frame["timestamp"]).to_numpy(dtype="datetime64[ns]"),
+        config or StructuringConfig(),
+    )
+
+
+def detect_structuring_batch(batch, config: StructuringConfig = None) -> pd.DataFrame:
+    """
+    detect_structuring over a TransactionBatch; the sender column holds address IDs.
+    """
+    return _detect(
+        batch.senders,
+        batch.amounts,
+        (batch.timestamps * 1_000_000_000).astype("datetime64[ns]"),
+        config or StructuringConfig(),
+    )
+
+
+def _detect(senders: np.ndarray, amounts: np.ndarray, timestamps: np.ndarray, config: StructuringConfig) -> pd.DataFrame:
+    eligible = amounts < config.transaction_limit
+    if not eligible.any():
+        return pd.DataFrame(columns=BREACH_COLUMNS)
+
+    sender_codes, senders = pd.factorize(senders[eligible])
+    amounts = amounts[eligible]
+    timestamps = timestamps[eligible]
+    ts = timestamps.astype(np.int64)
+
+    order = np.lexsort((ts, sender_codes))
+    sender_codes, ts, amounts = sender_codes[order], ts[order], amounts[order]
+
+    # Work on timestamp ranks instead of raw nanoseconds so the combined (sender, time) key can
+    # never overflow: t_j > t_i - window  <=>  rank(t_j) >= number of timestamps <= t_i - window
+    unique_ts = np.unique(ts)
+    ranks = np.searchsorted(unique_ts, ts)
+    lower_ranks = np.searchsorted(unique_ts, ts - config.window.value, side="right")
+    stride = np.int64(len(unique_ts) + 1)
+    keys = sender_codes.astype(np.int64) * stride + ranks
+    lower_keys = sender_codes.astype(np.int64) * stride + lower_ranks
+
+    # Rolling sum over (t - window, t]
+    starts = np.searchsorted(keys, lower_keys, side="left")
+    csum = np.concatenate(([0.0], np.cumsum(amounts)))
+    ends = np.arange(1, len(keys) + 1)
+    totals = csum[ends] - csum[starts]
+    breached = totals > config.threshold
+
+    timestamps = timestamps[order]
+    return pd.DataFrame({
+        "sender": senders[sender_codes[breached]],
+        "window_start": pd.to_datetime(timestamps[starts[breached]], utc=True),
+        "window_end": pd.to_datetime(timestamps[breached], utc=True),
+        "total_amount": totals[breached],
+        "transaction_count": (ends - starts)[breached],
+    }, columns=BREACH_COLUMNS).reset_index(drop=True)
+
@@ -1,8 +1,14 @@
-# Analyzes the wallet's transactions to identify any money-laundering behaviour
+# Analyzes the wallet's transactions to identify any money-laundering behaviour.
+# The detector (core/agents/structuring.py, and pandas with it) is imported on the first analysis. With
+# AML_STRUCTURING_MONITOR the online monitor's precomputed state is used instead (core/structuring_monitor.py).
+
+from dataclasses import replace
+from datetime import timedelta
 
-import pandas as pd
 from core.agents.models.aml_state import AmlState
-from core.agents.tools.fetch_transactions import fetch_transactions
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from core.agents.transactions import TransactionBatch, TransactionWindow, addresses
+from core.structuring_monitor import monitored_state, amonitored_state, replay_breach
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
@@ -10,6 +16,76 @@ from typing import Annotated
 from langchain_core.messages import ToolMessage
 
 
+def _sent_chunk(chunk: TransactionBatch, wallet_address: str, config) -> TransactionBatch:
+    # Only the wallet's transfers below the limit can be part of a breach, the rest of a chunk is dropped on arrival.
+    # The wallet is interned once its first chunk was converted, so it is looked up per chunk.
+    sent = (chunk.senders == addresses.get(wallet_address)) & (chunk.amounts < config.transaction_limit)
+    return chunk.take(sent)
+
+
+def _structuring_summary(sent: list, config, state=None) -> str:
+    if state is not None:
+        # Continues the online monitor's window instead of rescanning the history
+        detected = replay_breach(state, sent, config)
+    else:
+        from core.agents.structuring import detect_structuring_batch
+        detected = not detect_structuring_batch(TransactionBatch.concat(sent), config).empty
+
+    if detected:
+        window_hours = config.window / timedelta(hours=1)
+        return (
+            f"Structuring behaviour detected: Multiple transactions below ${config.transaction_limit:,.0f} "
+            f"within {window_hours:g} hours exceeding ${config.threshold:,.0f}."
+        )
+    return "No structuring behaviour detected."
+
+
+def _config():
+    from core.agents.structuring import StructuringConfig
+    return StructuringConfig.from_settings()
+
+
+def structuring_state(wallet_address: str):
+    """
+    The online monitor's state of the wallet (core/structuring_monitor.py), None without AML_STRUCTURING_MONITOR.
+    """
+    return monitored_state(wallet_address, _config())
+
+
+async def astructuring_state(wallet_address: str):
+    return await amonitored_state(wallet_address, _config())
+
+
+def _pending_window(state):
+    # With a monitor state only the transactions from its newest one on are needed
+    if state is None:
+        return None
+    return replace(TransactionWindow.from_settings(), since=state.last_timestamp)
+
+
+def analyze_structuring(chunks, wallet_address: str, state=None) -> str:
+    """
+    Runs the structuring analysis over the wallet's transactions, given as an iterable of batches
+    (e.g. TransactionSnapshot.chunks), and returns the summary message. With the wallet's monitor
+    state, a flagged wallet is answered without reading any transaction.
+    """
+    config = _config()
+    if state is not None and state.flagged:
+        return _structuring_summary([], config, state)
+    return _structuring_summary([_sent_chunk(chunk, wallet_address, config) for chunk in chunks], config, state)
+
+
+async def aanalyze_structuring(chunks, wallet_address: str, state=None) -> str:
+    """
+    analyze_structuring over an async iterable of batches (e.g. AsyncTransactionSnapshot.chunks).
+    """
+    config = _config()
+    if state is not None and state.flagged:
+        return _structuring_summary([], config, state)
+    sent = [_sent_chunk(chunk, wallet_address, config) async for chunk in chunks]
+    return _structuring_summary(sent, config, state)
+
+
 @tool(parse_docstring= True)
 def check_structuring(tool_call_id: Annotated[str, InjectedToolCallId], aml_state: Annotated[AmlState, InjectedState]) -> Command:
     """
@@ -20,37 +96,27 @@ def check_structuring(tool_call_id: Annotated[str, InjectedToolCallId], aml_stat
         aml_state: The current state containing wallet address.
     """
 
-    transactions = fetch_transactions(aml_state['wallet_address'])
-    print("behaviour_check.py - fetched transactions:")
-    print(transactions)
-    transactions['amount'] = pd.to_numeric(transactions['amount'], errors= 'coerce')
-    filtered_inputs = transactions[(transactions['amount'] < 10000) & (transactions['sender'] == aml_state['wallet_address'])]
-
-    # Performing rolling window operations
-    filtered_inputs['timestamp'] = pd.to_datetime(filtered_inputs['timestamp'], utc= True)
-    filtered_inputs = filtered_inputs.sort_values('timestamp')
-    filtered_inputs.set_index('timestamp', inplace= True)
-    rolling_sum = filtered_inputs['amount'].rolling('24h').sum()
+    wallet_address = aml_state['wallet_address']
+    state = structuring_state(wallet_address)
+    content = analyze_structuring(TransactionSnapshot(_pending_window(state)).chunks(wallet_address), wallet_address, state)
+    tool_message = ToolMessage(
+        tool_call_id= tool_call_id,
+        content= content
+    )
 
-    if any(rolling_sum > 10000):
-        tool_message = ToolMessage(
-            tool_call_id= tool_call_id,
-            content= "Structuring behaviour detected: Multiple transactions below $10,000 within 24 hours exceeding $10,000."
-        )
-    else:
-        tool_message = ToolMessage(
-            tool_call_id= tool_call_id,
-            content= "No structuring behaviour detected."
-        )
-        
-    
     return Command(
         update= {
             "messages": [tool_message]
         })
 
 
+async def _acheck_structuring(tool_call_id: Annotated[str, InjectedToolCallId], aml_state: Annotated[AmlState, InjectedState]) -> Command:
+    wallet_address = aml_state['wallet_address']
+    state = await astructuring_state(wallet_address)
+    chunks = AsyncTransactionSnapshot(_pending_window(state)).chunks(wallet_address)
+    content = await aanalyze_structuring(chunks, wallet_address, state)
+    return Command(update={"messages": [ToolMessage(tool_call_id=tool_call_id, content=content)]})
 
 
-
-
+# Native coroutine used by agent.ainvoke
+check_structuring.coroutine = _acheck_structuring
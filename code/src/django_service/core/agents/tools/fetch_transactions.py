@@ -1,15 +1,264 @@
+import asyncio
+import threading
+from contextlib import aclosing, closing
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from core.agents.backend_client import get_json, stream_items, astream_items
+from core.agents.transactions import TransactionBatch, TransactionWindow
+from core.transaction_store import iter_batches, aiter_batches
 
-import pandas as pd
-import requests
 
-def fetch_transactions(wallet_address: str) -> pd.DataFrame:
-    url = f"http://localhost:8080/transactions/{wallet_address}"
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
-    transactions = pd.DataFrame(data["transactions"])
-    return transactions
+def fetch_transaction_records(wallet_address: str) -> list:
+    data = get_json(f"/transactions/{wallet_address}")
+    return data["transactions"]
 
 
+def _bounded_chunk(records: list, window: TransactionWindow, taken: int) -> TransactionBatch:
+    # Records are converted to the typed batch once, right after they are parsed
+    return window.apply(TransactionBatch.from_records(records), taken)
 
-    
+
+def iter_transaction_batches(wallet_address: str, window: TransactionWindow = None):
+    """
+    Yields the address's transactions as typed chunks of at most AML_FETCH_CHUNK_ROWS rows while they
+    are received, bounded by the window (AML_FETCH_MAX_ROWS by default). Stops reading once max_rows
+    transactions were yielded.
+    """
+    window = window or TransactionWindow.from_settings()
+    chunk_rows = settings.AML_FETCH_CHUNK_ROWS
+    if settings.AML_TRANSACTION_STORE:
+        yield from iter_batches(wallet_address, window, chunk_rows)
+        return
+
+    taken = 0
+    records = []
+    with closing(stream_items(f"/transactions/{wallet_address}", "transactions")) as items:
+        for record in items:
+            records.append(record)
+            if len(records) < chunk_rows:
+                continue
+            chunk = _bounded_chunk(records, window, taken)
+            records = []
+            taken += len(chunk)
+            if len(chunk):
+                yield chunk
+            if window.exhausted(taken):
+                return
+    if records:
+        chunk = _bounded_chunk(records, window, taken)
+        if len(chunk):
+            yield chunk
+
+
+async def aiter_transaction_batches(wallet_address: str, window: TransactionWindow = None):
+    window = window or TransactionWindow.from_settings()
+    chunk_rows = settings.AML_FETCH_CHUNK_ROWS
+    if settings.AML_TRANSACTION_STORE:
+        async with aclosing(aiter_batches(wallet_address, window, chunk_rows)) as chunks:
+            async for chunk in chunks:
+                yield chunk
+        return
+
+    taken = 0
+    records = []
+    async with aclosing(astream_items(f"/transactions/{wallet_address}", "transactions")) as items:
+        async for record in items:
+            records.append(record)
+            if len(records) < chunk_rows:
+                continue
+            chunk = _bounded_chunk(records, window, taken)
+            records = []
+            taken += len(chunk)
+            if len(chunk):
+                yield chunk
+            if window.exhausted(taken):
+                return
+    if records:
+        chunk = _bounded_chunk(records, window, taken)
+        if len(chunk):
+            yield chunk
+
+
+def fetch_transaction_batch(wallet_address: str, window: TransactionWindow = None) -> TransactionBatch:
+    return TransactionBatch.concat(list(iter_transaction_batches(wallet_address, window)))
+
+
+async def afetch_transaction_batch(wallet_address: str, window: TransactionWindow = None) -> TransactionBatch:
+    return TransactionBatch.concat([chunk async for chunk in aiter_transaction_batches(wallet_address, window)])
+
+
+class _SharedStream:
+    # One address's chunk stream shared by every reader of a snapshot. Whoever needs the next chunk pulls
+    # it from the source, so no reader ever waits on the progress of another reader's generator.
+    def __init__(self, source):
+        self.source = source
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.lock = threading.Lock()
+        self.pull = None  # in-flight pull of the async stream
+
+
+class TransactionSnapshot:
+    """
+    Per-request view of the backend's transaction sets. Each address is fetched at most once,
+    even when several checks ask for it concurrently, and every check reads the same batch.
+    """
+
+    def __init__(self, window: TransactionWindow = None):
+        self.window = window
+        self._batches = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def batch(self, address: str) -> TransactionBatch:
+        return TransactionBatch.concat(list(self.chunks(address)))
+
+    def _stream(self, address: str):
+        # The cached batch, or the address's shared stream (started on the first request)
+        with self._lock:
+            cached = self._batches.get(address)
+            if cached is not None:
+                return cached, None
+            stream = self._streams.get(address)
+            if stream is None:
+                stream = self._streams[address] = _SharedStream(iter_transaction_batches(address, self.window))
+            return None, stream
+
+    def _finish(self, address: str, stream: _SharedStream):
+        with self._lock:
+            if self._streams.get(address) is stream:
+                del self._streams[address]
+            if stream.error is None:
+                self._batches[address] = TransactionBatch.concat(stream.chunks)
+
+    def chunks(self, address: str):
+        """
+        Yields the address's transactions chunk by chunk: streamed on the first request, from the
+        snapshot afterwards. Concurrent requests read one stream, a fully read stream is kept.
+        """
+        cached, stream = self._stream(address)
+        if cached is not None:
+            yield cached
+            return
+
+        index = 0
+        while True:
+            if index < len(stream.chunks):
+                yield stream.chunks[index]
+                index += 1
+                continue
+            with stream.lock:
+                if index < len(stream.chunks):
+                    continue
+                if stream.error is not None:
+                    raise stream.error
+                if stream.done:
+                    return
+                try:
+                    chunk = next(stream.source, None)
+                except Exception as exc:
+                    # A later request fetches the address again
+                    stream.error = exc
+                    self._finish(address, stream)
+                    raise
+                if chunk is None:
+                    stream.done = True
+                    self._finish(address, stream)
+                else:
+                    stream.chunks.append(chunk)
+
+    def frontier_chunks(self, addresses: list):
+        """
+        Yields (address, chunk) for a whole frontier, address by address. Several missing addresses are
+        fetched concurrently first, a single one is streamed.
+        """
+        self._prefetch(addresses)
+        for address in addresses:
+            for chunk in self.chunks(address):
+                yield address, chunk
+
+    def _prefetch(self, addresses: list):
+        with self._lock:
+            missing = [address for address in addresses if address not in self._batches]
+        if len(missing) > 1:
+            with ThreadPoolExecutor(max_workers=min(len(missing), settings.AML_BACKEND_MAX_CONCURRENCY)) as executor:
+                list(executor.map(self.batch, missing))
+
+
+async def _pull(source):
+    return await anext(source, None)
+
+
+class AsyncTransactionSnapshot:
+    """
+    asyncio counterpart of TransactionSnapshot: concurrent requests for the same address read one stream.
+    """
+
+    def __init__(self, window: TransactionWindow = None):
+        self.window = window
+        self._batches = {}
+        self._streams = {}
+
+    async def batch(self, address: str) -> TransactionBatch:
+        return TransactionBatch.concat([chunk async for chunk in self.chunks(address)])
+
+    def _finish(self, address: str, stream: _SharedStream):
+        if self._streams.get(address) is stream:
+            del self._streams[address]
+        if stream.error is None:
+            self._batches[address] = TransactionBatch.concat(stream.chunks)
+
+    async def chunks(self, address: str):
+        """
+        Yields the address's transactions chunk by chunk: streamed on the first request, from the
+        snapshot afterwards. Concurrent requests await the same in-flight pull of one stream.
+        """
+        cached = self._batches.get(address)
+        if cached is not None:
+            yield cached
+            return
+        stream = self._streams.get(address)
+        if stream is None:
+            stream = self._streams[address] = _SharedStream(aiter_transaction_batches(address, self.window))
+
+        index = 0
+        while True:
+            if index < len(stream.chunks):
+                yield stream.chunks[index]
+                index += 1
+                continue
+            if stream.error is not None:
+                raise stream.error
+            if stream.done:
+                return
+            if stream.pull is None:
+                stream.pull = asyncio.ensure_future(_pull(stream.source))
+            pull = stream.pull
+            try:
+                # Shielded: a cancelled reader leaves the pull to the others
+                chunk = await asyncio.shield(pull)
+            except Exception as exc:
+                if stream.pull is pull:
+                    stream.pull, stream.error = None, exc
+                    self._finish(address, stream)
+                raise
+            if stream.pull is pull:
+                stream.pull = None
+                if chunk is None:
+                    stream.done = True
+                    self._finish(address, stream)
+                else:
+                    stream.chunks.append(chunk)
+
+    async def batches_many(self, addresses: list) -> dict:
+        results = await asyncio.gather(*(self.batch(address) for address in addresses))
+        return dict(zip(addresses, results))
+
+    async def frontier_chunks(self, addresses: list):
+        if len([address for address in addresses if address not in self._batches]) > 1:
+            await self.batches_many(addresses)
+        for address in addresses:
+            async with aclosing(self.chunks(address)) as chunks:
+                async for chunk in chunks:
+                    yield address, chunk
@@ -2,7 +2,6 @@ from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
 from typing import Annotated, List, Union
-from langchain_openai import ChatOpenAI
 import os
 from dotenv import load_dotenv, find_dotenv
 from pydantic import SecretStr
@@ -11,9 +10,127 @@ from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import ToolMessage
 from core.agents.models.aml_state import AmlState
+from core.agents.scoring import normalize_findings, short_circuit_findings, scoring_config, findings_key, rule_score, get_cached_score, cache_score, aget_cached_score, acache_score
+from django.conf import settings
 
 load_dotenv(find_dotenv())
 
+_chain = None
+
+
+def build_chain(reasoning_model):
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", (
+            "You are an expert financial risk analyst tasked with conducting risk analysis associated with crypto transactions. "
+            "Based on the analysis results provided below, calculate a risk score between 1 and 10 (both inclusive) with 10 being the highest. "
+            "The score should be an integer. Respond with only the calculated value (no explanation). "
+            "The analysis results are as follows:\n\n{analysis_results}"
+        )),
+    ])
+    return prompt | reasoning_model | StrOutputParser()
+
+
+def get_chain():
+    # The model client and prompt are built once, on first use, and reused by every scoring call
+    global _chain
+    if _chain is None:
+        from langchain_openai import ChatOpenAI
+        _chain = build_chain(ChatOpenAI(
+            model="gpt-4o-mini",
+            temperature=0,
+            api_key=SecretStr(os.getenv('OPENAI_API_KEY', ''))
+        ))
+    return _chain
+
+
+def set_chain(chain):
+    # Replaces the scoring chain (benchmarks use a scripted chat model)
+    global _chain
+    _chain = chain
+
+
+def model_name() -> str:
+    # The reasoning model behind the scoring chain, its scores are cached under its name
+    chain = get_chain()
+    model = (getattr(chain, "middle", None) or [chain])[0]
+    return getattr(model, "model_name", None) or type(model).__name__
+
+
+def _summaries(analysis_results: List[Union[str, dict]]) -> str:
+    # Extract only summary strings for the prompt
+    summary_strings = []
+    for item in analysis_results:
+        if isinstance(item, str):
+            summary_strings.append(item)
+        elif isinstance(item, dict):
+            # If dict has a 'message' field, use it as a summary
+            msg = item.get("message")
+            if msg and isinstance(msg, str):
+                summary_strings.append(msg)
+    # Remove duplicates
+    summary_strings = list(dict.fromkeys(summary_strings))
+    return "\n".join(summary_strings)
+
+
+def score_with_model(analysis_results: List[Union[str, dict]]) -> int:
+    """
+    Scores the summary strings of the analysis results with the reasoning model and returns the integer risk score.
+    """
+    return int(get_chain().invoke({"analysis_results": _summaries(analysis_results)}))
+
+
+async def ascore_with_model(analysis_results: List[Union[str, dict]]) -> int:
+    return int(await get_chain().ainvoke({"analysis_results": _summaries(analysis_results)}))
+
+
+def _rule_score(labels: tuple):
+    return rule_score(labels) if settings.AML_SCORING_RULES_ENABLED else None
+
+
+def _model_key(labels: tuple) -> str:
+    return findings_key(labels, scoring_config(model_name()))
+
+
+def score_analysis_results(analysis_results: List[Union[str, dict]]) -> int:
+    """
+    Returns the risk score of the analysis results: the short-circuit score when the policy matches, else
+    the rule scorer's when it can read every finding (computed, never cached), else the reasoning model's
+    through the findings cache.
+    """
+    labels = normalize_findings(analysis_results)
+    if short_circuit_findings(labels):
+        return settings.AML_SHORT_CIRCUIT_SCORE
+    risk_score = _rule_score(labels)
+    if risk_score is not None:
+        return risk_score
+
+    key = _model_key(labels)
+    risk_score = get_cached_score(key)
+    if risk_score is None:
+        risk_score = score_with_model(analysis_results)
+        cache_score(key, risk_score)
+    return risk_score
+
+
+async def ascore_analysis_results(analysis_results: List[Union[str, dict]]) -> int:
+    """
+    Async variant of score_analysis_results.
+    """
+    labels = normalize_findings(analysis_results)
+    if short_circuit_findings(labels):
+        return settings.AML_SHORT_CIRCUIT_SCORE
+    risk_score = _rule_score(labels)
+    if risk_score is not None:
+        return risk_score
+
+    key = _model_key(labels)
+    risk_score = await aget_cached_score(key)
+    if risk_score is None:
+        risk_score = await ascore_with_model(analysis_results)
+        await acache_score(key, risk_score)
+    return risk_score
+
+
 @tool(parse_docstring=True)
 def compute_risk_score(
     analysis_results: List[Union[str, dict]],
@@ -30,41 +147,29 @@ def compute_risk_score(
         tool_call_id: The unique identifier for this tool call.
         aml_state: The current state containing analysis results.
     """
-    # Extract only summary strings for the prompt
-    summary_strings = []
-    for item in analysis_results:
-        if isinstance(item, str):
-            summary_strings.append(item)
-        elif isinstance(item, dict):
-            # If dict has a 'message' field, use it as a summary
-            msg = item.get("message")
-            if msg and isinstance(msg, str):
-                summary_strings.append(msg)
-    # Remove duplicates
-    summary_strings = list(dict.fromkeys(summary_strings))
+    risk_score = score_analysis_results(analysis_results)
 
-    # Compose prompt
-    reasoning_model = ChatOpenAI(
-        model="gpt-4o-mini",
-        temperature=0,
-        api_key=SecretStr(os.getenv('OPENAI_API_KEY', ''))
+    return Command(
+        update={
+            "risk_score": risk_score,
+            "messages": [ToolMessage(tool_call_id=tool_call_id, content=f"Computed risk score: {risk_score}")]
+        }
     )
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", (
-            "You are an expert financial risk analyst tasked with conducting risk analysis associated with crypto transactions. "
-            "Based on the analysis results provided below, calculate a risk score between 1 and 10 (both inclusive) with 10 being the highest. "
-            "The score should be an integer. Respond with only the calculated value (no explanation). "
-            "The analysis results are as follows:\n\n{analysis_results}"
-        )),
-    ])
-
-    chain = prompt | reasoning_model | StrOutputParser()
-    compute_risk_score = chain.invoke({"analysis_results": "\n".join(summary_strings)})
 
+async def _acompute_risk_score(
+    analysis_results: List[Union[str, dict]],
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    aml_state: Annotated[AmlState, InjectedState]
+) -> Command:
+    risk_score = await ascore_analysis_results(analysis_results)
     return Command(
         update={
-            "risk_score": int(compute_risk_score),
-            "messages": [ToolMessage(tool_call_id=tool_call_id, content=f"Computed risk score: {compute_risk_score}")]
+            "risk_score": risk_score,
+            "messages": [ToolMessage(tool_call_id=tool_call_id, content=f"Computed risk score: {risk_score}")]
         }
-    )
\ No newline at end of file
+    )
+
+
+# Native coroutine used by agent.ainvoke
+compute_risk_score.coroutine = _acompute_risk_score
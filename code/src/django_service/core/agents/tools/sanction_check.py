@@ -1,122 +1,126 @@
 
+from core import metrics, taint
 from core.agents.models.aml_state import AmlState
-from core.agents.tools.fetch_transactions import fetch_transactions
+from core.agents.watchlist import get_watchlist, aget_watchlist, category_name, category_bit
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from core.agents.transactions import addresses
+from core.agents.graph_index import TransactionGraph
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import Command
 from langgraph.prebuilt import InjectedState
 from typing import Annotated
 from langchain_core.messages import ToolMessage
 
-import pandas as pd
-import requests
+import numpy as np
+from django.conf import settings
 
-@tool(parse_docstring=True)
-def check_sanctions(tool_call_id: Annotated[str, InjectedToolCallId], aml_state: Annotated[AmlState, InjectedState]) -> Command:
-    """
-    Checks if the wallet address carried out transactions with any sanctioned, mixer, or darknet entities.
-    The checks are performed up to n hops as designated in the state.
 
-    Args:
-        tool_call_id: The unique identifier for this tool call.
-        aml_state: The current state containing wallet address.
+def direct_flag_result(wallet: str):
     """
-    # Fetch lists from the oracle-service API
-    sanctions_resp = requests.get("http://localhost:8080/sanctions/all")
-    sanctions_resp.raise_for_status()
-    sanctions_data = sanctions_resp.json()
-    sanctions_set = set(sanctions_data.get("sanctioned", []))
-
-    mixers_resp = requests.get("http://localhost:8080/mixers/all")
-    mixers_resp.raise_for_status()
-    mixers_data = mixers_resp.json()
-    mixers_set = set(mixers_data.get("mixers", []))
+    Returns the sanctions result object of a wallet that is itself on a watchlist (one lookup), or None.
+    """
+    direct_flag = category_name(get_watchlist().lookup(wallet))
+    if not direct_flag:
+        return None
+    message = f"Wallet {wallet} is directly flagged as {direct_flag}."
+    return {
+        "flagged": True,
+        "type": direct_flag,
+        "wallet": wallet,
+        "transactions": [],
+        "failedChecks": [{
+            "type": direct_flag,
+            "wallet": wallet,
+            "transactions": [],
+            "message": message
+        }],
+        "message": message
+    }
 
-    darknet_resp = requests.get("http://localhost:8080/darknet/all")
-    darknet_resp.raise_for_status()
-    darknet_data = darknet_resp.json()
-    darknet_set = set(darknet_data.get("darknet", []))
 
-    wallet = aml_state['wallet_address']
-    max_hops = aml_state.get('max_hops', 1)
+def _sanctions_steps(wallet: str, max_hops: int):
+    """
+    Sans-IO sanctions analysis: yields each hop's frontier, then receives its transactions as
+    (address, TransactionBatch) chunks, address by address, followed by None, and finally returns the
+    result object. Every chunk is screened as it arrives. analyze_sanctions / aanalyze_sanctions drive
+    it with sync / async fetches.
+    """
+    # Combined address -> category bitmask index of the sanctions, mixer and darknet lists
+    watchlist_cache = get_watchlist()
 
     flagged_transactions = []
     flagged_types = set()
-    direct_flag = None
     failed_checks = []
 
     # Check if the wallet itself is directly flagged
-    if wallet in sanctions_set:
-        direct_flag = "sanctioned"
-    elif wallet in mixers_set:
-        direct_flag = "mixer"
-    elif wallet in darknet_set:
-        direct_flag = "darknet"
-
-    if direct_flag:
-        failed_checks.append({
-            "type": direct_flag,
-            "wallet": wallet,
-            "transactions": [],
-            "message": f"Wallet {wallet} is directly flagged as {direct_flag}."
-        })
-        result = {
-            "flagged": True,
-            "type": direct_flag,
-            "wallet": wallet,
-            "transactions": [],
-            "failedChecks": failed_checks,
-            "message": f"Wallet {wallet} is directly flagged as {direct_flag}."
-        }
-        tool_message = ToolMessage(
-            tool_call_id=tool_call_id,
-            content=result
-        )
-        return Command(update={"messages": [tool_message]})
+    result = direct_flag_result(wallet)
+    if result is not None:
+        return result
 
     current_addresses = [wallet]
-    analyzed_addresses = set([wallet])
+    analyzed_ids = [addresses.intern(wallet)]
+    excluded_ids = [addresses.intern(address) for address in ["", *settings.AML_KNOWN_HUBS]]
+    # Every screened address is loaded into one graph, which also drops the transactions that
+    # were already screened with a counterparty of an earlier frontier
+    graph = TransactionGraph()
 
     # Group flagged transactions by type and hop
     grouped_flags = {}
 
+    def screen(batch, hop):
+        # One watchlist lookup per distinct address of the chunk's transactions
+        party_ids, inverse = np.unique(np.concatenate([batch.senders, batch.receivers]), return_inverse=True)
+        party_masks = watchlist_cache.lookup_many(addresses.names(party_ids))[inverse]
+        sender_masks = party_masks[:len(batch)]
+        masks = sender_masks | party_masks[len(batch):]
+
+        for i in np.flatnonzero(masks):
+            tx_type = category_name(int(masks[i]))
+            flagged_id = batch.senders[i] if sender_masks[i] & category_bit(tx_type) else batch.receivers[i]
+            flagged_types.add(tx_type)
+            key = (tx_type, hop)
+            if key not in grouped_flags:
+                grouped_flags[key] = []
+            grouped_flags[key].append({
+                "flagged_entity": addresses.name(flagged_id),
+                "transaction": batch.record(i)
+            })
+
     for hop in range(max_hops):
-        next_addresses = set()
-        for address in current_addresses:
-            transactions = fetch_transactions(address)
-            # If transactions is a DataFrame, convert to records
-            if hasattr(transactions, 'to_dict'):
-                tx_records = transactions.to_dict(orient='records')
-            else:
-                tx_records = transactions if isinstance(transactions, list) else []
-            for tx in tx_records:
-                sender = tx.get('sender')
-                receiver = tx.get('receiver')
-                tx_type = None
-                flagged_entity = None
-                if sender in sanctions_set or receiver in sanctions_set:
-                    tx_type = "sanctioned"
-                    flagged_entity = sender if sender in sanctions_set else receiver
-                elif sender in mixers_set or receiver in mixers_set:
-                    tx_type = "mixer"
-                    flagged_entity = sender if sender in mixers_set else receiver
-                elif sender in darknet_set or receiver in darknet_set:
-                    tx_type = "darknet"
-                    flagged_entity = sender if sender in darknet_set else receiver
-                if tx_type:
-                    flagged_types.add(tx_type)
-                    key = (tx_type, hop + 1)
-                    if key not in grouped_flags:
-                        grouped_flags[key] = []
-                    grouped_flags[key].append({
-                        "flagged_entity": flagged_entity,
-                        "transaction": tx
-                    })
-                # Prepare for next hop
-                for party in [sender, receiver]:
-                    if party and party not in analyzed_addresses:
-                        next_addresses.add(party)
-            analyzed_addresses.add(address)
-        current_addresses = list(next_addresses)
+        item = yield current_addresses
+        metrics.inc("aml_sanctions_addresses_expanded_total", {"hop": hop + 1}, len(current_addresses))
+        # Transactions received per frontier address
+        degrees = {addresses.intern(address): 0 for address in current_addresses}
+        previous_id = None
+        while item is not None:
+            address, chunk = item
+            address_id = addresses.intern(address)
+            if previous_id is not None and previous_id != address_id:
+                # Chunks arrive address by address, the previous address is complete
+                graph.mark_loaded(previous_id)
+            previous_id = address_id
+            degrees[address_id] += len(chunk)
+            new = graph.append(address_id, chunk)
+            if len(new):
+                screen(chunk.take(new), hop + 1)
+            item = yield
+        for address_id in degrees:
+            graph.mark_loaded(address_id)
+        if not any(degrees.values()):
+            break
+        # Hubs (e.g. exchange hot wallets) are screened but their counterparties are not expanded
+        expandable = [address_id for address_id, degree in degrees.items() if degree <= settings.AML_SANCTIONS_HUB_DEGREE]
+
+        # Prepare for next hop: the counterparties most connected to this frontier, capped in size
+        analyzed_ids.extend(degrees)
+        counterparties = graph.neighbors(expandable)
+        counterparties = counterparties[~np.isin(counterparties, analyzed_ids + excluded_ids)]
+        parties, first_seen, counts = np.unique(counterparties, return_index=True, return_counts=True)
+        # Most connected first, ties in order of appearance
+        ranked = np.lexsort((first_seen, -counts))[:settings.AML_SANCTIONS_MAX_FRONTIER]
+        current_addresses = addresses.names(parties[ranked])
+        if not current_addresses:
+            break
 
     # Add grouped messages for each flagged type/hop as structured objects
     for (tx_type, hop), txs in grouped_flags.items():
@@ -136,9 +140,88 @@ def check_sanctions(tool_call_id: Annotated[str, InjectedToolCallId], aml_state:
         "failedChecks": failed_checks,
         "message": f"Flagged transactions detected for wallet {wallet}." if grouped_flags else "No sanctioned, mixer, or darknet entity transactions detected."
     }
+    return result
+
 
-    tool_message = ToolMessage(
+def analyze_sanctions(wallet: str, max_hops: int = 1, snapshot: TransactionSnapshot = None) -> dict:
+    """
+    Runs the sanctioned, mixer and darknet exposure analysis for a wallet up to max_hops and returns the result object.
+    Each hop fetches its frontier concurrently through the snapshot and checks every chunk against the watchlist as it arrives.
+    With the taint table enabled, current for the watchlist and built for max_hops, it is answered by one lookup instead (see core/taint.py).
+    """
+    snapshot = snapshot or TransactionSnapshot()
+    if taint.usable(max_hops):
+        result = direct_flag_result(wallet)
+        if result is not None:
+            return result
+        if settings.AML_TRANSACTION_STORE:
+            # Ingests the wallet's latest transactions, which folds them into the taint table
+            snapshot.batch(wallet)
+        return taint.taint_result(wallet, max_hops)
+    steps = _sanctions_steps(wallet, max_hops)
+    try:
+        frontier = next(steps)
+        while True:
+            for item in snapshot.frontier_chunks(frontier):
+                steps.send(item)
+            frontier = steps.send(None)
+    except StopIteration as done:
+        return done.value
+
+
+async def aanalyze_sanctions(wallet: str, max_hops: int = 1, snapshot: AsyncTransactionSnapshot = None) -> dict:
+    """
+    Async variant of analyze_sanctions, each frontier is fetched with the async backend client.
+    """
+    snapshot = snapshot or AsyncTransactionSnapshot()
+    # Every watchlist read below is non-blocking once it is loaded
+    await aget_watchlist()
+    if await taint.ausable(max_hops):
+        result = direct_flag_result(wallet)
+        if result is not None:
+            return result
+        if settings.AML_TRANSACTION_STORE:
+            await snapshot.batch(wallet)
+        return await taint.ataint_result(wallet, max_hops)
+    steps = _sanctions_steps(wallet, max_hops)
+    try:
+        frontier = next(steps)
+        while True:
+            async for item in snapshot.frontier_chunks(frontier):
+                steps.send(item)
+            frontier = steps.send(None)
+    except StopIteration as done:
+        return done.value
+
+
+def _tool_message(tool_call_id: str, result: dict) -> ToolMessage:
+    # The artifact keeps the serializable findings next to the text content, for streaming clients
+    return ToolMessage(
         tool_call_id=tool_call_id,
-        content=result
+        content=result,
+        artifact={"message": result["message"], "failedChecks": result["failedChecks"]}
     )
-    return Command(update={"messages": [tool_message]})
\ No newline at end of file
+
+
+@tool(parse_docstring=True)
+def check_sanctions(tool_call_id: Annotated[str, InjectedToolCallId], aml_state: Annotated[AmlState, InjectedState]) -> Command:
+    """
+    Checks if the wallet address carried out transactions with any sanctioned, mixer, or darknet entities.
+    The checks are performed up to n hops as designated in the state.
+
+    Args:
+        tool_call_id: The unique identifier for this tool call.
+        aml_state: The current state containing wallet address.
+    """
+    result = analyze_sanctions(aml_state['wallet_address'], aml_state.get('max_hops', 1))
+
+    return Command(update={"messages": [_tool_message(tool_call_id, result)]})
+
+
+async def _acheck_sanctions(tool_call_id: Annotated[str, InjectedToolCallId], aml_state: Annotated[AmlState, InjectedState]) -> Command:
+    result = await aanalyze_sanctions(aml_state['wallet_address'], aml_state.get('max_hops', 1))
+    return Command(update={"messages": [_tool_message(tool_call_id, result)]})
+
+
+# Native coroutine used by agent.ainvoke
+check_sanctions.coroutine = _acheck_sanctions
@@ -0,0 +1,211 @@
+# Compact, typed representation of transaction sets shared by every AML tool.
+#
+# Backend records (dicts of strings) are converted once, when they are fetched, into a
+# TransactionBatch of NumPy columns: sender / receiver / denom as integer IDs interned in a
+# process-wide table, amounts as float64 and timestamps as int64 epoch seconds. Tools filter, sort
+# and join on these arrays directly; record dicts are only rebuilt for the few transactions a report
+# quotes. pandas (string parsing only) is imported on the first conversion rather than with this module,
+# which the web process loads at startup. Large transaction sets arrive as a stream of such batches (chunks), optionally bounded by a
+# TransactionWindow.
+
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+from django.conf import settings
+
+
+class InternTable:
+    """
+    Thread-safe, append-only mapping of strings to dense int IDs (0, 1, 2, ...).
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def intern(self, name: str) -> int:
+        address_id = self._ids.get(name)
+        if address_id is None:
+            with self._lock:
+                address_id = self._ids.get(name)
+                if address_id is None:
+                    address_id = self._ids[name] = len(self._names)
+                    self._names.append(name)
+        return address_id
+
+    def intern_many(self, names) -> np.ndarray:
+        # Factorize first so each distinct name is interned once
+        import pandas as pd
+        codes, uniques = pd.factorize(np.asarray(names, dtype=object))
+        ids = np.fromiter((self.intern(name) for name in uniques), dtype=np.int64, count=len(uniques))
+        return ids[codes] if len(codes) else np.empty(0, dtype=np.int64)
+
+    def get(self, name: str, default: int = -1) -> int:
+        return self._ids.get(name, default)
+
+    def name(self, address_id: int) -> str:
+        return self._names[address_id]
+
+    def names(self, ids) -> list:
+        names = self._names
+        return [names[i] for i in ids]
+
+
+addresses = InternTable()
+denoms = InternTable()
+
+
+def to_epoch_seconds(values) -> np.ndarray:
+    """
+    Parses ISO timestamps (or datetimes) into int64 epoch seconds.
+    """
+    if len(values) == 0:
+        return np.empty(0, dtype=np.int64)
+    import pandas as pd
+    return pd.to_datetime(values, utc=True, format="ISO8601").asi8 // 1_000_000_000
+
+
+def format_timestamp(seconds: int) -> str:
+    return datetime.fromtimestamp(int(seconds), tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _format_amount(amount: float) -> str:
+    return f"{amount:.8f}".rstrip("0").rstrip(".")
+
+
+@dataclass(frozen=True)
+class TransactionBatch:
+    hashes: np.ndarray  # object (str)
+    senders: np.ndarray  # int64 address IDs
+    receivers: np.ndarray  # int64 address IDs
+    amounts: np.ndarray  # float64
+    timestamps: np.ndarray  # int64 epoch seconds
+    denoms: np.ndarray  # int64 denom IDs
+
+    def __len__(self) -> int:
+        return len(self.senders)
+
+    @classmethod
+    def empty(cls):
+        return cls(
+            np.empty(0, dtype=object), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_columns(cls, hashes, senders, receivers, amounts, timestamps, denom_names):
+        """
+        Builds a batch from parallel columns of Python values (address / denom strings, amounts as
+        numbers or numeric strings, timestamps as ISO strings or datetimes).
+        """
+        if len(senders) == 0:
+            return cls.empty()
+        import pandas as pd
+        return cls(
+            hashes=np.asarray(hashes, dtype=object),
+            senders=addresses.intern_many(senders),
+            receivers=addresses.intern_many(receivers),
+            amounts=pd.to_numeric(pd.Series(amounts, dtype=object), errors="coerce").to_numpy(dtype=np.float64),
+            timestamps=to_epoch_seconds(timestamps),
+            denoms=denoms.intern_many(denom_names),
+        )
+
+    @classmethod
+    def from_records(cls, records: list):
+        """
+        Converts backend transaction records ({"hash", "timestamp", "sender", "receiver", "amount", "denom"}).
+        """
+        return cls.from_columns(
+            [tx.get("hash", "") for tx in records],
+            [tx["sender"] for tx in records],
+            [tx["receiver"] for tx in records],
+            [tx.get("amount") for tx in records],
+            [tx["timestamp"] for tx in records],
+            [tx.get("denom") or "" for tx in records],
+        )
+
+    @classmethod
+    def concat(cls, batches):
+        batches = [batch for batch in batches if len(batch)]
+        if not batches:
+            return cls.empty()
+        if len(batches) == 1:
+            return batches[0]
+        return cls(*(np.concatenate([getattr(batch, column) for batch in batches]) for column in COLUMNS))
+
+    def take(self, indices):
+        return TransactionBatch(*(getattr(self, column)[indices] for column in COLUMNS))
+
+    def counterparties(self, address_id: int) -> np.ndarray:
+        """
+        The other party of every transaction of the address with ID address_id.
+        """
+        return np.where(self.senders == address_id, self.receivers, self.senders)
+
+    def record(self, i: int) -> dict:
+        """
+        Rebuilds the backend record of transaction i (for reports).
+        """
+        return {
+            "hash": self.hashes[i],
+            "timestamp": format_timestamp(self.timestamps[i]),
+            "sender": addresses.name(self.senders[i]),
+            "receiver": addresses.name(self.receivers[i]),
+            "amount": _format_amount(self.amounts[i]),
+            "denom": denoms.name(self.denoms[i]),
+        }
+
+    def rows(self) -> list:
+        """
+        Process-independent (hash, sender, receiver, amount, timestamp) tuples, e.g. for fingerprints.
+        """
+        return list(zip(
+            self.hashes.tolist(),
+            addresses.names(self.senders),
+            addresses.names(self.receivers),
+            self.amounts.tolist(),
+            self.timestamps.tolist(),
+        ))
+
+
+COLUMNS = ("hashes", "senders", "receivers", "amounts", "timestamps", "denoms")
+
+
+@dataclass(frozen=True)
+class TransactionWindow:
+    """
+    Bounds of one transaction fetch: [since, until) in epoch seconds and at most max_rows transactions
+    (None for unbounded).
+    """
+    since: int = None
+    until: int = None
+    max_rows: int = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(max_rows=settings.AML_FETCH_MAX_ROWS or None)
+
+    def apply(self, batch: TransactionBatch, taken: int = 0) -> TransactionBatch:
+        """
+        The part of a chunk inside the time range, truncated so that at most max_rows are taken in total.
+        """
+        if self.since is not None or self.until is not None:
+            inside = np.ones(len(batch), dtype=bool)
+            if self.since is not None:
+                inside &= batch.timestamps >= self.since
+            if self.until is not None:
+                inside &= batch.timestamps < self.until
+            if not inside.all():
+                batch = batch.take(inside)
+        if self.max_rows is not None and taken + len(batch) > self.max_rows:
+            batch = batch.take(slice(0, max(0, self.max_rows - taken)))
+        return batch
+
+    def exhausted(self, taken: int) -> bool:
+        return self.max_rows is not None and taken >= self.max_rows
@@ -0,0 +1,262 @@
+# Process-wide cache of the sanctions, mixer and darknet lists published by the oracle-service.
+#
+# The three lists are merged into one index mapping address -> category bitmask, so a lookup is a
+# single dict probe. The index is refreshed in the background once it is older than
+# AML_WATCHLIST_TTL: each list is requested with its last ETag, unchanged lists (304) are skipped
+# and changed lists are applied as a delta (added / removed addresses, against the list as last
+# loaded) to a copy of the index that is then swapped in. Screening never waits on the network except for the very first load.
+#
+# With AML_WATCHLIST_SNAPSHOT_PATH set, worker processes do not load the lists themselves: they map
+# the compiled snapshot written by `manage.py build_watchlist_snapshot` (core/agents/watchlist_snapshot.py)
+# and switch to a new one when it is renamed into place.
+
+import hashlib
+import logging
+import threading
+import time
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from core.agents.backend_client import get
+from core.agents.watchlist_snapshot import WatchlistSnapshot, file_identity
+
+logger = logging.getLogger(__name__)
+
+SANCTIONED = 1
+MIXER = 2
+DARKNET = 4
+
+# (category, bit, backend path, JSON key) in the priority order used when reporting a flag
+CATEGORIES = (
+    ("sanctioned", SANCTIONED, "/sanctions/all", "sanctioned"),
+    ("mixer", MIXER, "/mixers/all", "mixers"),
+    ("darknet", DARKNET, "/darknet/all", "darknet"),
+)
+
+
+def category_name(mask: int):
+    """
+    Returns the highest-priority category set in the bitmask, or None.
+    """
+    for name, bit, _, _ in CATEGORIES:
+        if mask & bit:
+            return name
+    return None
+
+
+def category_bit(name: str) -> int:
+    for category, bit, _, _ in CATEGORIES:
+        if category == name:
+            return bit
+    raise ValueError(f"Unknown watchlist category '{name}'.")
+
+
+class WatchlistCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._index = None
+        # Category name -> frozenset of its addresses as last loaded, the base of the next delta
+        self._lists = {}
+        self._etags = {}
+        self._version = ""
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    @property
+    def version(self) -> str:
+        """
+        Identifies the content of the currently loaded lists (changes whenever any list changes).
+        """
+        self.index()
+        return self._version
+
+    @property
+    def loaded(self) -> bool:
+        # Whether lookups are answered without waiting on the backend
+        return self._index is not None
+
+    def index(self) -> dict:
+        """
+        Returns the address -> bitmask index. Loads it synchronously the first time; afterwards a
+        stale index is returned as is while a background refresh runs.
+        """
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._refresh()
+        elif time.monotonic() - self._loaded_at > self.ttl:
+            self.refresh_in_background()
+        return self._index
+
+    def lookup(self, address: str) -> int:
+        return self.index().get(address, 0)
+
+    def addresses(self) -> list:
+        """
+        Every listed address.
+        """
+        return list(self.index())
+
+    def lookup_many(self, addresses) -> np.ndarray:
+        """
+        Returns the category bitmask of every address as an int64 array (0 when not listed).
+        """
+        index = self.index()
+        return np.fromiter((index.get(address, 0) for address in addresses), dtype=np.int64, count=len(addresses))
+
+    def refresh_in_background(self):
+        # Never waits: the lock is held for the whole of a running refresh, and _refreshing covers the
+        # time until a started one takes it
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        finally:
+            self._lock.release()
+        threading.Thread(target=self._background_refresh, name="watchlist-refresh", daemon=True).start()
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _background_refresh(self):
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception:
+                # Keep serving the previous index, the next stale lookup tries again
+                logger.exception("Watchlist refresh failed, serving the previous lists")
+            finally:
+                self._refreshing = False
+
+    def _refresh(self):
+        # ETags and lists are only committed together with the index they describe, a list that fails to
+        # load leaves all of them untouched so the lists changed before it are fetched again next time
+        index = self._index
+        lists = dict(self._lists)
+        etags = dict(self._etags)
+        for name, bit, path, key in CATEGORIES:
+            headers = {}
+            if index is not None and self._etags.get(name):
+                headers["If-None-Match"] = self._etags[name]
+            response = get(path, headers=headers)
+            if response.status_code == 304:
+                continue
+            addresses = frozenset(response.json().get(key, []))
+            etags[name] = response.headers.get("ETag") or hashlib.sha1(response.content).hexdigest()
+
+            if index is None:
+                index = {}
+            elif index is self._index:
+                # Copy on first change so readers keep a consistent index until the swap
+                index = dict(index)
+            current = lists.get(name, frozenset())
+            for address in current - addresses:
+                mask = index[address] & ~bit
+                if mask:
+                    index[address] = mask
+                else:
+                    del index[address]
+            for address in addresses - current:
+                index[address] = index.get(address, 0) | bit
+            lists[name] = addresses
+
+        self._version = hashlib.sha1("|".join(etags.get(name, "") for name, _, _, _ in CATEGORIES).encode()).hexdigest()[:16]
+        self._lists = lists
+        self._etags = etags
+        self._index = index
+        self._loaded_at = time.monotonic()
+
+
+class SnapshotWatchlist:
+    """
+    Watchlist served from the shared snapshot file, checked for a new version at most every
+    check_interval seconds. Falls back to loading the lists in-process while there is no snapshot.
+    """
+
+    def __init__(self, path: str, check_interval: float):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._superseded = None
+        self._checked_at = None
+        self._fallback = None
+        self._lock = threading.Lock()
+
+    def _current(self):
+        if self._checked_at is None or time.monotonic() - self._checked_at > self.check_interval:
+            self.refresh()
+        if self._snapshot is not None:
+            return self._snapshot
+        if self._fallback is None:
+            logger.warning("No watchlist snapshot at %s, loading the lists in-process", self.path)
+            self._fallback = WatchlistCache(ttl=settings.AML_WATCHLIST_TTL)
+        return self._fallback
+
+    @property
+    def version(self) -> str:
+        return self._current().version
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None or (self._fallback is not None and self._fallback.loaded)
+
+    def lookup(self, address: str) -> int:
+        return self._current().lookup(address)
+
+    def lookup_many(self, addresses) -> np.ndarray:
+        return self._current().lookup_many(addresses)
+
+    def addresses(self) -> list:
+        return self._current().addresses()
+
+    def refresh(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            identity = file_identity(self.path)
+            if identity is None or (self._snapshot is not None and identity == self._snapshot.identity):
+                return
+            try:
+                snapshot = WatchlistSnapshot(self.path)
+            except (OSError, ValueError) as e:
+                logger.warning("Cannot map the watchlist snapshot %s: %s", self.path, e)
+                return
+            # A lookup may still be reading the map being replaced, it is closed at the next swap instead
+            # and the one replaced before is closed now
+            if self._superseded is not None:
+                self._superseded.close()
+            self._superseded, self._snapshot = self._snapshot, snapshot
+
+
+_watchlist = None
+_watchlist_lock = threading.Lock()
+
+
+def get_watchlist():
+    """
+    The process-wide watchlist: a SnapshotWatchlist with AML_WATCHLIST_SNAPSHOT_PATH, a WatchlistCache otherwise.
+    """
+    global _watchlist
+    if _watchlist is None:
+        with _watchlist_lock:
+            if _watchlist is None:
+                if settings.AML_WATCHLIST_SNAPSHOT_PATH:
+                    _watchlist = SnapshotWatchlist(settings.AML_WATCHLIST_SNAPSHOT_PATH, settings.AML_WATCHLIST_SNAPSHOT_CHECK_INTERVAL)
+                else:
+                    _watchlist = WatchlistCache(ttl=settings.AML_WATCHLIST_TTL)
+    return _watchlist
+
+
+async def aget_watchlist():
+    """
+    get_watchlist() for async code: a watchlist that still has to be loaded (from the backend or the
+    snapshot file) is loaded in a worker thread instead of on the event loop.
+    """
+    watchlist = get_watchlist()
+    if not watchlist.loaded:
+        await sync_to_async(lambda: watchlist.version, thread_sensitive=False)()
+    return watchlist
@@ -0,0 +1,155 @@
+# Compiled watchlist snapshot shared by every worker process.
+#
+# The merged address -> category bitmask index is written as a flat file: a 40-byte header, the sorted
+# 64-bit BLAKE2b hashes of all listed addresses, one category byte per hash, and the addresses themselves
+# (UTF-8, concatenated in hash order, with their offsets). Workers mmap the file read-only and view the
+# arrays in place, so the pages are shared through the OS page cache instead of every process holding its
+# own dict. A lookup is a binary search over the hashes; a hash hit is confirmed against the stored
+# address, so an unlisted address whose hash collides with a listed one is never flagged.
+#
+# Snapshots are written to a temporary file next to the target and renamed over it, so readers only ever
+# see complete files; a reader picks up a new snapshot by noticing the file identity changed.
+
+import hashlib
+import mmap
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"AMLW"
+FORMAT_VERSION = 2
+# magic, format version, address count, watchlist version (16 ASCII characters), address bytes
+HEADER = struct.Struct("<4sIQ16sQ")
+
+
+def address_hash(address: str) -> int:
+    return int.from_bytes(hashlib.blake2b(address.encode(), digest_size=8).digest(), "little")
+
+
+def _hashes(addresses) -> np.ndarray:
+    return np.fromiter((address_hash(address) for address in addresses), dtype=np.uint64, count=len(addresses))
+
+
+def write_snapshot(path: str, index: dict, version: str):
+    """
+    Atomically writes the address -> bitmask index as a snapshot file.
+    """
+    listed = list(index)
+    hashes = _hashes(listed)
+    masks = np.fromiter(index.values(), dtype=np.uint8, count=len(index))
+    order = np.argsort(hashes, kind="stable")
+    hashes, masks = hashes[order], masks[order]
+    encoded = [listed[i].encode() for i in order.tolist()]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(address) for address in encoded], out=offsets[1:])
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(hashes), version.encode()[:16].ljust(16), int(offsets[-1])))
+            f.write(hashes.astype("<u8").tobytes())
+            f.write(masks.tobytes())
+            f.write(offsets.tobytes())
+            f.write(b"".join(encoded))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def _identity(stat) -> tuple:
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def file_identity(path: str):
+    """
+    Changes whenever a new snapshot is renamed into place; None when there is no snapshot.
+    """
+    try:
+        return _identity(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+
+class WatchlistSnapshot:
+    """
+    Read-only memory map of one snapshot file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.identity = _identity(os.fstat(f.fileno()))
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} watchlist snapshot.")
+        magic, format_version, count, version, size = HEADER.unpack_from(self._map)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            self._map.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} watchlist snapshot.")
+        if len(self._map) != HEADER.size + 17 * count + 8 + size:
+            self._map.close()
+            raise ValueError(f"{path} is a truncated watchlist snapshot.")
+        self.version = version.decode().strip()
+        # Views into the mapped pages, nothing is copied
+        self.hashes = np.frombuffer(self._map, dtype="<u8", count=count, offset=HEADER.size)
+        self.masks = np.frombuffer(self._map, dtype=np.uint8, count=count, offset=HEADER.size + 8 * count)
+        self.offsets = np.frombuffer(self._map, dtype="<u8", count=count + 1, offset=HEADER.size + 9 * count)
+        self._addresses_at = HEADER.size + 17 * count + 8
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    def _address(self, offsets: np.ndarray, position: int) -> bytes:
+        start = self._addresses_at
+        return self._map[start + int(offsets[position]):start + int(offsets[position + 1])]
+
+    def _lookup(self, addresses: list) -> np.ndarray:
+        # Local views keep the map open should the snapshot be closed meanwhile
+        stored, masks, offsets = self.hashes, self.masks, self.offsets
+        result = np.zeros(len(addresses), dtype=np.int64)
+        if not len(stored) or not len(addresses):
+            return result
+        hashes = _hashes(addresses)
+        positions = np.searchsorted(stored, hashes)
+        hits = positions < len(stored)
+        hits[hits] = stored[positions[hits]] == hashes[hits]
+        # Only hash hits are confirmed, against every stored address sharing the hash
+        for i in np.flatnonzero(hits).tolist():
+            encoded = addresses[i].encode()
+            position = int(positions[i])
+            while position < len(stored) and stored[position] == hashes[i]:
+                if self._address(offsets, position) == encoded:
+                    result[i] = masks[position]
+                    break
+                position += 1
+        return result
+
+    def lookup(self, address: str) -> int:
+        return int(self._lookup([address])[0])
+
+    def lookup_many(self, addresses) -> np.ndarray:
+        return self._lookup(list(addresses))
+
+    def addresses(self) -> list:
+        """
+        Every listed address, in hash order.
+        """
+        offsets = self.offsets
+        return [self._address(offsets, position).decode() for position in range(len(offsets) - 1)]
+
+    def close(self):
+        """
+        Unmaps the file. A lookup still running on this snapshot keeps the pages mapped, they are then
+        released with its views.
+        """
+        self.hashes, self.masks, self.offsets = np.empty(0, dtype="<u8"), np.empty(0, dtype=np.uint8), np.zeros(1, dtype="<u8")
+        try:
+            self._map.close()
+        except BufferError:
+            pass
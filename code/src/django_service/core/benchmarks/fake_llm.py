@@ -0,0 +1,53 @@
+# Scripted stand-in for ChatOpenAI used by the benchmarks: no network, deterministic answers and an
+# optional fixed latency per call to model the LLM round trip.
+
+import time
+import uuid
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+CHECK_SEQUENCE = ("check_structuring", "check_sanctions", "check_layering")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    With tools bound it replays the ReAct screening: one check per turn, then compute_risk_score over the
+    check results, then a final answer. Without tools (the scoring prompt) it answers with `score`.
+    """
+
+    score: int = 5
+    latency: float = 0.0
+    tool_names: tuple = ()
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": tuple(tool.name for tool in tools)})
+
+    def _next_message(self, messages) -> AIMessage:
+        if not self.tool_names:
+            return AIMessage(content=str(self.score))
+
+        results = [message for message in messages if isinstance(message, ToolMessage)]
+        called = {message.name for message in results}
+        for name in CHECK_SEQUENCE:
+            if name in self.tool_names and name not in called:
+                return AIMessage(content="", tool_calls=[{"name": name, "args": {}, "id": f"call_{uuid.uuid4().hex}"}])
+        if "compute_risk_score" in self.tool_names and "compute_risk_score" not in called:
+            args = {"analysis_results": [str(message.content) for message in results]}
+            return AIMessage(content="", tool_calls=[{"name": "compute_risk_score", "args": args, "id": f"call_{uuid.uuid4().hex}"}])
+        return AIMessage(content="Screening complete.")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._next_message(messages)
+        # Rough token counts (4 characters per token) so usage accounting has something to report
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = max(1, len(str(message.content)) // 4 + 10 * len(message.tool_calls))
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=message)])
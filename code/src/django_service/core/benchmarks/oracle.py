@@ -0,0 +1,160 @@
+# Local stand-in for the oracle-service backend (localhost:8080) used by the benchmarks.
+#
+# generate_graph builds a reproducible synthetic transaction graph: wallets with a tunable average
+# number of transactions, rapid 3-4 hop cycles through a share of the wallets and a share of wallets
+# on the sanctions / mixer / darknet lists. OracleServer serves it over HTTP with the same paths and
+# JSON shapes as the real service (/transactions/<address>, /sanctions/all, /mixers/all, /darknet/all).
+
+import json
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass(frozen=True)
+class GraphSpec:
+    wallets: int = 1000
+    # Average number of transactions per wallet
+    degree: int = 20
+    # Share of wallets that start a rapid cycle
+    cycle_density: float = 0.05
+    # Share of wallets on the sanctions, mixer and darknet lists
+    flagged_ratio: float = 0.01
+    seed: int = 7
+    # Prefix of every generated address, keeps the graphs of several specs apart in the transaction store
+    prefix: str = "w"
+
+
+@dataclass
+class SyntheticGraph:
+    spec: GraphSpec
+    transactions: dict = field(default_factory=dict)
+    watchlists: dict = field(default_factory=dict)
+
+    def sample_wallets(self, count: int) -> list:
+        """
+        Returns `count` reproducible wallets that are not on any watchlist.
+        """
+        flagged = {address for addresses in self.watchlists.values() for address in addresses}
+        candidates = sorted(address for address in self.transactions if address not in flagged)
+        rng = np.random.default_rng(self.spec.seed)
+        return [candidates[i] for i in rng.choice(len(candidates), size=min(count, len(candidates)), replace=False)]
+
+
+def _timestamp(seconds: int) -> str:
+    return (BASE_TIME + timedelta(seconds=int(seconds))).isoformat().replace("+00:00", "Z")
+
+
+def generate_graph(spec: GraphSpec) -> SyntheticGraph:
+    rng = np.random.default_rng(spec.seed)
+    n = spec.wallets
+    addresses = [f"{spec.prefix}{i}" for i in range(n)]
+
+    count = n * spec.degree // 2
+    senders = rng.integers(0, n, count)
+    receivers = (senders + rng.integers(1, n, count)) % n
+    seconds = rng.integers(0, 30 * 86400, count)
+    amounts = rng.uniform(100, 20000, count).round(2)
+    edges = list(zip(senders.tolist(), receivers.tolist(), seconds.tolist(), amounts.tolist()))
+
+    for origin in np.flatnonzero(rng.random(n) < spec.cycle_density).tolist():
+        length = int(rng.integers(3, 5))
+        members = [origin] + [int(m) for m in rng.choice(np.delete(np.arange(n), origin), length - 1, replace=False)]
+        start = int(rng.integers(0, 30 * 86400))
+        for hop, sender in enumerate(members):
+            receiver = members[(hop + 1) % length]
+            edges.append((sender, receiver, start + 60 * hop, round(float(rng.uniform(1000, 9000)), 2)))
+
+    graph = SyntheticGraph(spec, {address: [] for address in addresses})
+    for i, (sender, receiver, ts, amount) in enumerate(sorted(edges, key=lambda edge: edge[2])):
+        tx = {
+            "hash": f"{spec.prefix}tx{i}",
+            "timestamp": _timestamp(ts),
+            "sender": addresses[sender],
+            "receiver": addresses[receiver],
+            "amount": str(amount),
+            "denom": "uatom",
+        }
+        graph.transactions[addresses[sender]].append(tx)
+        graph.transactions[addresses[receiver]].append(tx)
+
+    flagged = rng.choice(n, size=int(n * spec.flagged_ratio), replace=False).tolist()
+    graph.watchlists = {
+        "sanctioned": [addresses[i] for i in flagged[0::3]],
+        "mixers": [addresses[i] for i in flagged[1::3]],
+        "darknet": [addresses[i] for i in flagged[2::3]],
+    }
+    return graph
+
+
+class OracleServer:
+    """
+    Serves a SyntheticGraph on 127.0.0.1 (an ephemeral port by default) from a background thread.
+    Use as a context manager; `url` is the base URL to set as AML_BACKEND_URL.
+    """
+
+    def __init__(self, graph: SyntheticGraph, port: int = 0):
+        self.graph = graph
+        self.requests = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        server = self
+        lists = {"/sanctions/all": "sanctioned", "/mixers/all": "mixers", "/darknet/all": "darknet"}
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.requests += 1
+                url = urlparse(self.path)
+                if url.path in lists:
+                    key = lists[url.path]
+                    body = {key: server.graph.watchlists.get(key, [])}
+                elif url.path.startswith("/transactions/"):
+                    address = url.path.rsplit("/", 1)[-1]
+                    transactions = server.graph.transactions.get(address, [])
+                    since = parse_qs(url.query).get("since")
+                    if since:
+                        # ISO timestamps of one format compare in time order
+                        transactions = [tx for tx in transactions if tx["timestamp"] >= since[0]]
+                    body = {"address": address, "count": len(transactions), "transactions": transactions}
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,161 @@
+# Benchmark runner: screens sampled wallets of synthetic graphs through the real /compute-risk/ view
+# against an OracleServer and the scripted chat model, and times every tool call.
+#
+# Tool timings are the aml_tool_duration_seconds observations of the metrics callback handler
+# (core/llm_metrics.py), recorded with metrics.recording(), so the tools and the fast pipeline's nodes
+# are measured exactly as in production, including the thread pool of the parallel checks.
+#
+# Every measurement starts from an empty transaction store and score cache: a cold pass pays the
+# ingestion and is reported apart from the warm passes that follow it, so neither the order of the
+# modes nor of the tools skews the numbers.
+
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.test import Client, override_settings
+
+from core import llm_metrics, metrics, workflow  # noqa: F401 (llm_metrics times the tools)
+from core.models import AddressCursor, Transaction
+from core.agents.scoring import clear_cache
+from core.agents.tools.fetch_transactions import TransactionSnapshot
+from core.agents.tools.layering_check import analyze_layering
+from core.agents.tools.risk_score_calculation import build_chain, set_chain
+from core.agents.tools.sanction_check import analyze_sanctions
+from core.agents.watchlist import get_watchlist
+from core.benchmarks.fake_llm import ScriptedChatModel
+from core.benchmarks.oracle import GraphSpec, OracleServer, generate_graph
+
+def summarize(durations: list) -> dict:
+    """
+    Latency summary in milliseconds.
+    """
+    if not durations:
+        return {"count": 0}
+    ordered = sorted(durations)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _timed(fn, *args, **kwargs) -> float:
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def _reset():
+    # Empty transaction store (ingestion starts over) and score cache
+    Transaction.objects.all().delete()
+    AddressCursor.objects.all().delete()
+    clear_cache()
+
+
+def _screen(client: Client, wallets: list, mode: str, iterations: int) -> dict:
+    latencies = []
+    errors = 0
+    with metrics.recording("aml_tool_duration_seconds", "tool") as durations:
+        for _ in range(iterations):
+            for wallet in wallets:
+                start = time.perf_counter()
+                # refresh bypasses the result cache so every request runs the checks
+                response = client.get("/compute-risk/", {"wallet_address": wallet, "mode": mode, "refresh": "true"})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+    return {
+        "endpoint": summarize(latencies),
+        "errors": errors,
+        "tools": {name: summarize(durations.get(name, [])) for name in metrics.TOOL_NAMES},
+    }
+
+
+def _bench_endpoint(client: Client, wallets: list, mode: str, iterations: int) -> dict:
+    # One cold pass over the wallets, then `iterations` warm ones
+    _reset()
+    cold = _screen(client, wallets, mode, 1)
+    return {"cold": cold, **_screen(client, wallets, mode, iterations)}
+
+
+def _bench_tool(check, wallets: list) -> dict:
+    _reset()
+    cold = [_timed(check, wallet) for wallet in wallets]
+    warm = [_timed(check, wallet) for wallet in wallets]
+    return {"cold": summarize(cold), "warm": summarize(warm)}
+
+
+def _bench_hops(wallets: list, hops: int) -> dict:
+    # Each tool gets its own snapshot per call and an emptied store, so neither one benefits from the other's fetches
+    return {
+        "check_sanctions": _bench_tool(lambda wallet: analyze_sanctions(wallet, hops, TransactionSnapshot()), wallets),
+        "check_layering": _bench_tool(lambda wallet: analyze_layering(wallet, max_hops=hops, fetch=TransactionSnapshot().batch), wallets),
+    }
+
+
+def run_benchmarks(
+    degrees=(10, 100),
+    hops=(1, 2, 3),
+    modes=("fast", "agent"),
+    iterations: int = 3,
+    samples: int = 5,
+    wallets: int = 1000,
+    cycle_density: float = 0.05,
+    flagged_ratio: float = 0.01,
+    llm_latency: float = 0.0,
+    seed: int = 7,
+    log=None,
+) -> dict:
+    """
+    Runs the benchmark matrix and returns the JSON-serializable report. Needs a database (the caller
+    provides a throwaway one) since the view persists results and the transaction store ingests.
+    """
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "parameters": {
+            "degrees": list(degrees), "hops": list(hops), "modes": list(modes), "iterations": iterations,
+            "samples": samples, "wallets": wallets, "cycle_density": cycle_density,
+            "flagged_ratio": flagged_ratio, "llm_latency": llm_latency, "seed": seed,
+        },
+        "settings": {
+            "AML_TRANSACTION_STORE": settings.AML_TRANSACTION_STORE,
+            "AML_SCORING_RULES_ENABLED": settings.AML_SCORING_RULES_ENABLED,
+            "AML_SHORT_CIRCUIT_FINDINGS": settings.AML_SHORT_CIRCUIT_FINDINGS,
+        },
+        "runs": [],
+    }
+
+    workflow.set_agent(workflow.build_agent(ScriptedChatModel(latency=llm_latency)))
+    set_chain(build_chain(ScriptedChatModel(latency=llm_latency)))
+    client = Client()
+    try:
+        for degree in degrees:
+            spec = GraphSpec(wallets=wallets, degree=degree, cycle_density=cycle_density,
+                             flagged_ratio=flagged_ratio, seed=seed, prefix=f"d{degree}w")
+            graph = generate_graph(spec)
+            targets = graph.sample_wallets(samples)
+            with OracleServer(graph) as server, override_settings(AML_BACKEND_URL=server.url):
+                get_watchlist().refresh()
+                for mode in modes:
+                    if log:
+                        log(f"degree={degree} mode={mode}")
+                    run = {"degree": degree, "mode": mode, **_bench_endpoint(client, targets, mode, iterations)}
+                    report["runs"].append(run)
+                for hop_count in hops:
+                    if log:
+                        log(f"degree={degree} hops={hop_count}")
+                    report["runs"].append({"degree": degree, "hops": hop_count, "tools": _bench_hops(targets, hop_count)})
+                report.setdefault("backend_requests", {})[str(degree)] = server.requests
+    finally:
+        workflow.set_agent(None)
+        set_chain(None)
+
+    report["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return report
@@ -0,0 +1,155 @@
+# Checkpoint storage for the ReAct agent. Each screening runs on its own thread id, and the
+# savers below keep only the most recently used threads (bounded by count and age) so that
+# long-running workers do not accumulate every conversation they have ever had. A thread is never
+# evicted while its screening is still running (see BoundedThreadsMixin.active).
+#
+# The SQLite backend has a sync saver (SqliteSaver) for invoke/stream and an async one
+# (AsyncSqliteSaver, on the running event loop) for ainvoke/astream: the sync saver's async methods
+# are not implemented.
+
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from langgraph.checkpoint.memory import InMemorySaver
+
+
+class BoundedThreadsMixin:
+    """
+    Tracks when each checkpoint thread was last written and deletes threads that are older than
+    `ttl` seconds or fall outside the `max_threads` most recently used ones, except active threads.
+    """
+
+    def __init__(self, *args, max_threads: int = 256, ttl: float = 900, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_threads = max_threads
+        self.ttl = ttl
+        self._last_used = OrderedDict()
+        self._active = Counter()
+        self._threads_lock = threading.RLock()
+
+    @contextmanager
+    def active(self, thread_id: str):
+        """
+        Marks the thread as running for the duration of the block: it is not evicted meanwhile.
+        """
+        with self._threads_lock:
+            self._active[thread_id] += 1
+        try:
+            yield
+        finally:
+            with self._threads_lock:
+                self._active[thread_id] -= 1
+                if not self._active[thread_id]:
+                    del self._active[thread_id]
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        for thread_id in self._touch(config["configurable"]["thread_id"]):
+            super().delete_thread(thread_id)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        result = super().put_writes(config, writes, task_id, task_path)
+        for thread_id in self._touch(config["configurable"]["thread_id"]):
+            super().delete_thread(thread_id)
+        return result
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        for thread_id in self._touch(config["configurable"]["thread_id"]):
+            await super().adelete_thread(thread_id)
+        return result
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        result = await super().aput_writes(config, writes, task_id, task_path)
+        for thread_id in self._touch(config["configurable"]["thread_id"]):
+            await super().adelete_thread(thread_id)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._threads_lock:
+            self._last_used.pop(thread_id, None)
+        super().delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        with self._threads_lock:
+            self._last_used.pop(thread_id, None)
+        await super().adelete_thread(thread_id)
+
+    def _touch(self, thread_id: str) -> list:
+        # Records the write and returns the threads to delete, already dropped from the LRU. The written
+        # thread itself is kept, like the active ones.
+        now = time.monotonic()
+        with self._threads_lock:
+            self._last_used[thread_id] = now
+            self._last_used.move_to_end(thread_id)
+            excess = len(self._last_used) - self.max_threads
+            evicted = []
+            for candidate, last_used in self._last_used.items():
+                if excess <= 0 and now - last_used <= self.ttl:
+                    break
+                if candidate in self._active or candidate == thread_id:
+                    continue
+                evicted.append(candidate)
+                excess -= 1
+            for candidate in evicted:
+                del self._last_used[candidate]
+            return evicted
+
+
+class BoundedInMemorySaver(BoundedThreadsMixin, InMemorySaver):
+    pass
+
+
+def _bounds() -> dict:
+    return {
+        "max_threads": settings.AML_CHECKPOINT_MAX_THREADS,
+        "ttl": settings.AML_CHECKPOINT_TTL,
+    }
+
+
+def _sqlite_module(name: str):
+    import importlib
+    try:
+        return importlib.import_module(name)
+    except ImportError as e:
+        raise ImportError("AML_CHECKPOINT_BACKEND='sqlite' requires the langgraph-checkpoint-sqlite package.") from e
+
+
+def build_checkpointer():
+    """
+    Builds the agent checkpointer configured by AML_CHECKPOINT_BACKEND ("memory" or "sqlite").
+    """
+    backend = settings.AML_CHECKPOINT_BACKEND
+    if backend == "memory":
+        return BoundedInMemorySaver(**_bounds())
+    if backend == "sqlite":
+        SqliteSaver = _sqlite_module("langgraph.checkpoint.sqlite").SqliteSaver
+
+        class BoundedSqliteSaver(BoundedThreadsMixin, SqliteSaver):
+            pass
+
+        conn = sqlite3.connect(str(settings.AML_CHECKPOINT_SQLITE_PATH), check_same_thread=False)
+        return BoundedSqliteSaver(conn, **_bounds())
+    raise ValueError(f"Unknown AML_CHECKPOINT_BACKEND '{backend}', expected 'memory' or 'sqlite'.")
+
+
+def build_async_checkpointer():
+    """
+    The checkpointer of the async entry points, bound to the running event loop, or None when the
+    sync one (build_checkpointer) serves them as well.
+    """
+    if settings.AML_CHECKPOINT_BACKEND != "sqlite":
+        return None
+    AsyncSqliteSaver = _sqlite_module("langgraph.checkpoint.sqlite.aio").AsyncSqliteSaver
+    import aiosqlite
+
+    class BoundedAsyncSqliteSaver(BoundedThreadsMixin, AsyncSqliteSaver):
+        pass
+
+    # Opened by the saver's setup() on first use
+    return BoundedAsyncSqliteSaver(aiosqlite.connect(str(settings.AML_CHECKPOINT_SQLITE_PATH)), **_bounds())
@@ -0,0 +1,173 @@
+# Asynchronous screening jobs backed by the ScreeningJob table.
+#
+# POST /compute-risk/jobs/ enqueues a job (reusing the queued/running job of the same wallet, mode and
+# webhook if there is one) and a pool of worker threads, started with `manage.py run_screening_workers`,
+# claims jobs in priority order, screens the wallet and stores the result for polling. A webhook
+# is POSTed the finished job when one was given; webhook hosts must be allow-listed in
+# AML_JOBS_WEBHOOK_ALLOWED_HOSTS, so jobs cannot be used to make this service call internal addresses.
+# Workers survive errors of a single iteration (e.g. a locked database) and put jobs left running by a
+# dead worker back in the queue every AML_JOBS_REQUEUE_INTERVAL seconds.
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from core import metrics
+from core.models import AMLRequest, ScreeningJob
+from core.result_cache import screen_wallet
+from core.serializers import ScreeningJobSerializer
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lower runs first: oracle signing requests go before regular and backfill screenings
+PRIORITIES = {
+    "oracle": 0,
+    "default": 5,
+    "backfill": 10,
+}
+
+
+def webhook_error(webhook_url: str):
+    """
+    Returns why the webhook URL is not accepted, or None: it must be http(s) and its host listed in
+    AML_JOBS_WEBHOOK_ALLOWED_HOSTS (an entry starting with "." also allows its subdomains).
+    """
+    try:
+        parts = urlsplit(webhook_url)
+        host = (parts.hostname or "").lower()
+        parts.port
+    except ValueError:
+        return "Webhook URL is malformed."
+    if parts.scheme not in ("http", "https") or not host:
+        return "Webhook URL must be an http(s) URL."
+    if parts.username or parts.password:
+        return "Webhook URL must not carry credentials."
+    for allowed in settings.AML_JOBS_WEBHOOK_ALLOWED_HOSTS:
+        allowed = allowed.lower()
+        if host == allowed or (allowed.startswith(".") and host.endswith(allowed)):
+            return None
+    return f"Webhook host {host} is not allowed."
+
+
+def enqueue(wallet_address: str, priority: str = "default", mode: str = "", webhook_url: str = "") -> ScreeningJob:
+    """
+    Returns the in-flight job of the same request (wallet, mode and webhook) if there is one, raising
+    its priority if needed, otherwise a new queued job.
+    """
+    lane = PRIORITIES[priority]
+    request = {"wallet_address": wallet_address, "mode": mode or settings.AML_PIPELINE_MODE, "webhook_url": webhook_url or ""}
+    while True:
+        job = ScreeningJob.objects.filter(status__in=ScreeningJob.ACTIVE, **request).first()
+        if job is None:
+            try:
+                with transaction.atomic():
+                    return ScreeningJob.objects.create(priority=lane, **request)
+            except IntegrityError:
+                # Created concurrently (unique_active_screening_job), share that one
+                continue
+        if job.status == ScreeningJob.QUEUED and lane < job.priority:
+            ScreeningJob.objects.filter(pk=job.pk, status=ScreeningJob.QUEUED).update(priority=lane)
+            job.priority = lane
+        return job
+
+
+def claim_next_job():
+    """
+    Atomically moves the highest-priority queued job to running and returns it, or None.
+    """
+    while True:
+        job_id = (
+            ScreeningJob.objects
+            .filter(status=ScreeningJob.QUEUED)
+            .order_by("priority", "created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+        if job_id is None:
+            return None
+        # Conditional update: only one worker can win the transition out of "queued"
+        claimed = ScreeningJob.objects.filter(pk=job_id, status=ScreeningJob.QUEUED).update(
+            status=ScreeningJob.RUNNING, started_at=timezone.now()
+        )
+        if claimed:
+            return ScreeningJob.objects.get(pk=job_id)
+
+
+def requeue_stale_jobs() -> int:
+    """
+    Puts jobs left running longer than AML_JOBS_RUNNING_TIMEOUT (e.g. by a killed worker) back in the queue.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.AML_JOBS_RUNNING_TIMEOUT)
+    return ScreeningJob.objects.filter(status=ScreeningJob.RUNNING, started_at__lt=cutoff).update(status=ScreeningJob.QUEUED, started_at=None)
+
+
+def run_job(job: ScreeningJob):
+    try:
+        risk_score, failed_checks, fields = screen_wallet(job.wallet_address, job.mode or None)
+        if fields is not None:
+            with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"):
+                AMLRequest.objects.update_or_create(wallet_address=job.wallet_address, mode=fields['mode'], defaults=fields)
+        job.status = ScreeningJob.DONE
+        job.risk_score = risk_score
+        job.failed_checks = failed_checks
+    except Exception as e:
+        job.status = ScreeningJob.FAILED
+        job.error = str(e)
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "risk_score", "failed_checks", "error", "finished_at"])
+
+    if job.webhook_url:
+        _deliver_webhook(job)
+
+
+def _deliver_webhook(job: ScreeningJob):
+    # Checked again at delivery, the allow-list may have changed since the job was queued
+    error = webhook_error(job.webhook_url)
+    if error is not None:
+        logger.warning("Webhook of job %s not delivered: %s", job.id, error)
+        return
+    try:
+        requests.post(
+            job.webhook_url, json=ScreeningJobSerializer(job).data, timeout=settings.AML_JOBS_WEBHOOK_TIMEOUT, allow_redirects=False,
+        ).raise_for_status()
+        metrics.inc("aml_job_webhooks_total", {"outcome": "delivered"})
+    except Exception as e:
+        metrics.inc("aml_job_webhooks_total", {"outcome": "failed"})
+        logger.warning("Webhook delivery failed for job %s: %s", job.id, e)
+
+
+def worker_loop(stop_event: threading.Event, poll_interval: float):
+    requeued_at = None
+    while not stop_event.is_set():
+        try:
+            close_old_connections()
+            if requeued_at is None or time.monotonic() - requeued_at >= settings.AML_JOBS_REQUEUE_INTERVAL:
+                requeue_stale_jobs()
+                requeued_at = time.monotonic()
+            job = claim_next_job()
+            if job is None:
+                stop_event.wait(poll_interval)
+                continue
+            run_job(job)
+        except Exception:
+            # A claimed job whose result could not be saved stays running until it is requeued
+            logger.exception("Screening worker iteration failed")
+            close_old_connections()
+            stop_event.wait(poll_interval)
+
+
+def start_workers(num_workers: int, poll_interval: float, stop_event: threading.Event) -> list:
+    workers = [
+        threading.Thread(target=worker_loop, args=(stop_event, poll_interval), name=f"screening-worker-{i}", daemon=True)
+        for i in range(num_workers)
+    ]
+    for worker in workers:
+        worker.start()
+    return workers
@@ -0,0 +1,98 @@
+# LangChain callback handler feeding the metrics registry and tracing of core/metrics.py. It is
+# registered for every LangChain / LangGraph run of the process once this module is imported, which
+# core/pipeline.py and core/workflow.py do before building their graphs.
+
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from core import metrics
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Times the AML tools / check nodes and the chat model calls of every LangChain run, and counts tokens.
+    """
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, metric: str, name: str, labels: dict, parent_run_id=None):
+        otel_span = None
+        tracer = metrics.get_tracer()
+        if tracer is not None:
+            from opentelemetry import trace
+            with self._lock:
+                parent = self._runs.get(parent_run_id)
+            context = trace.set_span_in_context(parent[3]) if parent and parent[3] is not None else None
+            otel_span = tracer.start_span(name, context=context, attributes={f"aml.{k}": str(v) for k, v in labels.items()})
+        with self._lock:
+            self._runs[run_id] = (metric, labels, time.perf_counter(), otel_span)
+
+    def _end(self, run_id, error: BaseException = None):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return None
+        metric, labels, start, otel_span = run
+        metrics.observe(metric, time.perf_counter() - start, labels)
+        if otel_span is not None:
+            if error is not None:
+                otel_span.record_exception(error)
+            otel_span.end()
+        return labels
+
+    def _start_tool(self, serialized, run_id, parent_run_id, kwargs):
+        name = kwargs.get("name") or (serialized or {}).get("name")
+        if name in metrics.TOOL_NAMES:
+            self._start(run_id, "aml_tool_duration_seconds", f"tool {name}", {"tool": name}, parent_run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start_tool(serialized, run_id, parent_run_id, kwargs)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start_tool(serialized, run_id, parent_run_id, kwargs)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized or {}).get("name", "unknown")
+        self._start(run_id, "aml_llm_request_duration_seconds", f"llm {model}", {"model": model}, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        labels = self._end(run_id)
+        if labels is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                for kind in ("input", "output"):
+                    if usage.get(f"{kind}_tokens"):
+                        metrics.inc("aml_llm_tokens_total", {**labels, "type": kind}, usage[f"{kind}_tokens"])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+# The handler is attached to every LangChain / LangGraph run of the process
+_callback_handler = ContextVar(
+    "aml_metrics_callback_handler",
+    default=MetricsCallbackHandler() if settings.AML_METRICS_ENABLED else None
+)
+register_configure_hook(_callback_handler, inheritable=True)
@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.agents.watchlist import WatchlistCache
+from core.agents.watchlist_snapshot import file_identity, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Compiles the sanctions, mixer and darknet lists into the shared watchlist snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default=settings.AML_WATCHLIST_SNAPSHOT_PATH)
+        parser.add_argument("--watch", action="store_true", help="Keep running and write a new snapshot whenever a list changes.")
+        parser.add_argument("--interval", type=float, default=settings.AML_WATCHLIST_TTL, help="Seconds between list checks with --watch.")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("Set AML_WATCHLIST_SNAPSHOT_PATH or pass --path.")
+        # Lists are only fetched by refresh(), with their ETags, never in the background
+        watchlist = WatchlistCache(ttl=float("inf"))
+        written_version = None
+        while True:
+            try:
+                watchlist.refresh()
+            except Exception as e:
+                if not options["watch"]:
+                    raise CommandError(f"Watchlist refresh failed: {e}")
+                self.stderr.write(f"Watchlist refresh failed: {e}")
+            else:
+                if watchlist.version != written_version or file_identity(path) is None:
+                    index = watchlist.index()
+                    write_snapshot(path, index, watchlist.version)
+                    written_version = watchlist.version
+                    self.stdout.write(f"Wrote {len(index)} addresses (version {written_version}) to {path}.")
+            if not options["watch"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.agents.structuring import StructuringConfig
+from core.agents.transactions import format_timestamp
+from core.structuring_monitor import StructuringMonitor, file_records, open_cursor, store_records
+
+
+class Command(BaseCommand):
+    help = "Feeds new transactions into the online structuring detector and reports the senders that breach."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--source", choices=["store", "file"], default="store", help="The local transaction store or a JSON-lines file of backend records.")
+        parser.add_argument("--path", help="JSON-lines file read with --source file.")
+        parser.add_argument("--follow", action="store_true", help="Keep running and consume new transactions as they arrive.")
+        parser.add_argument("--interval", type=float, default=settings.AML_STRUCTURING_MONITOR_INTERVAL, help="Seconds between polls with --follow.")
+        parser.add_argument("--batch-size", type=int, default=settings.AML_STRUCTURING_MONITOR_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options["source"] == "file":
+            if not options["path"]:
+                raise CommandError("--source file needs --path.")
+            path = os.path.abspath(options["path"])
+            name = f"structuring:file:{path}"
+            read = lambda offset, limit: file_records(path, offset, limit)
+        else:
+            name = "structuring:store"
+            read = store_records
+
+        config = StructuringConfig.from_settings()
+        cursor = open_cursor(name, config)
+        monitor = StructuringMonitor(config)
+        processed = 0
+        while True:
+            records, offset = read(cursor.position["offset"], options["batch_size"])
+            if records or offset != cursor.position["offset"]:
+                alerts = monitor.observe(records)
+                cursor.position = {**cursor.position, "offset": offset}
+                monitor.flush(cursor)
+                processed += len(records)
+                for sender, breach in alerts:
+                    self.stdout.write(
+                        f"Structuring alert: {sender} sent {breach['total_amount']:,.2f} in {breach['transaction_count']} "
+                        f"transfers between {format_timestamp(breach['window_start'])} and {format_timestamp(breach['window_end'])}."
+                    )
+                # Drain the backlog before polling again
+                continue
+            if not options["follow"]:
+                self.stdout.write(f"Processed {processed} transactions.")
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.agents.watchlist import get_watchlist
+from core.taint import propagate
+
+
+class Command(BaseCommand):
+    help = "Propagates watchlist taint over the local transaction store into the taint table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-hops", type=int, default=settings.AML_TAINT_MAX_HOPS)
+        parser.add_argument("--no-sync", action="store_true", help="Build from the store as it is, without syncing the neighbourhoods of the listed entities first.")
+        parser.add_argument("--watch", action="store_true", help="Keep running and rebuild the table whenever the watchlist changes.")
+        parser.add_argument("--interval", type=float, default=settings.AML_TAINT_REFRESH_INTERVAL, help="Seconds between watchlist checks with --watch.")
+
+    def handle(self, *args, **options):
+        watchlist = get_watchlist()
+        propagated_version = None
+        while True:
+            if watchlist.version != propagated_version:
+                # Read before the rebuild, so a change while it runs triggers another one
+                propagated_version = watchlist.version
+                started = time.perf_counter()
+                records = propagate(options["max_hops"], sync=not options["no_sync"])
+                self.stdout.write(f"Wrote {records} taint records in {time.perf_counter() - started:.1f}s.")
+            if not options["watch"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
+            try:
+                watchlist.refresh()
+            except Exception as e:
+                self.stderr.write(f"Watchlist refresh failed: {e}")
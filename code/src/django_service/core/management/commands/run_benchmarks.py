@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from core.benchmarks.runner import run_benchmarks
+
+
+def _ints(value: str) -> list:
+    return [int(item) for item in value.split(",") if item]
+
+
+class Command(BaseCommand):
+    help = "Benchmarks /compute-risk/ and every AML tool against a simulated oracle backend and a scripted LLM, and writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--degrees", type=_ints, default=[10, 100], help="Comma separated average transactions per wallet.")
+        parser.add_argument("--hops", type=_ints, default=[1, 2, 3], help="Comma separated hop counts for the sanctions and layering tools.")
+        parser.add_argument("--modes", default="fast,agent", help="Comma separated pipeline modes.")
+        parser.add_argument("--iterations", type=int, default=3)
+        parser.add_argument("--samples", type=int, default=5, help="Wallets screened per graph.")
+        parser.add_argument("--wallets", type=int, default=1000, help="Wallets per synthetic graph.")
+        parser.add_argument("--cycle-density", type=float, default=0.05)
+        parser.add_argument("--flagged-ratio", type=float, default=0.01)
+        parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to every scripted LLM call.")
+        parser.add_argument("--seed", type=int, default=7)
+        parser.add_argument("--output", help="JSON file to write, defaults to stdout.")
+
+    def handle(self, *args, **options):
+        if not settings.AML_METRICS_ENABLED:
+            raise CommandError("The tools are timed through the metrics, set AML_METRICS_ENABLED=true.")
+        # Screenings are persisted and ingested into a throwaway test database, never the configured one.
+        # SQLite gets a file instead of the shared in-memory database, which cannot take the concurrent writes of the checks.
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite":
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "benchmark.sqlite3")
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_benchmarks(
+                degrees=options["degrees"],
+                hops=options["hops"],
+                modes=[mode for mode in options["modes"].split(",") if mode],
+                iterations=options["iterations"],
+                samples=options["samples"],
+                wallets=options["wallets"],
+                cycle_density=options["cycle_density"],
+                flagged_ratio=options["flagged_ratio"],
+                llm_latency=options["llm_latency"],
+                seed=options["seed"],
+                log=self.stderr.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
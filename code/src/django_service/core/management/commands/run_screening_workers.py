@@ -0,0 +1,27 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.jobs import start_workers
+
+
+class Command(BaseCommand):
+    help = "Runs the worker pool that processes queued screening jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.AML_JOBS_WORKERS)
+        parser.add_argument("--poll-interval", type=float, default=settings.AML_JOBS_POLL_INTERVAL)
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        workers = start_workers(options["workers"], options["poll_interval"], stop_event)
+        self.stdout.write(f"Started {len(workers)} screening workers.")
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=1)
+        except KeyboardInterrupt:
+            stop_event.set()
+            for worker in workers:
+                worker.join()
@@ -0,0 +1,179 @@
+# Process-wide metrics and tracing of the screening pipeline.
+#
+# Counters and histograms live in a small in-process registry rendered in the Prometheus text format
+# by the /metrics/ view. Tool calls, check nodes and LLM calls are measured by a LangChain callback
+# handler registered for every run (core/llm_metrics.py, loaded with the LangChain stack), backend
+# HTTP calls and database writes by span() around the call. With AML_OTEL_ENABLED each span is also exported as an OpenTelemetry span (needs the
+# optional requirements-otel.txt; exporters are configured the usual way, e.g. opentelemetry-instrument).
+
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Histogram buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Runs measured by the callback handler: the AML tools (agent mode) and check nodes (fast mode)
+TOOL_NAMES = ("check_structuring", "check_sanctions", "check_layering", "compute_risk_score")
+
+HELP = {
+    "aml_tool_duration_seconds": "Duration of AML tool calls and pipeline check nodes.",
+    "aml_backend_request_duration_seconds": "Duration of oracle-service backend requests.",
+    "aml_backend_response_bytes_total": "Bytes received from the oracle-service backend.",
+    "aml_llm_request_duration_seconds": "Duration of chat model calls.",
+    "aml_llm_tokens_total": "Tokens used by chat model calls.",
+    "aml_db_write_duration_seconds": "Duration of database writes.",
+    "aml_cache_requests_total": "Cache lookups by cache and result.",
+    "aml_sanctions_addresses_expanded_total": "Addresses whose transactions were screened, by sanctions hop.",
+    "aml_layering_nodes_expanded_total": "Addresses expanded by the layering cycle search.",
+    "aml_screenings_total": "Screenings by pipeline mode and source (result cache or pipeline).",
+    "aml_screening_duration_seconds": "Duration of whole screenings by pipeline mode.",
+    "aml_job_webhooks_total": "Screening job webhook deliveries by outcome.",
+}
+
+_lock = threading.Lock()
+# name -> {sorted label items: value}
+_counters = {}
+# name -> {sorted label items: [bucket counts..., sum, count]}
+_histograms = {}
+
+# [metric, label, {label value: [values]}] of every recording() block in progress
+_recordings = []
+
+_tracer = None
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def inc(name: str, labels: dict = None, value: float = 1):
+    if not settings.AML_METRICS_ENABLED:
+        return
+    with _lock:
+        series = _counters.setdefault(name, {})
+        key = _key(labels)
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name: str, value: float, labels: dict = None):
+    if not settings.AML_METRICS_ENABLED:
+        return
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        key = _key(labels)
+        values = series.get(key)
+        if values is None:
+            values = series[key] = [0] * (len(BUCKETS) + 2)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                values[i] += 1
+        values[-2] += value
+        values[-1] += 1
+        for recorded_metric, label, recorded in _recordings:
+            if recorded_metric == name:
+                recorded.setdefault((labels or {}).get(label), []).append(value)
+
+
+@contextmanager
+def recording(metric: str, label: str):
+    """
+    Collects every value observed into the `metric` histogram during the block, from any thread, as
+    {value of `label`: [values]}; the benchmarks use it for percentiles the buckets cannot give.
+    """
+    entry = (metric, label, {})
+    with _lock:
+        _recordings.append(entry)
+    try:
+        yield entry[2]
+    finally:
+        with _lock:
+            _recordings[:] = [other for other in _recordings if other is not entry]
+
+
+def get_tracer():
+    global _tracer
+    if _tracer is None and settings.AML_OTEL_ENABLED:
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("AML_OTEL_ENABLED requires the opentelemetry-api package (pip install -r requirements-otel.txt).") from e
+        _tracer = trace.get_tracer("aml")
+    return _tracer
+
+
+class Span:
+    """
+    Handle yielded by span(): attributes set on it are exported with the OpenTelemetry span.
+    """
+
+    def __init__(self, otel_span=None):
+        self.otel_span = otel_span
+
+    def set(self, key: str, value):
+        if self.otel_span is not None:
+            self.otel_span.set_attribute(key, value)
+
+
+@contextmanager
+def span(name: str, metric: str, **labels):
+    """
+    Times the block into the `metric` histogram (labelled with `labels`) and, with OpenTelemetry
+    enabled, records it as a span called `name`.
+    """
+    tracer = get_tracer()
+    start = time.perf_counter()
+    if tracer is None:
+        try:
+            yield Span()
+        finally:
+            observe(metric, time.perf_counter() - start, labels)
+        return
+    with tracer.start_as_current_span(name, attributes={f"aml.{k}": str(v) for k, v in labels.items()}) as otel_span:
+        try:
+            yield Span(otel_span)
+        finally:
+            observe(metric, time.perf_counter() - start, labels)
+
+
+def cache_lookup(cache: str, hit: bool):
+    inc("aml_cache_requests_total", {"cache": cache, "result": "hit" if hit else "miss"})
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def render() -> str:
+    """
+    Renders every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value:g}")
+        for name, series in sorted(_histograms.items()):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, values in sorted(series.items()):
+                for bound, count in zip(BUCKETS, values):
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {values[-1]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {values[-2]:g}")
+                lines.append(f"{name}_count{_format_labels(key)} {values[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_alter_amlrequest_risk_score'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='amlrequest',
+            name='wallet_address',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='amlrequest',
+            name='computed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='amlrequest',
+            name='failed_checks',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='amlrequest',
+            name='fingerprint',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_amlrequest_result_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=255, unique=True)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Transaction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_hash', models.CharField(max_length=128)),
+                ('sender', models.CharField(max_length=255)),
+                ('receiver', models.CharField(max_length=255)),
+                ('amount', models.CharField(max_length=64)),
+                ('denom', models.CharField(blank=True, default='', max_length=64)),
+                ('timestamp', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sender', 'timestamp'], name='core_transa_sender_5827fc_idx'), models.Index(fields=['receiver', 'timestamp'], name='core_transa_receive_028dd5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tx_hash', 'sender', 'receiver', 'amount', 'denom'), name='unique_transaction_transfer')],
+            },
+        ),
+    ]
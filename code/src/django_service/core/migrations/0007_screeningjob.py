@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:19
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_riskscorecache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScreeningJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('wallet_address', models.CharField(db_index=True, max_length=255)),
+                ('mode', models.CharField(blank=True, default='', max_length=16)),
+                ('priority', models.IntegerField(default=5)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16)),
+                ('webhook_url', models.URLField(blank=True, default='', max_length=1024)),
+                ('risk_score', models.IntegerField(blank=True, null=True)),
+                ('failed_checks', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'priority', 'created_at'], name='core_screen_status_3eff05_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-17 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_screeningjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaintRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=255)),
+                ('category', models.CharField(max_length=16)),
+                ('hop', models.IntegerField()),
+                ('path', models.JSONField(default=list)),
+                ('watchlist_version', models.CharField(db_index=True, max_length=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('address', 'category'), name='unique_taint_address_category')],
+            },
+        ),
+    ]
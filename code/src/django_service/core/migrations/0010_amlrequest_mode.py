@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_structuringstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amlrequest',
+            name='mode',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_amlrequest_mode'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='screeningjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('wallet_address', 'mode', 'webhook_url'), name='unique_active_screening_job'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_screeningjob_unique_active'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taintrecord',
+            name='max_hops',
+            field=models.IntegerField(default=0),
+        ),
+    ]
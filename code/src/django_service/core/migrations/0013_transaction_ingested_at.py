@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:44
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_taintrecord_max_hops'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='ingested_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['ingested_at', 'id'], name='core_transa_ingeste_94d3ca_idx'),
+        ),
+    ]
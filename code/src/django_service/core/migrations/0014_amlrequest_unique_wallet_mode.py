@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-17 13:50
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def delete_duplicates(apps, schema_editor):
+    # Keeps the most recently computed row of every (wallet_address, mode)
+    AMLRequest = apps.get_model('core', 'AMLRequest')
+    rows = (
+        AMLRequest.objects.order_by('wallet_address', 'mode', F('computed_at').desc(nulls_last=True), '-id')
+        .values_list('id', 'wallet_address', 'mode')
+    )
+    previous, duplicates = None, []
+    for pk, wallet_address, mode in rows.iterator(chunk_size=2000):
+        if (wallet_address, mode) == previous:
+            duplicates.append(pk)
+        previous = (wallet_address, mode)
+    for start in range(0, len(duplicates), 500):
+        AMLRequest.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_transaction_ingested_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='amlrequest',
+            constraint=models.UniqueConstraint(fields=('wallet_address', 'mode'), name='unique_amlrequest_wallet_mode'),
+        ),
+    ]
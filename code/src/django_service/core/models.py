@@ -1,8 +1,153 @@
+import uuid
 from django.db import models
+from django.utils import timezone
 
 class AMLRequest(models.Model):
-    wallet_address = models.CharField(max_length= 255)
+    wallet_address = models.CharField(max_length= 255, db_index= True)
+    # Pipeline mode the score was computed with, one row per wallet and mode
+    mode = models.CharField(max_length= 16, blank= True, default= '')
     risk_score = models.IntegerField(default= 0)
+    # Result cache: fingerprint of the transaction set + watchlist version the score was computed on
+    fingerprint = models.CharField(max_length= 64, blank= True, default= '')
+    failed_checks = models.JSONField(default= list, blank= True)
+    computed_at = models.DateTimeField(null= True, blank= True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields= ['wallet_address', 'mode'], name= 'unique_amlrequest_wallet_mode'),
+        ]
 
     def __str__(self):
         return f"{self.wallet_address} - {self.risk_score}"
+
+
+class Transaction(models.Model):
+    # Local copy of the oracle-service transactions, ingested incrementally per address (core/transaction_store.py)
+    tx_hash = models.CharField(max_length= 128)
+    sender = models.CharField(max_length= 255)
+    receiver = models.CharField(max_length= 255)
+    amount = models.CharField(max_length= 64)
+    denom = models.CharField(max_length= 64, blank= True, default= '')
+    timestamp = models.DateTimeField(db_index= True)
+    # When the row was written: the structuring monitor reads the store in (ingested_at, id) order
+    ingested_at = models.DateTimeField(default= timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields= ['tx_hash', 'sender', 'receiver', 'amount', 'denom'], name= 'unique_transaction_transfer'),
+        ]
+        indexes = [
+            models.Index(fields= ['sender', 'timestamp']),
+            models.Index(fields= ['receiver', 'timestamp']),
+            models.Index(fields= ['ingested_at', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.sender} -> {self.receiver}: {self.amount} {self.denom}"
+
+
+class AddressCursor(models.Model):
+    # Ingestion cursor: latest transaction timestamp stored for the address and when it was last synced
+    address = models.CharField(max_length= 255, unique= True)
+    last_timestamp = models.DateTimeField(null= True, blank= True)
+    synced_at = models.DateTimeField(null= True, blank= True)
+
+    def __str__(self):
+        return f"{self.address} - {self.last_timestamp}"
+
+
+class TaintRecord(models.Model):
+    # Precomputed watchlist exposure (core/taint.py): nearest hop at which the address reaches an entity of the
+    # category over the local transaction graph, with one witness path address -> ... -> listed entity
+    address = models.CharField(max_length= 255)
+    category = models.CharField(max_length= 16)
+    hop = models.IntegerField()
+    path = models.JSONField(default= list)
+    watchlist_version = models.CharField(max_length= 16, db_index= True)
+    # Hop limit the table was built with, it answers screenings up to that many hops only
+    max_hops = models.IntegerField(default= 0)
+    updated_at = models.DateTimeField(auto_now= True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields= ['address', 'category'], name= 'unique_taint_address_category'),
+        ]
+
+    def __str__(self):
+        return f"{self.address} - {self.category} at hop {self.hop}"
+
+
+class StructuringState(models.Model):
+    # Online structuring detector state of one sender (core/structuring_monitor.py): its sub-limit transfers in the
+    # current window as [epoch seconds, amount, hash] with their sum, the newest transaction seen and the first breach
+    sender = models.CharField(max_length= 255, unique= True)
+    config = models.CharField(max_length= 64)
+    window = models.JSONField(default= list)
+    window_total = models.FloatField(default= 0)
+    last_timestamp = models.BigIntegerField(default= 0)
+    flagged = models.BooleanField(default= False)
+    breach = models.JSONField(null= True, blank= True)
+    updated_at = models.DateTimeField(auto_now= True)
+
+    def __str__(self):
+        return f"{self.sender} - {'flagged' if self.flagged else 'clear'}"
+
+
+class FeedCursor(models.Model):
+    # Position of a continuous consumer in its source, e.g. the structuring monitor's [ingested_at, id] watermark
+    name = models.CharField(max_length= 255, unique= True)
+    position = models.JSONField(default= dict)
+    updated_at = models.DateTimeField(auto_now= True)
+
+    def __str__(self):
+        return f"{self.name} - {self.position}"
+
+
+class RiskScoreCache(models.Model):
+    # Persistent half of the scoring cache (core/agents/scoring.py): normalized findings hash -> score
+    key = models.CharField(max_length= 64, unique= True)
+    risk_score = models.IntegerField()
+    created_at = models.DateTimeField(auto_now_add= True)
+
+    def __str__(self):
+        return f"{self.key} - {self.risk_score}"
+
+
+class ScreeningJob(models.Model):
+    # Asynchronous screening request processed by the worker pool (core/jobs.py)
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+    ACTIVE = [QUEUED, RUNNING]
+
+    id = models.UUIDField(primary_key= True, default= uuid.uuid4, editable= False)
+    wallet_address = models.CharField(max_length= 255, db_index= True)
+    mode = models.CharField(max_length= 16, blank= True, default= '')
+    # Lower runs first, see core.jobs.PRIORITIES
+    priority = models.IntegerField(default= 5)
+    status = models.CharField(max_length= 16, choices= STATUS_CHOICES, default= QUEUED)
+    webhook_url = models.URLField(max_length= 1024, blank= True, default= '')
+    risk_score = models.IntegerField(null= True, blank= True)
+    failed_checks = models.JSONField(default= list, blank= True)
+    error = models.TextField(blank= True, default= '')
+    created_at = models.DateTimeField(auto_now_add= True)
+    started_at = models.DateTimeField(null= True, blank= True)
+    finished_at = models.DateTimeField(null= True, blank= True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields= ['status', 'priority', 'created_at']),
+        ]
+        constraints = [
+            # At most one in-flight job per request: concurrent identical requests share it (core.jobs.enqueue)
+            models.UniqueConstraint(
+                fields= ['wallet_address', 'mode', 'webhook_url'],
+                condition= models.Q(status__in= ['queued', 'running']),
+                name= 'unique_active_screening_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.wallet_address} - {self.status}"
@@ -0,0 +1,161 @@
+# Deterministic fast-path pipeline: runs the AML checks directly and goes straight to scoring,
+# without the ReAct LLM loop picking the tool order.
+#
+# The wallet's transactions are fetched once into a TransactionSnapshot shared by every check.
+# The sanctions, structuring and layering nodes then run in the same LangGraph superstep, so they
+# execute concurrently on the graph's thread pool and their results are merged into
+# AmlState.analysis_results before scoring.
+#
+# A screen_watchlist node runs first: when the wallet itself is on a watchlist and that finding is in the
+# short-circuit policy (AML_SHORT_CIRCUIT_FINDINGS), the graph ends right there with AML_SHORT_CIRCUIT_SCORE.
+#
+# Every node also has a native coroutine, so pipeline.ainvoke (arun_pipeline) runs the same graph on
+# an AsyncTransactionSnapshot and the async backend client without any worker threads.
+
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langgraph.graph import StateGraph, START, END
+from core import llm_metrics  # noqa: F401 (measures every run)
+from core.agents.models.aml_state import AmlState
+from core.agents.tools.behaviour_check import analyze_structuring, aanalyze_structuring, structuring_state, astructuring_state
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from core.agents.tools.layering_check import analyze_layering, aanalyze_layering, layering_summary
+from core.agents.tools.sanction_check import analyze_sanctions, aanalyze_sanctions, direct_flag_result
+from core.agents.scoring import normalize_findings, short_circuit_findings
+from core.agents.watchlist import aget_watchlist
+from django.conf import settings
+from core.agents.tools.risk_score_calculation import score_analysis_results, ascore_analysis_results
+
+CHECK_NODES = ("check_sanctions", "check_structuring", "check_layering")
+
+
+def _snapshot(config: RunnableConfig) -> TransactionSnapshot:
+    return config["configurable"]["snapshot"]
+
+
+def short_circuit_result(wallet_address: str):
+    """
+    Returns the state update ending the screening when the wallet is directly flagged with a finding
+    of the short-circuit policy, or None.
+    """
+    result = direct_flag_result(wallet_address)
+    if result is None or not short_circuit_findings(normalize_findings([result])):
+        return None
+    return {"analysis_results": [result], "risk_score": settings.AML_SHORT_CIRCUIT_SCORE}
+
+
+async def ashort_circuit_result(wallet_address: str):
+    # The lookup itself is a dict probe once the watchlist is loaded
+    await aget_watchlist()
+    return short_circuit_result(wallet_address)
+
+
+def screen_node(state: AmlState):
+    return short_circuit_result(state['wallet_address']) or {}
+
+
+def route_after_screen(state: AmlState):
+    return END if state.get('analysis_results') else "fetch_transactions"
+
+
+def fetch_node(state: AmlState, config: RunnableConfig):
+    _snapshot(config).batch(state['wallet_address'])
+    return {}
+
+
+async def afetch_node(state: AmlState, config: RunnableConfig):
+    await _snapshot(config).batch(state['wallet_address'])
+    return {}
+
+
+def sanctions_node(state: AmlState, config: RunnableConfig):
+    result = analyze_sanctions(state['wallet_address'], state.get('max_hops', 1), snapshot=_snapshot(config))
+    return {"analysis_results": [result]}
+
+
+async def asanctions_node(state: AmlState, config: RunnableConfig):
+    result = await aanalyze_sanctions(state['wallet_address'], state.get('max_hops', 1), snapshot=_snapshot(config))
+    return {"analysis_results": [result]}
+
+
+def structuring_node(state: AmlState, config: RunnableConfig):
+    chunks = _snapshot(config).chunks(state['wallet_address'])
+    monitored = structuring_state(state['wallet_address'])
+    return {"analysis_results": [analyze_structuring(chunks, state['wallet_address'], monitored)]}
+
+
+async def astructuring_node(state: AmlState, config: RunnableConfig):
+    chunks = _snapshot(config).chunks(state['wallet_address'])
+    monitored = await astructuring_state(state['wallet_address'])
+    return {"analysis_results": [await aanalyze_structuring(chunks, state['wallet_address'], monitored)]}
+
+
+def layering_node(state: AmlState, config: RunnableConfig):
+    result = analyze_layering(state['wallet_address'], fetch=_snapshot(config).batch)
+    return {"analysis_results": [layering_summary(result)]}
+
+
+async def alayering_node(state: AmlState, config: RunnableConfig):
+    result = await aanalyze_layering(state['wallet_address'], snapshot=_snapshot(config))
+    return {"analysis_results": [layering_summary(result)]}
+
+
+def score_node(state: AmlState):
+    return {"risk_score": score_analysis_results(state.get('analysis_results', []))}
+
+
+async def ascore_node(state: AmlState):
+    return {"risk_score": await ascore_analysis_results(state.get('analysis_results', []))}
+
+
+builder = StateGraph(AmlState)
+builder.add_node("screen_watchlist", screen_node)
+builder.add_node("fetch_transactions", RunnableLambda(fetch_node, afunc=afetch_node))
+builder.add_node("check_sanctions", RunnableLambda(sanctions_node, afunc=asanctions_node))
+builder.add_node("check_structuring", RunnableLambda(structuring_node, afunc=astructuring_node))
+builder.add_node("check_layering", RunnableLambda(layering_node, afunc=alayering_node))
+builder.add_node("compute_risk_score", RunnableLambda(score_node, afunc=ascore_node))
+builder.add_edge(START, "screen_watchlist")
+builder.add_conditional_edges("screen_watchlist", route_after_screen, ["fetch_transactions", END])
+for node in CHECK_NODES:
+    builder.add_edge("fetch_transactions", node)
+builder.add_edge(list(CHECK_NODES), "compute_risk_score")
+builder.add_edge("compute_risk_score", END)
+
+pipeline = builder.compile()
+
+
+def _pipeline_input(wallet_address: str, max_hops: int):
+    return {"wallet_address": wallet_address, "max_hops": max_hops, "risk_score": 0, "messages": []}
+
+
+def run_pipeline(wallet_address: str, max_hops: int = 1, snapshot: TransactionSnapshot = None):
+    """
+    Runs the fast-path pipeline and returns the final state with risk_score and analysis_results.
+    Pass a snapshot to share already fetched transactions between several runs.
+    """
+    config = {"configurable": {"snapshot": snapshot or TransactionSnapshot()}}
+    return pipeline.invoke(_pipeline_input(wallet_address, max_hops), config=config)
+
+
+def stream_pipeline(wallet_address: str, max_hops: int = 1, snapshot: TransactionSnapshot = None):
+    """
+    Runs the fast-path pipeline and yields each node's state update ({node: update}) as soon as it completes.
+    """
+    config = {"configurable": {"snapshot": snapshot or TransactionSnapshot()}}
+    return pipeline.stream(_pipeline_input(wallet_address, max_hops), config=config, stream_mode="updates")
+
+
+def astream_pipeline(wallet_address: str, max_hops: int = 1, snapshot: AsyncTransactionSnapshot = None):
+    """
+    Async variant of stream_pipeline, an async iterator of the node updates.
+    """
+    config = {"configurable": {"snapshot": snapshot or AsyncTransactionSnapshot()}}
+    return pipeline.astream(_pipeline_input(wallet_address, max_hops), config=config, stream_mode="updates")
+
+
+async def arun_pipeline(wallet_address: str, max_hops: int = 1, snapshot: AsyncTransactionSnapshot = None):
+    """
+    Async variant of run_pipeline, every check awaits the async backend client.
+    """
+    config = {"configurable": {"snapshot": snapshot or AsyncTransactionSnapshot()}}
+    return await pipeline.ainvoke(_pipeline_input(wallet_address, max_hops), config=config)
@@ -0,0 +1,173 @@
+# Risk score result cache. A score is reused for the same pipeline mode while the wallet's transaction
+# set and the watchlist version are unchanged (same fingerprint) and it is younger than AML_RESULT_CACHE_MAX_AGE.
+# Hot entries are served from an in-process LRU, everything else from the AMLRequest table.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from core import metrics
+from core.models import AMLRequest
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from core.agents.transactions import TransactionBatch
+from core.agents.watchlist import get_watchlist, aget_watchlist
+from core.workflow import invoke_agent, ainvoke_agent, short_circuit, ashort_circuit
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _fingerprint(batch: TransactionBatch) -> str:
+    digest = hashlib.sha256(get_watchlist().version.encode())
+    rows = sorted("|".join(map(str, row)) for row in batch.rows())
+    for row in rows:
+        digest.update(row.encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def fingerprint(wallet_address: str, snapshot: TransactionSnapshot) -> str:
+    """
+    Hashes the wallet's current transaction set (order independent) together with the watchlist version.
+    """
+    return _fingerprint(snapshot.batch(wallet_address))
+
+
+async def afingerprint(wallet_address: str, snapshot: AsyncTransactionSnapshot) -> str:
+    await aget_watchlist()
+    return _fingerprint(await snapshot.batch(wallet_address))
+
+
+def _remember(wallet_address: str, mode: str, entry: tuple):
+    with _lru_lock:
+        _lru[wallet_address, mode] = entry
+        _lru.move_to_end((wallet_address, mode))
+        while len(_lru) > settings.AML_RESULT_CACHE_SIZE:
+            _lru.popitem(last=False)
+
+
+def _lru_entry(wallet_address: str, mode: str):
+    with _lru_lock:
+        entry = _lru.get((wallet_address, mode))
+        if entry is not None:
+            _lru.move_to_end((wallet_address, mode))
+    return entry
+
+
+def _stored_query(wallet_address: str, mode: str):
+    return AMLRequest.objects.filter(wallet_address=wallet_address, mode=mode).exclude(fingerprint='').order_by('-computed_at')
+
+
+def _remember_stored(wallet_address: str, mode: str, obj):
+    if obj is None or obj.computed_at is None:
+        return None
+    entry = (obj.fingerprint, obj.computed_at.timestamp(), obj.risk_score, obj.failed_checks)
+    _remember(wallet_address, mode, entry)
+    return entry
+
+
+def _fresh(entry, wallet_fingerprint: str):
+    if entry is None:
+        return None
+    max_age = settings.AML_RESULT_CACHE_MAX_AGE
+    cached_fingerprint, computed_at, risk_score, failed_checks = entry
+    if cached_fingerprint != wallet_fingerprint or time.time() - computed_at > max_age:
+        return None
+    return risk_score, failed_checks
+
+
+def get_cached_result(wallet_address: str, mode: str, wallet_fingerprint: str):
+    """
+    Returns (risk_score, failed_checks) of a fresh result computed in the same mode on the same fingerprint, or None.
+    """
+    entry = _lru_entry(wallet_address, mode)
+    if entry is None:
+        entry = _remember_stored(wallet_address, mode, _stored_query(wallet_address, mode).first())
+    return _fresh(entry, wallet_fingerprint)
+
+
+async def aget_cached_result(wallet_address: str, mode: str, wallet_fingerprint: str):
+    entry = _lru_entry(wallet_address, mode)
+    if entry is None:
+        entry = _remember_stored(wallet_address, mode, await _stored_query(wallet_address, mode).afirst())
+    return _fresh(entry, wallet_fingerprint)
+
+
+def cache_result(wallet_address: str, mode: str, wallet_fingerprint: str, risk_score: int, failed_checks: list) -> dict:
+    """
+    Records a freshly computed result in the LRU and returns the AMLRequest field values to persist,
+    the row being identified by wallet_address and mode.
+    """
+    computed_at = timezone.now()
+    _remember(wallet_address, mode, (wallet_fingerprint, computed_at.timestamp(), risk_score, failed_checks))
+    return {
+        'mode': mode,
+        'risk_score': risk_score,
+        'fingerprint': wallet_fingerprint,
+        'failed_checks': failed_checks,
+        'computed_at': computed_at,
+    }
+
+
+def _short_circuit(wallet_address: str, mode: str, flagged):
+    # A directly flagged wallet is scored before its transactions are fetched for the fingerprint.
+    # The row is still written (without a fingerprint, so it is never served from the cache) to
+    # replace a result stored before the wallet was listed.
+    if flagged is None:
+        return None
+    metrics.inc("aml_screenings_total", {"mode": mode, "source": "short_circuit"})
+    risk_score, failed_checks = flagged
+    return risk_score, failed_checks, cache_result(wallet_address, mode, '', risk_score, failed_checks)
+
+
+def screen_wallet(wallet_address: str, mode: str = None, snapshot: TransactionSnapshot = None, refresh: bool = False):
+    """
+    Screens a wallet through the result cache. Returns (risk_score, failed_checks, fields): fields holds
+    the AMLRequest values to persist and is None when the result came from the cache.
+    """
+    mode = mode or settings.AML_PIPELINE_MODE
+    flagged = _short_circuit(wallet_address, mode, short_circuit(wallet_address))
+    if flagged is not None:
+        return flagged
+    snapshot = snapshot or TransactionSnapshot()
+    wallet_fingerprint = fingerprint(wallet_address, snapshot)
+    if not refresh:
+        cached = get_cached_result(wallet_address, mode, wallet_fingerprint)
+        metrics.cache_lookup("result", cached is not None)
+        if cached is not None:
+            metrics.inc("aml_screenings_total", {"mode": mode, "source": "cache"})
+            return cached[0], cached[1], None
+
+    with metrics.span("screening", "aml_screening_duration_seconds", mode=mode):
+        risk_score, failed_checks = invoke_agent(wallet_address, mode=mode, snapshot=snapshot)
+    metrics.inc("aml_screenings_total", {"mode": mode, "source": "pipeline"})
+    fields = cache_result(wallet_address, mode, wallet_fingerprint, int(risk_score), failed_checks)
+    return int(risk_score), failed_checks, fields
+
+
+async def ascreen_wallet(wallet_address: str, mode: str = None, snapshot: AsyncTransactionSnapshot = None, refresh: bool = False):
+    """
+    Async variant of screen_wallet.
+    """
+    mode = mode or settings.AML_PIPELINE_MODE
+    flagged = _short_circuit(wallet_address, mode, await ashort_circuit(wallet_address))
+    if flagged is not None:
+        return flagged
+    snapshot = snapshot or AsyncTransactionSnapshot()
+    wallet_fingerprint = await afingerprint(wallet_address, snapshot)
+    if not refresh:
+        cached = await aget_cached_result(wallet_address, mode, wallet_fingerprint)
+        metrics.cache_lookup("result", cached is not None)
+        if cached is not None:
+            metrics.inc("aml_screenings_total", {"mode": mode, "source": "cache"})
+            return cached[0], cached[1], None
+
+    with metrics.span("screening", "aml_screening_duration_seconds", mode=mode):
+        risk_score, failed_checks = await ainvoke_agent(wallet_address, mode=mode, snapshot=snapshot)
+    metrics.inc("aml_screenings_total", {"mode": mode, "source": "pipeline"})
+    fields = cache_result(wallet_address, mode, wallet_fingerprint, int(risk_score), failed_checks)
+    return int(risk_score), failed_checks, fields
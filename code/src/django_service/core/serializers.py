@@ -1,8 +1,13 @@
 from rest_framework import serializers
-from .models import AMLRequest
+from .models import AMLRequest, ScreeningJob
 
 class AMLRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = AMLRequest
         fields = ['wallet_address', 'risk_score']
 
+
+class ScreeningJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ScreeningJob
+        fields = ['id', 'wallet_address', 'status', 'priority', 'risk_score', 'failed_checks', 'error', 'created_at', 'started_at', 'finished_at']
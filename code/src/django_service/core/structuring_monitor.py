@@ -0,0 +1,258 @@
+# Online structuring detector.
+#
+# `manage.py monitor_structuring` consumes transactions as they arrive (from the local transaction store,
+# which ingestion fills from the backend, or from a JSON-lines file standing in for a queue) and keeps,
+# per sender, the sub-limit transfers of its trailing AML_STRUCTURING_WINDOW in a deque with their running
+# sum. Each transaction expires the entries that fell out of the window and is compared with the threshold,
+# O(1) amortized. A sender whose window ever exceeds the threshold is flagged, like a breach found by
+# core/agents/structuring.py over the whole history. The state is persisted in StructuringState, so the
+# monitor resumes after a restart and, with AML_STRUCTURING_MONITOR, check_structuring reads the flag and
+# only replays the sender's transactions newer than the state instead of rescanning its history.
+#
+# Transactions are expected roughly in time order per sender: one at or after the newest is appended, a
+# late one is kept in a min-heap next to the deque while it still falls in the sender's current window
+# (O(log n)) and ignored otherwise. Replays are recognised by (timestamp, hash) in O(1).
+#
+# The store is read in (ingested_at, id) order from a watermark, and only rows ingested more than
+# AML_STRUCTURING_MONITOR_LAG seconds ago: IDs and ingestion times are assigned before a transaction
+# commits, so rows of a slower concurrent ingestion can appear below the newest visible ones for a moment.
+
+import heapq
+import json
+from collections import deque
+from datetime import datetime, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core import metrics
+from core.models import FeedCursor, StructuringState, Transaction
+from core.agents.transactions import to_epoch_seconds
+
+
+def config_key(config) -> str:
+    # States are only valid for the limit, threshold and window they were built with
+    return f"{config.transaction_limit:g}:{config.threshold:g}:{config.window.total_seconds():g}"
+
+
+class SlidingWindow:
+    """
+    Sub-limit transfers of one sender within the trailing window, as a deque of (timestamp, amount, hash)
+    in time order plus a min-heap of the late ones, and their sum.
+    """
+
+    def __init__(self, entries=(), total: float = 0.0):
+        self.entries = deque(tuple(entry) for entry in entries)
+        self.late = []
+        self.total = total
+        self._seen = {(entry[0], entry[2]) for entry in self.entries if entry[2]}
+
+    def __len__(self) -> int:
+        return len(self.entries) + len(self.late)
+
+    def items(self) -> list:
+        """
+        All entries of the window in time order (the persisted form).
+        """
+        if not self.late:
+            return list(self.entries)
+        return list(heapq.merge(self.entries, sorted(self.late), key=lambda entry: entry[0]))
+
+    def add(self, timestamp: int, amount: float, tx_hash: str, window_seconds: float) -> bool:
+        """
+        Adds a transfer and expires the entries older than the window ending at the newest one.
+        Returns False for a transfer that was already added or is older than the window.
+        """
+        entries = self.entries
+        if tx_hash and (timestamp, tx_hash) in self._seen:
+            return False
+        if not entries or timestamp >= entries[-1][0]:
+            entries.append((timestamp, amount, tx_hash))
+        elif timestamp <= entries[-1][0] - window_seconds:
+            return False
+        else:
+            heapq.heappush(self.late, (timestamp, amount, tx_hash))
+        if tx_hash:
+            self._seen.add((timestamp, tx_hash))
+        self.total += amount
+        start = entries[-1][0] - window_seconds
+        while entries[0][0] <= start:
+            self._expire(entries.popleft())
+        while self.late and self.late[0][0] <= start:
+            self._expire(heapq.heappop(self.late))
+        return True
+
+    def _expire(self, entry):
+        self._seen.discard((entry[0], entry[2]))
+        self.total -= entry[1]
+
+    def breach(self, threshold: float):
+        """
+        The current window as {window_start, window_end, total_amount, transaction_count} if its sum
+        exceeds the threshold, else None.
+        """
+        if self.total <= threshold:
+            return None
+        start = min(self.entries[0][0], self.late[0][0]) if self.late else self.entries[0][0]
+        return {
+            "window_start": int(start),
+            "window_end": int(self.entries[-1][0]),
+            "total_amount": self.total,
+            "transaction_count": len(self),
+        }
+
+
+class StructuringMonitor:
+    """
+    Feeds transactions into the per-sender windows. States are loaded for each batch of transactions and
+    written back by flush(), so memory is bounded by the batch, not by the number of senders.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.key = config_key(config)
+        self.window_seconds = config.window.total_seconds()
+        self._states = {}
+
+    def _load(self, senders):
+        missing = [sender for sender in set(senders) if sender not in self._states]
+        for state in StructuringState.objects.filter(sender__in=missing, config=self.key):
+            self._states[state.sender] = (state, SlidingWindow(state.window, state.window_total))
+        for sender in missing:
+            if sender not in self._states:
+                self._states[sender] = (StructuringState(sender=sender, config=self.key), SlidingWindow())
+
+    def observe(self, records: list) -> list:
+        """
+        Feeds (tx_hash, sender, amount, epoch seconds) records, oldest first, and returns the
+        (sender, breach) pairs of the senders that became flagged.
+        """
+        self._load(record[1] for record in records)
+        alerts = []
+        for tx_hash, sender, amount, timestamp in records:
+            state, window = self._states[sender]
+            state.last_timestamp = max(state.last_timestamp, timestamp)
+            if amount >= self.config.transaction_limit:
+                continue
+            if not window.add(timestamp, amount, tx_hash, self.window_seconds) or state.flagged:
+                continue
+            breach = window.breach(self.config.threshold)
+            if breach is not None:
+                state.flagged, state.breach = True, breach
+                alerts.append((sender, breach))
+        return alerts
+
+    def flush(self, cursor: FeedCursor = None):
+        """
+        Writes the changed states, and the source cursor with them, in one transaction.
+        """
+        created, updated = [], []
+        for state, window in self._states.values():
+            state.window = [list(entry) for entry in window.items()]
+            state.window_total = window.total
+            (updated if state.pk else created).append(state)
+        with metrics.span("db write", "aml_db_write_duration_seconds", table="structuring_state"), transaction.atomic():
+            StructuringState.objects.bulk_create(created, batch_size=1000)
+            StructuringState.objects.bulk_update(
+                updated, ["window", "window_total", "last_timestamp", "flagged", "breach"], batch_size=1000
+            )
+            if cursor is not None:
+                cursor.save()
+        self._states.clear()
+
+
+def open_cursor(name: str, config) -> FeedCursor:
+    """
+    The source cursor of a monitor. When the structuring settings changed since it was written, every
+    state is dropped and the source is consumed again from the start.
+    """
+    cursor, _ = FeedCursor.objects.get_or_create(name=name)
+    key = config_key(config)
+    if cursor.position.get("config") != key:
+        with transaction.atomic():
+            StructuringState.objects.exclude(config=key).delete()
+            cursor.position = {"config": key, "offset": 0}
+            cursor.save()
+    return cursor
+
+
+def store_records(offset, limit: int):
+    """
+    Up to `limit` transactions of the local store ingested after the [ingested_at, id] watermark `offset`
+    and at least AML_STRUCTURING_MONITOR_LAG seconds ago, as monitor records in time order, and the new
+    watermark. A cursor that is not a watermark yet (0, or a row id of an older version) starts over:
+    the windows drop the transfers they already hold.
+    """
+    query = Transaction.objects.filter(ingested_at__lte=timezone.now() - timedelta(seconds=settings.AML_STRUCTURING_MONITOR_LAG))
+    if isinstance(offset, list):
+        ingested_at, row_id = datetime.fromisoformat(offset[0]), offset[1]
+        query = query.filter(Q(ingested_at__gt=ingested_at) | Q(ingested_at=ingested_at, id__gt=row_id))
+    rows = list(
+        query.order_by("ingested_at", "id")
+        .values_list("ingested_at", "id", "tx_hash", "sender", "amount", "timestamp")[:limit]
+    )
+    if not rows:
+        return [], offset
+    records = [(tx_hash, sender, float(amount), int(timestamp.timestamp())) for _, _, tx_hash, sender, amount, timestamp in rows]
+    return sorted(records, key=lambda record: record[3]), [rows[-1][0].isoformat(), rows[-1][1]]
+
+
+def file_records(path: str, offset: int, limit: int):
+    """
+    Up to `limit` backend transaction records from a JSON-lines file, starting at byte `offset`, as monitor
+    records in time order, and the new offset. A last line still being written is left for the next read.
+    """
+    lines = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while len(lines) < limit:
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            if line.strip():
+                lines.append(json.loads(line))
+    timestamps = to_epoch_seconds([tx["timestamp"] for tx in lines])
+    records = [
+        (tx.get("hash", ""), tx["sender"], float(tx["amount"]), int(timestamp))
+        for tx, timestamp in zip(lines, timestamps)
+    ]
+    return sorted(records, key=lambda record: record[3]), offset
+
+
+def monitored_state(wallet: str, config):
+    """
+    The monitor's state of the wallet for the current settings, None when the monitor is disabled or
+    has not seen the wallet.
+    """
+    if not settings.AML_STRUCTURING_MONITOR:
+        return None
+    return StructuringState.objects.filter(sender=wallet, config=config_key(config)).first()
+
+
+async def amonitored_state(wallet: str, config):
+    if not settings.AML_STRUCTURING_MONITOR:
+        return None
+    return await StructuringState.objects.filter(sender=wallet, config=config_key(config)).afirst()
+
+
+def replay_breach(state: StructuringState, sent: list, config) -> bool:
+    """
+    Whether the wallet's state, continued with its sent transactions (TransactionBatches) from the
+    state's newest timestamp on, breaches. The persisted state itself is left unchanged.
+    """
+    if state.flagged:
+        return True
+    window = SlidingWindow(state.window, state.window_total)
+    window_seconds = config.window.total_seconds()
+    for batch in sent:
+        for i in np.argsort(batch.timestamps, kind="stable"):
+            timestamp = int(batch.timestamps[i])
+            if timestamp < state.last_timestamp or batch.amounts[i] >= config.transaction_limit:
+                continue
+            if window.add(timestamp, float(batch.amounts[i]), batch.hashes[i] or "", window_seconds) and window.breach(config.threshold):
+                return True
+    return False
@@ -0,0 +1,351 @@
+# Precomputed k-hop taint table for the sanctions check.
+#
+# Instead of expanding outward from every screened wallet, taint is propagated outward from every
+# sanctioned, mixer and darknet address over the local transaction graph (the Transaction store), up to
+# AML_TAINT_MAX_HOPS hops. Each reached address gets one TaintRecord per category with the nearest hop
+# and a witness path, so screening is one indexed lookup whatever max_hops is. `manage.py
+# propagate_taint` rebuilds the table for the current watchlist, after syncing the listed entities and
+# the addresses that pass their taint on into the store, so the table does not depend on which wallets
+# happened to be screened; transactions ingested in between are folded in incrementally by update_taint. The hub rules of the forward check apply: addresses in
+# AML_KNOWN_HUBS never pass taint on and addresses with more than AML_SANCTIONS_HUB_DEGREE
+# transactions are only tainted when they deal with a listed entity directly.
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import metrics
+from core.models import TaintRecord, Transaction
+from core.agents.transactions import addresses
+from core.agents.watchlist import CATEGORIES, get_watchlist
+
+logger = logging.getLogger(__name__)
+
+# Hop limit of the table per watchlist version, as (hops, monotonic time read). It is read again after
+# BUILT_HOPS_TTL seconds, so a rebuild with fewer hops by another process is noticed
+_built_hops = {}
+BUILT_HOPS_TTL = 10.0
+# Addresses per IN (...) query, below SQLite's bound parameter limit
+QUERY_BATCH = 500
+
+
+def _batches(values: list):
+    for start in range(0, len(values), QUERY_BATCH):
+        yield values[start:start + QUERY_BATCH]
+
+
+def _load_edges():
+    rows = list(Transaction.objects.values_list("sender", "receiver").iterator(chunk_size=10000))
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    senders, receivers = zip(*rows)
+    return addresses.intern_many(senders), addresses.intern_many(receivers)
+
+
+def _bfs(sources, senders, receivers, hubs, barriers, max_hops):
+    # Multi-source BFS over local node indices; returns (hop, parent) arrays, -1 where unreached
+    hop = np.full(len(hubs), -1, dtype=np.int64)
+    parent = np.full(len(hubs), -1, dtype=np.int64)
+    hop[sources] = 0
+    for distance in range(1, max_hops + 1):
+        frontier = hop == distance - 1
+        if distance >= 2:
+            # Listed entities are always seen by their counterparties, barriers only stop further hops
+            frontier &= ~barriers
+        # Both directions of every edge leaving the frontier towards an unreached address
+        forward = frontier[senders] & (hop[receivers] == -1)
+        backward = frontier[receivers] & (hop[senders] == -1)
+        reached = np.concatenate([receivers[forward], senders[backward]])
+        via = np.concatenate([senders[forward], receivers[backward]])
+        if distance >= 2:
+            keep = ~hubs[reached]
+            reached, via = reached[keep], via[keep]
+        if not len(reached):
+            break
+        reached, first = np.unique(reached, return_index=True)
+        hop[reached] = distance
+        parent[reached] = via[first]
+    return hop, parent
+
+
+def _sync(address: str):
+    # Imported here, the store folds what it ingests into this module's table
+    from core.transaction_store import sync_address
+
+    try:
+        sync_address(address)
+    except Exception as e:
+        logger.warning("Could not sync %s, its transactions are missing from the taint table: %s", address, e)
+    finally:
+        connection.close()
+
+
+def sync_neighbourhoods(listed: list, max_hops: int):
+    """
+    Syncs the listed entities, and every address within max_hops - 1 hops of them that passes taint on,
+    into the transaction store: their transactions are the edges of every path the table covers. The
+    hub rules of _bfs decide which addresses pass taint on, judged once their own transactions are in.
+    """
+    barriers = {"", *settings.AML_KNOWN_HUBS}
+    frontier, seen = sorted(set(listed)), set(listed)
+    for distance in range(max_hops):
+        with ThreadPoolExecutor(max_workers=settings.AML_BACKEND_MAX_CONCURRENCY) as executor:
+            list(executor.map(_sync, frontier))
+        if distance == max_hops - 1:
+            break
+        neighbourhood = _Neighbourhood()
+        neighbourhood.load(frontier)
+        next_frontier = set()
+        for address in frontier:
+            if distance >= 1 and address in barriers:
+                continue
+            if distance >= 2 and neighbourhood.get(address)[1] > settings.AML_SANCTIONS_HUB_DEGREE:
+                continue
+            next_frontier.update(neighbourhood.get(address)[0] - seen)
+        frontier = sorted(next_frontier)
+        seen.update(frontier)
+        if not frontier:
+            break
+
+
+def propagate(max_hops: int = None, sync: bool = True) -> int:
+    """
+    Rebuilds the taint table for the current watchlist and returns the number of records written.
+    With `sync`, the neighbourhoods of the listed entities are ingested first (see sync_neighbourhoods).
+    """
+    max_hops = settings.AML_TAINT_MAX_HOPS if max_hops is None else max_hops
+    watchlist = get_watchlist()
+    version = watchlist.version
+    if sync:
+        sync_neighbourhoods(watchlist.addresses(), max_hops)
+    sender_ids, receiver_ids = _load_edges()
+    nodes = np.unique(np.concatenate([sender_ids, receiver_ids]))
+    senders, receivers = np.searchsorted(nodes, sender_ids), np.searchsorted(nodes, receiver_ids)
+    names = addresses.names(nodes)
+
+    degree = np.bincount(senders, minlength=len(nodes)) + np.bincount(receivers, minlength=len(nodes))
+    hubs = degree > settings.AML_SANCTIONS_HUB_DEGREE
+    barriers = np.isin(nodes, [addresses.intern(address) for address in ["", *settings.AML_KNOWN_HUBS]])
+    masks = watchlist.lookup_many(names)
+
+    records = []
+    for category, bit, _, _ in CATEGORIES:
+        sources = np.flatnonzero(masks & bit)
+        if not len(sources):
+            continue
+        hop, parent = _bfs(sources, senders, receivers, hubs, barriers, max_hops)
+        for node in np.flatnonzero(hop > 0).tolist():
+            path = [node]
+            while hop[path[-1]] > 0:
+                path.append(int(parent[path[-1]]))
+            records.append(TaintRecord(
+                address=names[node], category=category, hop=int(hop[node]),
+                path=[names[i] for i in path], watchlist_version=version, max_hops=max_hops,
+            ))
+
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="taint"), transaction.atomic():
+        TaintRecord.objects.all().delete()
+        TaintRecord.objects.bulk_create(records, batch_size=1000)
+    _built_hops[version] = (max_hops, time.monotonic())
+    return len(records)
+
+
+def _hops_query(version: str):
+    return TaintRecord.objects.filter(watchlist_version=version).values_list("max_hops", flat=True)
+
+
+def _cached_hops(version: str):
+    cached = _built_hops.get(version)
+    if cached is None or time.monotonic() - cached[1] > BUILT_HOPS_TTL:
+        return None
+    return cached[0]
+
+
+def _remember_hops(version: str, hops):
+    if hops is None:
+        _built_hops.pop(version, None)
+    else:
+        _built_hops[version] = (hops, time.monotonic())
+    return hops
+
+
+def built_hops():
+    """
+    The hop limit the table was built with for the watchlist currently loaded, None when it was built
+    for another version (an empty table never is current).
+    """
+    version = get_watchlist().version
+    hops = _cached_hops(version)
+    if hops is None:
+        hops = _remember_hops(version, _hops_query(version).first())
+    return hops
+
+
+async def abuilt_hops():
+    version = get_watchlist().version
+    hops = _cached_hops(version)
+    if hops is None:
+        hops = _remember_hops(version, await _hops_query(version).afirst())
+    return hops
+
+
+def _covers(hops, max_hops: int) -> bool:
+    return hops is not None and max_hops <= hops
+
+
+def usable(max_hops: int) -> bool:
+    """
+    Whether the table is enabled, current and built for at least max_hops.
+    """
+    return settings.AML_TAINT_TABLE and _covers(built_hops(), max_hops)
+
+
+async def ausable(max_hops: int) -> bool:
+    return settings.AML_TAINT_TABLE and _covers(await abuilt_hops(), max_hops)
+
+
+class _Neighbourhood:
+    # Counterparties and transaction counts read from the store, many addresses per query, memoized for one update
+    def __init__(self):
+        self._cache = {}
+
+    def load(self, addresses):
+        missing = [address for address in set(addresses) if address not in self._cache]
+        counterparties = {address: set() for address in missing}
+        degree = dict.fromkeys(missing, 0)
+        for batch in _batches(missing):
+            rows = Transaction.objects.filter(Q(sender__in=batch) | Q(receiver__in=batch)).values_list("sender", "receiver")
+            for sender, receiver in rows.iterator(chunk_size=10000):
+                if sender in degree:
+                    degree[sender] += 1
+                    counterparties[sender].add(receiver)
+                if receiver in degree and receiver != sender:
+                    degree[receiver] += 1
+                    counterparties[receiver].add(sender)
+        for address in missing:
+            self._cache[address] = (counterparties[address], degree[address])
+
+    def get(self, address: str):
+        return self._cache[address]
+
+
+def _load_taint(known: dict, addresses, category: str, bit: int, watchlist):
+    # (hop, path) of the addresses for the category, 0 for listed entities, None when untainted
+    missing = [address for address in set(addresses) if address not in known]
+    if not missing:
+        return
+    masks = watchlist.lookup_many(missing)
+    unlisted = []
+    for address, mask in zip(missing, masks.tolist()):
+        if mask & bit:
+            known[address] = (0, [address])
+        else:
+            known[address] = None
+            unlisted.append(address)
+    for batch in _batches(unlisted):
+        for address, hop, path in TaintRecord.objects.filter(address__in=batch, category=category).values_list("address", "hop", "path"):
+            known[address] = (hop, path)
+
+
+def update_taint(transactions: list) -> int:
+    """
+    Folds newly ingested Transactions into a current taint table by relaxing hops outward from
+    their endpoints, one hop at a time. Each step reads the taint and the neighbourhoods it needs
+    with a few batched queries. Returns the number of records written.
+    """
+    if not settings.AML_TAINT_TABLE or not transactions:
+        return 0
+    max_hops = built_hops()
+    if max_hops is None:
+        return 0
+    watchlist = get_watchlist()
+    barriers = {"", *settings.AML_KNOWN_HUBS}
+    neighbourhood = _Neighbourhood()
+    edges = {(tx.sender, tx.receiver) for tx in transactions}
+    written = 0
+
+    for category, bit, _, _ in CATEGORIES:
+        known = {}
+        updated = {}
+        pairs = [pair for sender, receiver in edges for pair in ((sender, receiver), (receiver, sender))]
+        while pairs:
+            _load_taint(known, (address for pair in pairs for address in pair), category, bit, watchlist)
+            candidates = []
+            for source, target in pairs:
+                taint = known[source]
+                if taint is None or (taint[0] and source in barriers) or taint[0] >= max_hops:
+                    continue
+                existing = known[target]
+                if existing is None or existing[0] > taint[0] + 1:
+                    candidates.append((target, taint[0] + 1, [target, *taint[1]]))
+            neighbourhood.load(target for target, _, _ in candidates)
+            pairs = []
+            for target, hop, path in candidates:
+                existing = known[target]
+                if existing is not None and existing[0] <= hop:
+                    continue
+                if hop >= 2 and neighbourhood.get(target)[1] > settings.AML_SANCTIONS_HUB_DEGREE:
+                    continue
+                known[target] = updated[target] = (hop, path)
+                pairs.extend((target, neighbour) for neighbour in neighbourhood.get(target)[0])
+
+        if updated:
+            version = watchlist.version
+            with metrics.span("db write", "aml_db_write_duration_seconds", table="taint"), transaction.atomic():
+                for batch in _batches(list(updated)):
+                    TaintRecord.objects.filter(address__in=batch, category=category).delete()
+                TaintRecord.objects.bulk_create([
+                    TaintRecord(address=address, category=category, hop=hop, path=path, watchlist_version=version, max_hops=max_hops)
+                    for address, (hop, path) in updated.items()
+                ], batch_size=1000)
+            written += len(updated)
+    return written
+
+
+def _result(wallet: str, rows) -> dict:
+    # Sanctions result object (see core/agents/tools/sanction_check.py) of the wallet's taint records
+    rows = sorted(rows, key=lambda row: row[1])
+    grouped_flags = {}
+    failed_checks = []
+    for category, hop, path in rows:
+        grouped_flags[(category, hop)] = [{"flagged_entity": path[-1], "path": path}]
+        failed_checks.append({
+            "type": category,
+            "wallet": wallet,
+            "hop": hop,
+            "transactions": [],
+            "path": path,
+            "message": f"{category.capitalize()} entity transaction(s) detected for address at hop {hop}."
+        })
+    return {
+        "flagged": bool(grouped_flags),
+        "types": [category for category, _, _ in rows],
+        "wallet": wallet,
+        "transactions": grouped_flags,
+        "failedChecks": failed_checks,
+        "message": f"Flagged transactions detected for wallet {wallet}." if grouped_flags else "No sanctioned, mixer, or darknet entity transactions detected."
+    }
+
+
+def _query(wallet: str, max_hops: int):
+    return (
+        TaintRecord.objects
+        .filter(address=wallet, hop__lte=max_hops, watchlist_version=get_watchlist().version)
+        .values_list("category", "hop", "path")
+    )
+
+
+def taint_result(wallet: str, max_hops: int) -> dict:
+    """
+    Looks the wallet up in the taint table and returns its sanctions result object (nearest hop per category).
+    """
+    return _result(wallet, list(_query(wallet, max_hops)))
+
+
+async def ataint_result(wallet: str, max_hops: int) -> dict:
+    return _result(wallet, [row async for row in _query(wallet, max_hops)])
@@ -0,0 +1,85 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import result_cache
+from core.models import AddressCursor, AMLRequest, Transaction
+from core.agents import watchlist
+from core.tests import utils
+
+
+@override_settings(AML_TRANSACTION_STORE=True, AML_TAINT_TABLE=False, AML_TRANSACTION_STORE_SYNC_INTERVAL=3600, AML_PIPELINE_MODE="fast")
+class AsyncViewTests(TransactionTestCase):
+    # A -> M (mixer), E -> F is clean, S is sanctioned; the lists are only loaded on the first screening
+    TRANSFERS = [("A", "M", 0), ("E", "F", 60)]
+    LISTS = {"/sanctions/all": {"sanctioned": ["S"]}, "/mixers/all": {"mixers": ["M"]}, "/darknet/all": {"darknet": []}}
+
+    def setUp(self):
+        now = timezone.now()
+        records = utils.records(self.TRANSFERS)
+        Transaction.objects.bulk_create([
+            Transaction(tx_hash=tx["hash"], sender=tx["sender"], receiver=tx["receiver"], amount=tx["amount"], denom=tx["denom"], timestamp=tx["timestamp"])
+            for tx in records
+        ])
+        AddressCursor.objects.bulk_create([AddressCursor(address=address, synced_at=now) for address in "AMEFS"])
+        self.list_threads = []
+        result_cache._lru.clear()
+        self.addCleanup(result_cache._lru.clear)
+        patchers = [
+            mock.patch.object(watchlist, "_watchlist", watchlist.WatchlistCache(ttl=3600)),
+            mock.patch.object(watchlist, "get", self._get),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _get(self, path, headers=None):
+        self.list_threads.append(threading.get_ident())
+        return utils.StubResponse(self.LISTS[path])
+
+    def _assert_lists_loaded_off_the_loop(self):
+        self.assertEqual(len(self.list_threads), 3)
+        self.assertNotIn(threading.get_ident(), self.list_threads)
+
+    async def test_async_view(self):
+        response = await self.async_client.get("/compute-risk/async/", {"wallet_address": "E", "mode": "fast"})
+        self._assert_lists_loaded_off_the_loop()
+        self.assertEqual((response.status_code, response.json()["failed_checks"]), (200, []))
+
+        response = await self.async_client.get("/compute-risk/async/", {"wallet_address": "A", "mode": "fast"})
+        self.assertEqual(len(response.json()["failed_checks"]), 1)
+        self.assertEqual(await AMLRequest.objects.acount(), 2)
+
+    async def test_async_view_short_circuits_a_listed_wallet(self):
+        response = await self.async_client.get("/compute-risk/async/", {"wallet_address": "S", "mode": "agent"})
+        self._assert_lists_loaded_off_the_loop()
+        failed_checks = response.json()["failed_checks"]
+        self.assertEqual(len(failed_checks), 1)
+        self.assertIn("Wallet S is directly flagged as sanctioned.", failed_checks[0])
+
+    async def _events(self, wallet: str) -> list:
+        response = await self.async_client.get("/compute-risk/stream/", {"wallet_address": wallet, "mode": "fast"})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        events = []
+        for block in body.strip().split("\n\n"):
+            event, data = block.split("\n")
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+    async def test_sse_stream(self):
+        events = await self._events("A")
+        self._assert_lists_loaded_off_the_loop()
+        self.assertEqual([event for event, _ in events], ["check", "check", "check", "result"])
+        self.assertEqual({data["check"] for _, data in events[:-1]}, {"check_sanctions", "check_structuring", "check_layering"})
+        self.assertEqual(len(events[-1][1]["failed_checks"]), 1)
+        # Served from the result cache the second time
+        self.assertEqual([event for event, _ in await self._events("A")], ["result"])
+
+    async def test_sse_stream_of_a_listed_wallet(self):
+        events = await self._events("S")
+        self.assertEqual([(event, data.get("check")) for event, data in events], [("check", "check_sanctions"), ("result", None)])
+        self.assertEqual(events[0][1]["findings"], ["direct:sanctioned"])
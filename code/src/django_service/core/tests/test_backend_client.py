@@ -0,0 +1,157 @@
+import asyncio
+import json
+import threading
+from unittest import mock
+
+import httpx
+from django.test import SimpleTestCase
+
+from core.agents import backend_client
+from core.agents.backend_client import AsyncBackendClient, JsonArrayReader, get_async_client
+
+
+class _StreamResponse:
+    def __init__(self, body: bytes):
+        self.status_code = 200
+        self.body = body
+        self.closed = False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size: int):
+        return (self.body[i:i + size] for i in range(0, len(self.body), size))
+
+    def close(self):
+        self.closed = True
+
+
+class BackendStreamTests(SimpleTestCase):
+    ITEMS = [
+        {"hash": "t0", "memo": 'a "quoted" ], {value}, \\ back', "amount": "12345.678"},
+        {"hash": "t1", "memo": "caf\u00e9 \u20ac \U0001f600\n", "nested": [1, [2, 3], {"k": None}]},
+        1234567890,
+        -0.5e-3,
+        True,
+        None,
+        "]",
+        [],
+    ]
+    # Non-ASCII text written raw, so multi-byte characters are split across reads as well
+    BODY = json.dumps({"count": 8, "note": "before", "transactions": ITEMS, "after": [0]}, ensure_ascii=False).encode()
+
+    def _feed(self, text: str, size: int, key: str = "transactions"):
+        reader = JsonArrayReader(key)
+        items = []
+        for i in range(0, len(text), size):
+            items += reader.feed(text[i:i + size])
+        return reader, items
+
+    def test_items_spanning_reads(self):
+        text = self.BODY.decode()
+        for size in (1, 2, 3, 7, len(text)):
+            with self.subTest(size=size):
+                reader, items = self._feed(text, size)
+                self.assertEqual(items, self.ITEMS)
+                self.assertTrue(reader.done)
+                reader.close()
+
+    def test_escapes(self):
+        text = r'{"transactions": ["a \"q\" ], {", "\\", "\\\"", "café 😀", "\n\t\/", {"\"k\"": "]"}]}'
+        for size in (1, 2, len(text)):
+            with self.subTest(size=size):
+                self.assertEqual(self._feed(text, size)[1], json.loads(text)["transactions"])
+
+    def test_key_split_across_reads(self):
+        text = '{"padding": "%s", "transactions": [{"a": 1}]}' % ("x" * 1000)
+        reader, items = self._feed(text, 300)
+        self.assertEqual(items, [{"a": 1}])
+
+    def test_empty_array(self):
+        for text in ('{"transactions": []}', '{"transactions" :\n[ \n ] }'):
+            with self.subTest(text=text):
+                reader, items = self._feed(text, 1)
+                self.assertEqual(items, [])
+                self.assertTrue(reader.done)
+
+    def test_malformed_and_truncated_input(self):
+        for text in ('{"transactions": [{"a": 1}, {"b": }]}', '{"transactions": [{"a": 1}, {"b"', '{"transactions": [1, 2', '{"other": []}', ""):
+            with self.subTest(text=text):
+                reader, items = self._feed(text, 4)
+                self.assertFalse(reader.done)
+                with self.assertRaises(ValueError):
+                    reader.close()
+
+    def test_stream_items(self):
+        for size in (1, 5, 65536):
+            response = _StreamResponse(self.BODY)
+            with self.subTest(size=size), mock.patch.object(backend_client.get_session(), "get", return_value=response), \
+                    mock.patch.object(backend_client, "STREAM_READ_SIZE", size):
+                self.assertEqual(list(backend_client.stream_items("/transactions/A", "transactions")), self.ITEMS)
+                self.assertTrue(response.closed)
+
+    def test_stream_items_truncated(self):
+        response = _StreamResponse(self.BODY[:len(self.BODY) // 2])
+        with mock.patch.object(backend_client.get_session(), "get", return_value=response):
+            with self.assertRaises(ValueError):
+                list(backend_client.stream_items("/transactions/A", "transactions"))
+        self.assertTrue(response.closed)
+
+    def test_async_stream_items(self):
+        async def collect(body: bytes):
+            client = AsyncBackendClient()
+            client.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=body)))
+            async with client.client:
+                return [item async for item in client.stream_items("/transactions/A", "transactions")]
+
+        with mock.patch.object(backend_client, "STREAM_READ_SIZE", 3):
+            self.assertEqual(asyncio.run(collect(self.BODY)), self.ITEMS)
+            with self.assertRaises(ValueError):
+                asyncio.run(collect(self.BODY[:-30]))
+
+    def test_no_concurrency_slot_held_while_consuming(self):
+        response = _StreamResponse(self.BODY)
+        with mock.patch.object(backend_client.get_session(), "get", return_value=response), \
+                mock.patch.object(backend_client, "_semaphore", threading.BoundedSemaphore(1)), \
+                mock.patch.object(backend_client, "STREAM_READ_SIZE", 16):
+            items = backend_client.stream_items("/transactions/A", "transactions")
+            next(items)
+            # Suspended with the response still open, another caller can get the only slot
+            self.assertTrue(backend_client._semaphore.acquire(blocking=False))
+            backend_client._semaphore.release()
+            items.close()
+        self.assertTrue(response.closed)
+
+    def test_async_no_concurrency_slot_held_while_consuming(self):
+        async def consume():
+            client = AsyncBackendClient()
+            client.semaphore = asyncio.Semaphore(1)
+            client.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=self.BODY)))
+            async with client.client:
+                locked = [client.semaphore.locked() async for _ in client.stream_items("/transactions/A", "transactions")]
+            return locked, client.semaphore.locked()
+
+        with mock.patch.object(backend_client, "STREAM_READ_SIZE", 16):
+            locked, locked_after = asyncio.run(consume())
+        self.assertEqual(locked, [False] * len(self.ITEMS))
+        self.assertFalse(locked_after)
+
+
+
+class AsyncClientTests(SimpleTestCase):
+    def test_async_client_closed_with_its_loop(self):
+        async def client():
+            return get_async_client()
+
+        first = asyncio.run(client())
+        self.assertTrue(first.client.is_closed)
+        loop = asyncio.new_event_loop()
+        try:
+            second = loop.run_until_complete(client())
+            self.assertIsNot(second, first)
+            self.assertIs(loop.run_until_complete(client()), second)
+            self.assertFalse(second.client.is_closed)
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+        self.assertTrue(second.client.is_closed)
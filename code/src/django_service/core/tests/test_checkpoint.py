@@ -0,0 +1,95 @@
+import asyncio
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import END, START, MessagesState, StateGraph
+
+from core import checkpoint, workflow
+from core.checkpoint import BoundedInMemorySaver
+
+
+def _config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+class BoundedSaverTests(SimpleTestCase):
+    def _put(self, saver, thread_id: str):
+        saver.put(_config(thread_id), empty_checkpoint(), {}, {})
+
+    def _threads(self, saver) -> list:
+        return [thread_id for thread_id in "abcd" if saver.get_tuple(_config(thread_id)) is not None]
+
+    def test_least_recently_used_threads_are_evicted(self):
+        saver = BoundedInMemorySaver(max_threads=2, ttl=900)
+        for thread_id in "abc":
+            self._put(saver, thread_id)
+        self.assertEqual(self._threads(saver), ["b", "c"])
+        self._put(saver, "b")
+        self._put(saver, "d")
+        self.assertEqual(self._threads(saver), ["b", "d"])
+
+    def test_active_threads_are_kept(self):
+        saver = BoundedInMemorySaver(max_threads=1, ttl=900)
+        with saver.active("a"):
+            self._put(saver, "a")
+            self._put(saver, "b")
+            self.assertEqual(self._threads(saver), ["a", "b"])
+        self._put(saver, "c")
+        self.assertEqual(self._threads(saver), ["c"])
+
+    def test_threads_expire_after_the_ttl(self):
+        saver = BoundedInMemorySaver(max_threads=10, ttl=60)
+        with mock.patch.object(checkpoint.time, "monotonic", return_value=1000.0):
+            self._put(saver, "a")
+        with mock.patch.object(checkpoint.time, "monotonic", return_value=1030.0):
+            self._put(saver, "b")
+        with mock.patch.object(checkpoint.time, "monotonic", return_value=1070.0):
+            self._put(saver, "c")
+        self.assertEqual(self._threads(saver), ["b", "c"])
+
+    def test_async_writes_are_bounded(self):
+        saver = BoundedInMemorySaver(max_threads=1, ttl=900)
+
+        async def run():
+            for thread_id in "ab":
+                await saver.aput(_config(thread_id), empty_checkpoint(), {}, {})
+
+        asyncio.run(run())
+        self.assertEqual(self._threads(saver), ["b"])
+
+
+class SqliteCheckpointerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(AML_CHECKPOINT_BACKEND="sqlite", AML_CHECKPOINT_SQLITE_PATH=str(Path(directory.name) / "checkpoints.sqlite3"))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_sync_and_async_agents_checkpoint(self):
+        graph = StateGraph(MessagesState)
+        graph.add_node("reply", lambda state: {"messages": [("ai", "done")]})
+        graph.add_edge(START, "reply")
+        graph.add_edge("reply", END)
+        agent = graph.compile(checkpointer=checkpoint.build_checkpointer())
+        config = {"configurable": {"thread_id": "sync"}}
+        agent.invoke({"messages": [("user", "hi")]}, config=config)
+        self.assertIsNotNone(agent.checkpointer.get_tuple(config))
+
+        async def run():
+            with mock.patch.object(workflow, "_agent", agent):
+                async_agent = workflow.get_async_agent()
+            self.assertIsInstance(async_agent.checkpointer, checkpoint.BoundedThreadsMixin)
+            self.assertIsNot(async_agent.checkpointer, agent.checkpointer)
+            async_config = {"configurable": {"thread_id": "async"}}
+            with workflow._running(async_agent, async_config):
+                await async_agent.ainvoke({"messages": [("user", "hi")]}, config=async_config)
+            found = await async_agent.checkpointer.aget_tuple(async_config)
+            await async_agent.checkpointer.conn.close()
+            return found
+
+        self.assertIsNotNone(asyncio.run(run()))
+        agent.checkpointer.conn.close()
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core.agents.tools import fetch_transactions
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from core.tests import utils
+
+
+@override_settings(AML_TRANSACTION_STORE=False, AML_FETCH_CHUNK_ROWS=2, AML_FETCH_MAX_ROWS=0)
+class SnapshotTests(SimpleTestCase):
+    RECORDS = utils.records([("A", "B", 0), ("B", "A", 60), ("A", "C", 120), ("C", "A", 180), ("A", "D", 240)])
+
+    def setUp(self):
+        self.calls = []
+        self.fail = False
+        patchers = [
+            mock.patch.object(fetch_transactions, "stream_items", self._stream_items),
+            mock.patch.object(fetch_transactions, "astream_items", self._astream_items),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _stream_items(self, path, key, params=None):
+        self.calls.append((path, params))
+        for i, record in enumerate(self.RECORDS):
+            if self.fail and i == 3:
+                raise ValueError("truncated response")
+            yield record
+
+    async def _astream_items(self, path, key, params=None):
+        for record in self._stream_items(path, key, params):
+            await asyncio.sleep(0)
+            yield record
+
+    def _hashes(self, chunks) -> list:
+        return [tx for chunk in chunks for tx in chunk.hashes]
+
+    def test_a_paused_reader_does_not_block_others(self):
+        snapshot = TransactionSnapshot()
+        first = snapshot.chunks("A")
+        self.assertEqual(len(next(first)), 2)
+        # Another thread reads the whole address while the first reader is paused mid-stream
+        result = []
+        reader = threading.Thread(target=lambda: result.append(snapshot.batch("A")))
+        reader.start()
+        reader.join(timeout=5)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual(list(result[0].hashes), ["t0", "t1", "t2", "t3", "t4"])
+        self.assertEqual(self._hashes(first), ["t2", "t3", "t4"])
+        self.assertEqual(self.calls, [("/transactions/A", None)])
+
+    def test_an_abandoned_reader_leaves_the_stream_to_others(self):
+        snapshot = TransactionSnapshot()
+        first = snapshot.chunks("A")
+        next(first)
+        first.close()
+        self.assertEqual(len(snapshot.batch("A")), 5)
+        self.assertEqual(len(snapshot.batch("A")), 5)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_a_failed_stream_is_fetched_again(self):
+        snapshot = TransactionSnapshot()
+        self.fail = True
+        with self.assertRaises(ValueError):
+            snapshot.batch("A")
+        self.fail = False
+        self.assertEqual(len(snapshot.batch("A")), 5)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_async_readers_share_one_stream(self):
+        async def run():
+            snapshot = AsyncTransactionSnapshot()
+            batches = await asyncio.gather(snapshot.batch("A"), snapshot.batch("A"), snapshot.batch("B"))
+            again = await snapshot.batch("A")
+            return batches, again
+
+        (a, a_again, b), cached = asyncio.run(run())
+        self.assertEqual(list(a.hashes), list(a_again.hashes))
+        self.assertEqual(len(cached), 5)
+        self.assertEqual(sorted(path for path, _ in self.calls), ["/transactions/A", "/transactions/B"])
+
+    def test_a_cancelled_async_reader_leaves_the_stream_to_others(self):
+        async def run():
+            snapshot = AsyncTransactionSnapshot()
+            first = asyncio.ensure_future(snapshot.batch("A"))
+            await asyncio.sleep(0)
+            second = asyncio.ensure_future(snapshot.batch("A"))
+            await asyncio.sleep(0)
+            first.cancel()
+            return await second
+
+        self.assertEqual(len(asyncio.run(run())), 5)
+        self.assertEqual(len(self.calls), 1)
@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.agents import graph_index
+from core.agents.graph_index import TransactionGraph
+from core.agents.transactions import TransactionBatch, addresses
+from core.tests import utils
+
+
+def _batch(transfers: list) -> TransactionBatch:
+    return TransactionBatch.from_records(utils.records(transfers))
+
+
+def _ids(names: str) -> list:
+    return [addresses.intern(f"graph-{name}") for name in names]
+
+
+def _names(ids) -> list:
+    return sorted(name.removeprefix("graph-") for name in addresses.names(ids))
+
+
+class TransactionGraphTests(SimpleTestCase):
+    def setUp(self):
+        a, b, c, d = ("graph-" + name for name in "ABCD")
+        self.a, self.b, self.c, self.d = _ids("ABCD")
+        # A -> B, C -> A, A -> A, B -> C, C -> D
+        self.of_a = _batch([(a, b, 0), (c, a, 60), (a, a, 120)])
+        self.of_b = _batch([(a, b, 0), (b, c, 180)])
+        self.of_c = _batch([(c, a, 60), (b, c, 180), (c, d, 240)])
+
+    def _graph(self) -> TransactionGraph:
+        graph = TransactionGraph()
+        graph.add(self.a, self.of_a)
+        graph.add(self.b, self.of_b)
+        graph.add(self.c, self.of_c)
+        return graph
+
+    def test_edges_of_loaded_counterparties_are_added_once(self):
+        graph = TransactionGraph()
+        self.assertEqual(graph.add(self.a, self.of_a).tolist(), [0, 1, 2])
+        # A -> B came with A
+        self.assertEqual(graph.add(self.b, self.of_b).tolist(), [1])
+        self.assertEqual(graph.add(self.c, self.of_c).tolist(), [2])
+        self.assertEqual(graph.add(self.a, self.of_a).tolist(), [])
+        self.assertEqual(graph.edge_count, 5)
+        self.assertEqual((len(graph), self.c in graph, self.d in graph), (3, True, False))
+
+    def test_chunks_are_appended_until_marked_loaded(self):
+        graph = TransactionGraph()
+        graph.append(self.a, self.of_a.take([0, 1]))
+        graph.append(self.a, self.of_a.take([2]))
+        self.assertNotIn(self.a, graph)
+        graph.mark_loaded(self.a)
+        self.assertEqual(graph.append(self.b, self.of_b).tolist(), [1])
+        self.assertEqual(graph.edge_count, 4)
+
+    def _check_edges(self, graph: TransactionGraph):
+        receivers, timestamps, _ = graph.out_edges(self.a)
+        self.assertEqual(_names(receivers), ["A", "B"])
+        self.assertTrue((timestamps[:-1] <= timestamps[1:]).all())
+        senders, _, _ = graph.in_edges(self.c)
+        self.assertEqual(_names(senders), ["B"])
+        # The transfer to itself is listed once
+        counterparties, timestamps, amounts = graph.edges(self.a)
+        self.assertEqual(_names(counterparties), ["A", "B", "C"])
+        self.assertEqual(len(amounts), 3)
+        self.assertEqual(_names(graph.neighbors([self.b, self.b])), ["A", "C"])
+        self.assertEqual(_names(graph.k_hop(self.b, 1)), ["A", "C"])
+        self.assertEqual(_names(graph.k_hop(self.b, 2)), ["A", "C", "D"])
+
+    def test_edges_while_pending(self):
+        graph = self._graph()
+        self.assertEqual(len(graph._nodes), 0)
+        self._check_edges(graph)
+
+    def test_edges_after_compact(self):
+        graph = self._graph()
+        graph.compact()
+        self.assertEqual(graph._pending_len, 0)
+        self._check_edges(graph)
+
+    def test_edges_across_index_and_buffer(self):
+        with mock.patch.object(graph_index, "COMPACT_MIN_EDGES", 2):
+            graph = self._graph()
+        self.assertTrue(len(graph._nodes) and graph._pending_len)
+        self._check_edges(graph)
@@ -0,0 +1,104 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from core.agents.layering import AdjacencyIndex, LayeringConfig, find_cycles
+from core.agents.tools.layering_check import aanalyze_layering, analyze_layering
+from core.agents.transactions import TransactionBatch
+from core.tests import utils
+
+
+class FindCyclesTests(SimpleTestCase):
+    def _cycles(self, transfers: list, origin: str = "A", **config) -> list:
+        records = utils.records(transfers)
+        index = AdjacencyIndex(lambda address: TransactionBatch.from_records(
+            [tx for tx in records if address in (tx["sender"], tx["receiver"])]
+        ))
+        result = find_cycles(origin, index, LayeringConfig(**config))
+        return [(cycle.path, cycle.duration, cycle.rapid) for cycle in result.cycles]
+
+    def test_walk_back_to_the_origin(self):
+        self.assertEqual(
+            self._cycles([("A", "B", 0), ("B", "C", 60), ("C", "A", 120)]),
+            [(("A", "B", "C", "A"), 120.0, True)],
+        )
+
+    def test_direct_round_trip_is_not_a_cycle(self):
+        self.assertEqual(self._cycles([("A", "B", 0), ("B", "A", 60)]), [])
+
+    def test_cycle_away_from_the_origin_is_ignored(self):
+        self.assertEqual(self._cycles([("A", "B", 0), ("B", "C", 60), ("C", "D", 120), ("D", "B", 180)]), [])
+
+    def test_max_hops(self):
+        square = [("A", "B", 0), ("B", "C", 60), ("C", "D", 120), ("D", "A", 180)]
+        self.assertEqual(self._cycles(square, max_hops=3), [(("A", "B", "C", "D", "A"), 180.0, True)])
+        self.assertEqual(self._cycles(square, max_hops=2), [])
+
+    def test_time_respecting(self):
+        # B forwards before it received
+        transfers = [("A", "B", 100), ("B", "C", 50), ("C", "A", 200)]
+        self.assertEqual(self._cycles(transfers), [])
+        # Edges are followed in either direction, without time order both walks close
+        self.assertEqual(
+            sorted(path for path, _, _ in self._cycles(transfers, time_respecting=False)),
+            [("A", "B", "C", "A"), ("A", "C", "B", "A")],
+        )
+
+    def test_slow_cycle_is_not_rapid(self):
+        self.assertEqual(
+            self._cycles([("A", "B", 0), ("B", "C", 3600), ("C", "A", 7200)]),
+            [(("A", "B", "C", "A"), 7200.0, False)],
+        )
+
+    def test_each_cycle_is_reported_once(self):
+        transfers = [("A", "B", 0), ("B", "C", 10), ("C", "A", 20), ("A", "B", 30), ("B", "C", 40), ("C", "A", 50)]
+        self.assertEqual([path for path, _, _ in self._cycles(transfers)], [("A", "B", "C", "A")])
+
+
+class _Snapshot:
+    # AsyncTransactionSnapshot over canned records, remembering which addresses were fetched
+    def __init__(self, records: list):
+        self.records = records
+        self.requested = []
+
+    async def batch(self, address: str) -> TransactionBatch:
+        self.requested.append(address)
+        return TransactionBatch.from_records([tx for tx in self.records if address in (tx["sender"], tx["receiver"])])
+
+
+class AnalyzeLayeringTests(SimpleTestCase):
+    # A -> B -> C -> A closes within three hops, D hangs off C and E off D, F paid B before the walk reached B
+    TRANSFERS = [("A", "B", 0), ("B", "C", 60), ("C", "A", 120), ("C", "D", 180), ("D", "E", 240), ("F", "B", -60)]
+
+    def _sync(self, max_hops: int):
+        records = utils.records(self.TRANSFERS)
+        return analyze_layering("A", max_hops, fetch=lambda address: TransactionBatch.from_records(
+            [tx for tx in records if address in (tx["sender"], tx["receiver"])]
+        ))
+
+    def test_async_matches_sync(self):
+        for max_hops in (1, 2, 3, 4):
+            snapshot = _Snapshot(utils.records(self.TRANSFERS))
+            result = asyncio.run(aanalyze_layering("A", max_hops, snapshot=snapshot))
+            expected = self._sync(max_hops)
+            with self.subTest(max_hops=max_hops):
+                self.assertEqual([cycle.path for cycle in result.cycles], [cycle.path for cycle in expected.cycles])
+                self.assertEqual(result.nodes_expanded, expected.nodes_expanded)
+
+    def test_async_fetches_only_what_the_search_expands(self):
+        snapshot = _Snapshot(utils.records(self.TRANSFERS))
+        result = asyncio.run(aanalyze_layering("A", 3, snapshot=snapshot))
+        self.assertEqual([cycle.path for cycle in result.cycles], [("A", "B", "C", "A")])
+        # E is three hops away through A -> C -> D, F is only linked by a transfer older than the walk
+        self.assertEqual(sorted(snapshot.requested), ["A", "B", "C", "D", "E"])
+        snapshot = _Snapshot(utils.records(self.TRANSFERS))
+        asyncio.run(aanalyze_layering("A", 2, snapshot=snapshot))
+        self.assertEqual(sorted(snapshot.requested), ["A", "B", "C", "D"])
+        self.assertEqual(len(snapshot.requested), len(set(snapshot.requested)))
+
+    def test_fetch_errors_count_as_no_transactions(self):
+        def fetch(address):
+            raise ConnectionError("backend down")
+
+        with self.assertLogs("core.agents.layering", "WARNING"):
+            self.assertEqual(analyze_layering("A", 3, fetch=fetch).cycles, [])
@@ -0,0 +1,51 @@
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from core import metrics
+
+
+class TracerTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(metrics, "_tracer", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @override_settings(AML_OTEL_ENABLED=False)
+    def test_disabled_without_opentelemetry(self):
+        with mock.patch.dict(sys.modules, {"opentelemetry": None}):
+            self.assertIsNone(metrics.get_tracer())
+
+    @override_settings(AML_OTEL_ENABLED=True)
+    def test_enabled_without_the_extra(self):
+        with mock.patch.dict(sys.modules, {"opentelemetry": None}):
+            with self.assertRaisesMessage(ImportError, "requirements-otel.txt"):
+                metrics.get_tracer()
+
+
+@override_settings(AML_METRICS_ENABLED=True)
+class RecordingTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(metrics.reset)
+
+    def test_records_the_block_observations_by_label(self):
+        metrics.observe("aml_tool_duration_seconds", 1.0, {"tool": "check_layering"})
+        with metrics.recording("aml_tool_duration_seconds", "tool") as durations:
+            metrics.observe("aml_tool_duration_seconds", 0.5, {"tool": "check_layering"})
+            metrics.observe("aml_tool_duration_seconds", 0.25, {"tool": "check_layering"})
+            metrics.observe("aml_db_write_duration_seconds", 0.1, {"table": "transaction"})
+        metrics.observe("aml_tool_duration_seconds", 2.0, {"tool": "check_layering"})
+        self.assertEqual(durations, {"check_layering": [0.5, 0.25]})
+        self.assertEqual(metrics._recordings, [])
+
+    def test_tool_runs_of_the_callback_handler_are_recorded(self):
+        from core.llm_metrics import MetricsCallbackHandler
+
+        handler = MetricsCallbackHandler()
+        with metrics.recording("aml_tool_duration_seconds", "tool") as durations:
+            for i, name in enumerate(("check_sanctions", "check_layering", "unrelated")):
+                handler.on_tool_start({"name": name}, "", run_id=i)
+                handler.on_tool_end("", run_id=i)
+        self.assertEqual(sorted(durations), ["check_layering", "check_sanctions"])
+        self.assertTrue(all(len(values) == 1 and values[0] >= 0 for values in durations.values()))
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core.models import AddressCursor, Transaction
+from core.agents import watchlist
+from core.agents.tools.fetch_transactions import TransactionSnapshot
+from core.agents.tools.sanction_check import analyze_sanctions
+from core.tests import utils
+
+
+@override_settings(AML_TRANSACTION_STORE=True, AML_TAINT_TABLE=False, AML_TRANSACTION_STORE_SYNC_INTERVAL=3600)
+class SanctionsHopsTests(TransactionTestCase):
+    # A -> B -> C -> S (sanctioned), A -> M (mixer), D -> X (darknet) served from a freshly synced local store.
+    # Frontiers are read from worker threads, which a test wrapped in a transaction would lock out of SQLite.
+    TRANSFERS = [("A", "B", 0), ("B", "C", 60), ("C", "S", 120), ("A", "M", 180), ("D", "X", 240)]
+
+    def setUp(self):
+        now = timezone.now()
+        records = utils.records(self.TRANSFERS)
+        Transaction.objects.bulk_create([
+            Transaction(tx_hash=tx["hash"], sender=tx["sender"], receiver=tx["receiver"], amount=tx["amount"], denom=tx["denom"], timestamp=tx["timestamp"])
+            for tx in records
+        ])
+        parties = {party for tx in records for party in (tx["sender"], tx["receiver"])}
+        AddressCursor.objects.bulk_create([AddressCursor(address=address, synced_at=now) for address in parties])
+        patcher = mock.patch.object(watchlist, "_watchlist", utils.canned_watchlist(sanctioned=["S"], mixers=["M"], darknet=["X"]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _hops(self, wallet: str, max_hops: int) -> list:
+        result = analyze_sanctions(wallet, max_hops, TransactionSnapshot())
+        return sorted((check["type"], check["hop"]) for check in result["failedChecks"])
+
+    def test_hops(self):
+        self.assertEqual(self._hops("A", 1), [("mixer", 1)])
+        self.assertEqual(self._hops("A", 2), [("mixer", 1)])
+        self.assertEqual(self._hops("A", 3), [("mixer", 1), ("sanctioned", 3)])
+        self.assertEqual(self._hops("B", 2), [("mixer", 2), ("sanctioned", 2)])
+        self.assertEqual(self._hops("D", 3), [("darknet", 1)])
+
+    def test_flagged_transactions(self):
+        result = analyze_sanctions("C", 1, TransactionSnapshot())
+        self.assertTrue(result["flagged"])
+        self.assertEqual([tx["hash"] for tx in result["failedChecks"][0]["transactions"]], ["t2"])
+
+    def test_direct_flag(self):
+        result = analyze_sanctions("S", 3, TransactionSnapshot())
+        self.assertEqual(result["message"], "Wallet S is directly flagged as sanctioned.")
+
+    def test_clear_wallet(self):
+        Transaction.objects.create(tx_hash="e", sender="E", receiver="F", amount="1", timestamp=timezone.now())
+        AddressCursor.objects.bulk_create([AddressCursor(address=address, synced_at=timezone.now()) for address in "EF"])
+        result = analyze_sanctions("E", 3, TransactionSnapshot())
+        self.assertFalse(result["flagged"])
+        self.assertEqual(result["failedChecks"], [])
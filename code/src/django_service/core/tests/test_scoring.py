@@ -0,0 +1,99 @@
+import asyncio
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from core.agents import scoring
+from core.agents.scoring import normalize_findings, rule_score
+from core.agents.tools import risk_score_calculation
+from core.agents.tools.risk_score_calculation import score_analysis_results, ascore_analysis_results
+from core.models import RiskScoreCache
+
+CLEAR = ["No sanctioned, mixer, or darknet entity transactions detected.", "No structuring behaviour detected.", "Layering analysis: 0 cycles detected"]
+
+
+class NormalizeFindingsTests(SimpleTestCase):
+    def test_labels(self):
+        results = [
+            {"message": "Flagged transactions detected for wallet A.", "failedChecks": [
+                {"message": "Mixer entity transaction(s) detected for address at hop 2."},
+                {"message": "Sanctioned entity transaction(s) detected for address at hop 1."},
+            ]},
+            "Structuring behaviour detected: 3 transfers",
+            "Layering analysis: 2 cycles detected\nRapid layering cycle A -> B -> A\nCyclic transfer A -> C -> A",
+            "Wallet  B is directly flagged as Darknet.",
+        ]
+        self.assertEqual(normalize_findings(results), (
+            "direct:darknet", "exposure", "exposure:mixer:hop2", "exposure:sanctioned:hop1",
+            "layering:cycles", "layering:cyclic", "layering:rapid", "structuring",
+        ))
+
+    def test_clear_and_free_text(self):
+        self.assertEqual(normalize_findings(CLEAR + CLEAR), ("layering:clear", "sanctions:clear", "structuring:clear"))
+        self.assertEqual(normalize_findings(["  Looks   Fine  "]), ("text:looks fine",))
+
+
+class RuleScoreTests(SimpleTestCase):
+    def test_weights(self):
+        self.assertEqual(rule_score(("layering:clear", "sanctions:clear", "structuring:clear")), 1)
+        self.assertEqual(rule_score(("structuring",)), 6)
+        # The heaviest finding plus one per additional risk finding
+        self.assertEqual(rule_score(("exposure:sanctioned:hop1", "layering:cyclic", "structuring")), 10)
+        self.assertEqual(rule_score(("exposure", "exposure:mixer:hop1", "sanctions:clear")), 6)
+
+    def test_hop_decay(self):
+        self.assertEqual(rule_score(("exposure:sanctioned:hop1",)), 8)
+        self.assertEqual(rule_score(("exposure:sanctioned:hop3",)), 6)
+        self.assertEqual(rule_score(("exposure:mixer:hop9",)), 1)
+
+    def test_unknown_findings_are_not_scored(self):
+        self.assertIsNone(rule_score(("structuring", "text:looks fine")))
+
+
+class StubChain:
+    model_name = "stub"
+
+    def __init__(self, score: int):
+        self.score = score
+        self.calls = 0
+
+    def invoke(self, inputs):
+        self.calls += 1
+        return str(self.score)
+
+    async def ainvoke(self, inputs):
+        return self.invoke(inputs)
+
+
+class ScoreAnalysisResultsTests(TransactionTestCase):
+    def setUp(self):
+        self.chain = StubChain(7)
+        risk_score_calculation.set_chain(self.chain)
+        self.addCleanup(risk_score_calculation.set_chain, None)
+        scoring.clear_cache()
+        self.addCleanup(scoring.clear_cache)
+
+    def test_rule_scores_skip_the_cache(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(score_analysis_results(CLEAR), 1)
+            self.assertEqual(asyncio.run(ascore_analysis_results(["Structuring behaviour detected: 3 transfers"])), 6)
+        self.assertEqual((self.chain.calls, RiskScoreCache.objects.count()), (0, 0))
+
+    def test_model_scores_are_cached(self):
+        results = CLEAR + ["The wallet looks unusual."]
+        self.assertEqual(score_analysis_results(results), 7)
+        self.assertEqual(RiskScoreCache.objects.count(), 1)
+        self.assertEqual(score_analysis_results(results), 7)
+        # Served from the table once the in-process LRU is gone
+        with scoring._lru_lock:
+            scoring._lru.clear()
+        self.assertEqual(asyncio.run(ascore_analysis_results(results)), 7)
+        self.assertEqual(self.chain.calls, 1)
+
+    @override_settings(AML_SCORING_RULES_ENABLED=False)
+    def test_without_rules_every_score_comes_from_the_model(self):
+        self.assertEqual(score_analysis_results(CLEAR), 7)
+        self.assertEqual(self.chain.calls, 1)
+
+    def test_short_circuit_findings(self):
+        self.assertEqual(score_analysis_results(["Wallet A is directly flagged as sanctioned.", "The wallet looks unusual."]), 10)
+        self.assertEqual(self.chain.calls, 0)
@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from core.agents.structuring import StructuringConfig, detect_structuring
+from core.tests.utils import START
+
+
+class StructuringTests(SimpleTestCase):
+    config = StructuringConfig(transaction_limit=10000, threshold=10000, window=pd.Timedelta("24h"))
+
+    def _reference(self, frame: pd.DataFrame) -> list:
+        # Per sender, pandas' time-based rolling sum over (t - 24h, t] of the sub-limit transfers
+        rows = []
+        eligible = frame[frame["amount"] < self.config.transaction_limit].sort_values(["sender", "timestamp"], kind="stable")
+        for sender, transfers in eligible.groupby("sender", sort=False):
+            rolling = transfers.set_index("timestamp")["amount"].rolling(self.config.window)
+            for end, total, count in zip(transfers["timestamp"], rolling.sum(), rolling.count()):
+                if total > self.config.threshold:
+                    rows.append((sender, end, round(total, 6), int(count)))
+        return sorted(rows)
+
+    def _detected(self, frame: pd.DataFrame) -> list:
+        breaches = detect_structuring(frame, self.config)
+        return sorted(
+            (sender, end, round(total, 6), int(count))
+            for sender, end, total, count in zip(breaches["sender"], breaches["window_end"], breaches["total_amount"], breaches["transaction_count"])
+        )
+
+    def test_matches_pandas_rolling_window(self):
+        for seed in range(20):
+            rng = np.random.default_rng(seed)
+            size = 400
+            frame = pd.DataFrame({
+                "sender": rng.choice(["a", "b", "c", "d"], size),
+                "amount": rng.choice([300.0, 2500.0, 4999.5, 9999.0, 10000.0, 25000.0], size),
+                # Shared timestamps and gaps around the 24h boundary
+                "timestamp": pd.to_datetime(START) + pd.to_timedelta(np.cumsum(rng.choice([0, 1, 3600, 43200, 86400], size)), unit="s"),
+            })
+            with self.subTest(seed=seed):
+                self.assertEqual(self._detected(frame), self._reference(frame))
+
+    def test_window_excludes_its_start(self):
+        frame = pd.DataFrame({
+            "sender": ["a", "a", "a"],
+            "amount": [6000.0, 6000.0, 6000.0],
+            "timestamp": pd.to_datetime([START, START + timedelta(hours=24), START + timedelta(hours=25)]),
+        })
+        breaches = detect_structuring(frame, self.config)
+        self.assertEqual(list(breaches["window_end"]), [pd.Timestamp(START + timedelta(hours=25))])
+        self.assertEqual(list(breaches["transaction_count"]), [2])
+
+    def test_limit_and_empty_input(self):
+        frame = pd.DataFrame({"sender": ["a", "a"], "amount": [10000.0, 15000.0], "timestamp": pd.to_datetime([START, START])})
+        self.assertTrue(detect_structuring(frame, self.config).empty)
+        self.assertTrue(detect_structuring(frame.iloc[:0], self.config).empty)
@@ -0,0 +1,103 @@
+import random
+from datetime import timedelta
+
+import pandas as pd
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from core.models import StructuringState, Transaction
+from core.structuring_monitor import SlidingWindow, StructuringMonitor, config_key, open_cursor, replay_breach, store_records
+from core.agents.structuring import StructuringConfig
+from core.agents.transactions import TransactionBatch
+from core.tests import utils
+
+CONFIG = StructuringConfig(transaction_limit=10000, threshold=10000, window=pd.Timedelta("1h"))
+EPOCH = int(utils.START.timestamp())
+
+
+class SlidingWindowTests(SimpleTestCase):
+    def test_matches_a_full_rescan(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            window, accepted, newest = SlidingWindow(), [], None
+            for i in range(300):
+                # Mostly in order, some late, some replayed
+                timestamp = max(0, (newest or 0) + rng.choice([0, 60, 600, 1800, -300, -1200, -4000]))
+                tx_hash = f"t{rng.randrange(i + 1)}" if rng.random() < 0.1 else f"t{i}"
+                added = window.add(timestamp, 100.0, tx_hash, 3600)
+                live = [entry for entry in accepted if entry[0] > (newest if newest is not None else timestamp) - 3600]
+                expected = not any(entry[0] == timestamp and entry[2] == tx_hash for entry in live) and (newest is None or timestamp > newest - 3600)
+                with self.subTest(seed=seed, i=i):
+                    self.assertEqual(added, expected)
+                if added:
+                    accepted.append((timestamp, 100.0, tx_hash))
+                    newest = max(newest, timestamp) if newest is not None else timestamp
+                accepted = [entry for entry in accepted if entry[0] > newest - 3600]
+                with self.subTest(seed=seed, i=i):
+                    items = window.items()
+                    self.assertEqual(sorted(items), sorted(accepted))
+                    self.assertEqual([entry[0] for entry in items], sorted(entry[0] for entry in items))
+                    self.assertAlmostEqual(window.total, 100.0 * len(accepted))
+
+    def test_breach_covers_late_entries(self):
+        window = SlidingWindow()
+        window.add(EPOCH + 600, 6000.0, "b", 3600)
+        window.add(EPOCH, 5000.0, "a", 3600)
+        self.assertEqual(window.breach(10000), {"window_start": EPOCH, "window_end": EPOCH + 600, "total_amount": 11000.0, "transaction_count": 2})
+        self.assertFalse(window.add(EPOCH, 5000.0, "a", 3600))
+        # The late entry expires first
+        window.add(EPOCH + 3700, 1.0, "c", 3600)
+        self.assertEqual([entry[2] for entry in window.items()], ["b", "c"])
+        self.assertIsNone(window.breach(10000))
+
+
+class StructuringMonitorTests(TestCase):
+    def test_flags_and_resumes_from_the_persisted_state(self):
+        monitor = StructuringMonitor(CONFIG)
+        self.assertEqual(monitor.observe([("a", "S", 6000.0, EPOCH), ("x", "S", 20000.0, EPOCH + 60)]), [])
+        monitor.flush()
+        state = StructuringState.objects.get(sender="S")
+        self.assertEqual((state.window, state.last_timestamp, state.flagged), ([[EPOCH, 6000.0, "a"]], EPOCH + 60, False))
+
+        alerts = StructuringMonitor(CONFIG).observe([("a", "S", 6000.0, EPOCH), ("b", "S", 5000.0, EPOCH + 120)])
+        self.assertEqual(alerts, [("S", {"window_start": EPOCH, "window_end": EPOCH + 120, "total_amount": 11000.0, "transaction_count": 2})])
+
+    def test_replay_breach_continues_the_state(self):
+        state = StructuringState(sender="S", config=config_key(CONFIG), window=[[EPOCH, 6000.0, "a"]], window_total=6000.0, last_timestamp=EPOCH)
+
+        def sent(transfers):
+            return [TransactionBatch.from_records(utils.records(transfers))]
+
+        self.assertTrue(replay_breach(state, sent([("S", "B", 60, 5000)]), CONFIG))
+        # Older than the state, at or above the limit, or after the window: no breach
+        self.assertFalse(replay_breach(state, sent([("S", "B", -60, 5000), ("S", "B", 60, 10000), ("S", "B", 3600, 5000)]), CONFIG))
+        self.assertEqual(state.window, [[EPOCH, 6000.0, "a"]])
+
+
+@override_settings(AML_STRUCTURING_MONITOR_LAG=30)
+class StoreRecordsTests(TestCase):
+    def _row(self, tx_hash: str, ingested_at, seconds: int = 0) -> Transaction:
+        return Transaction.objects.create(tx_hash=tx_hash, sender="S", receiver="R", amount="100", timestamp=utils.START + timedelta(seconds=seconds), ingested_at=ingested_at)
+
+    def test_reads_by_watermark_behind_the_lag(self):
+        now = timezone.now()
+        self._row("a", now - timedelta(minutes=5), seconds=60)
+        self._row("b", now - timedelta(minutes=5), seconds=0)
+        self._row("recent", now)
+        records, offset = store_records(0, 10)
+        self.assertEqual([record[0] for record in records], ["b", "a"])
+        self.assertEqual(store_records(offset, 10), ([], offset))
+
+        # A row with a lower position that only became visible later is still read
+        self._row("late", now - timedelta(minutes=4))
+        Transaction.objects.filter(tx_hash="recent").update(ingested_at=now - timedelta(minutes=1))
+        records, offset = store_records(offset, 1)
+        self.assertEqual([record[0] for record in records], ["late"])
+        records, _ = store_records(offset, 10)
+        self.assertEqual([record[0] for record in records], ["recent"])
+
+    def test_open_cursor_resets_on_new_settings(self):
+        StructuringState.objects.create(sender="S", config="old")
+        cursor = open_cursor("structuring:store", CONFIG)
+        self.assertEqual(cursor.position, {"config": config_key(CONFIG), "offset": 0})
+        self.assertFalse(StructuringState.objects.exists())
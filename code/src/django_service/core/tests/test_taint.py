@@ -0,0 +1,127 @@
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils.dateparse import parse_datetime
+
+from core import taint, transaction_store
+from core.models import TaintRecord, Transaction
+from core.agents import watchlist
+from core.agents.tools.fetch_transactions import TransactionSnapshot
+from core.agents.tools.sanction_check import analyze_sanctions
+from core.tests import utils
+
+
+class BfsTests(SimpleTestCase):
+    def _bfs(self, edges, sources, max_hops, hubs=(), barriers=()):
+        senders, receivers = (np.array(column, dtype=np.int64) for column in zip(*edges))
+        size = int(max(senders.max(), receivers.max())) + 1
+        hub_mask, barrier_mask = np.zeros(size, dtype=bool), np.zeros(size, dtype=bool)
+        hub_mask[list(hubs)] = True
+        barrier_mask[list(barriers)] = True
+        hop, parent = taint._bfs(np.array(sources), senders, receivers, hub_mask, barrier_mask, max_hops)
+        return hop.tolist(), parent.tolist()
+
+    def test_both_directions_up_to_max_hops(self):
+        # 0 -> 1, 2 -> 1, 2 -> 3, 4 -> 3
+        hop, parent = self._bfs([(0, 1), (2, 1), (2, 3), (4, 3)], [0], 3)
+        self.assertEqual(hop, [0, 1, 2, 3, -1])
+        self.assertEqual(parent, [-1, 0, 1, 2, -1])
+
+    def test_nearest_source_wins(self):
+        hop, _ = self._bfs([(0, 1), (1, 2), (2, 3), (4, 3)], [0, 4], 3)
+        self.assertEqual(hop, [0, 1, 2, 1, 0])
+
+    def test_hubs_and_barriers(self):
+        chain = [(0, 1), (1, 2), (2, 3)]
+        # A hub is tainted next to a listed entity only, and passes it on from there
+        self.assertEqual(self._bfs(chain, [0], 3, hubs=[1])[0], [0, 1, 2, 3])
+        self.assertEqual(self._bfs(chain, [0], 3, hubs=[2])[0], [0, 1, -1, -1])
+        # A barrier is tainted but never passes taint on
+        self.assertEqual(self._bfs(chain, [0], 3, barriers=[1])[0], [0, 1, -1, -1])
+
+
+@override_settings(AML_TAINT_TABLE=True, AML_TRANSACTION_STORE=True, AML_TRANSACTION_STORE_SYNC_INTERVAL=3600)
+class TaintTableTests(TransactionTestCase):
+    # S (sanctioned) <- A <- B <- C, M (mixer) -> D; the backend also knows C -> E, which is not in the store yet
+    STORED = [("A", "S", 0), ("B", "A", 60), ("C", "B", 120), ("M", "D", 180)]
+    BACKEND = STORED + [("C", "E", 240)]
+
+    def setUp(self):
+        self._store(utils.records(self.STORED))
+        patcher = mock.patch.object(watchlist, "_watchlist", utils.canned_watchlist(sanctioned=["S"], mixers=["M"]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        taint._built_hops.clear()
+        self.addCleanup(taint._built_hops.clear)
+
+    def _store(self, records: list) -> list:
+        return Transaction.objects.bulk_create([
+            Transaction(tx_hash=tx["hash"], sender=tx["sender"], receiver=tx["receiver"], amount=tx["amount"], denom=tx["denom"], timestamp=parse_datetime(tx["timestamp"]))
+            for tx in records
+        ])
+
+    def _table(self) -> set:
+        return set(TaintRecord.objects.values_list("address", "category", "hop"))
+
+    def test_propagate(self):
+        self.assertEqual(taint.propagate(3, sync=False), 4)
+        self.assertEqual(self._table(), {("A", "sanctioned", 1), ("B", "sanctioned", 2), ("C", "sanctioned", 3), ("D", "mixer", 1)})
+        self.assertEqual(TaintRecord.objects.get(address="C").path, ["C", "B", "A", "S"])
+
+    def test_usable(self):
+        self.assertFalse(taint.usable(1))
+        taint.propagate(2, sync=False)
+        self.assertTrue(taint.usable(1))
+        self.assertTrue(taint.usable(2))
+        self.assertFalse(taint.usable(3))
+        with override_settings(AML_TAINT_TABLE=False):
+            self.assertFalse(taint.usable(1))
+
+    def test_usable_notices_a_rebuild_with_fewer_hops(self):
+        taint.propagate(3, sync=False)
+        self.assertTrue(taint.usable(3))
+        # Rebuilt by another process
+        TaintRecord.objects.update(max_hops=1)
+        with mock.patch.object(taint, "BUILT_HOPS_TTL", 0):
+            self.assertFalse(taint.usable(3))
+            self.assertTrue(taint.usable(1))
+            TaintRecord.objects.all().delete()
+            self.assertFalse(taint.usable(1))
+
+    def test_update_taint_matches_a_rebuild(self):
+        taint.propagate(3, sync=False)
+        # A new transfer makes E three hops from S, and F four
+        new = self._store(utils.records([("E", "B", 300), ("F", "E", 360)]))
+        self.assertEqual(taint.update_taint(new), 1)
+        incremental = self._table()
+        taint.propagate(3, sync=False)
+        self.assertEqual(incremental, self._table())
+        self.assertIn(("E", "sanctioned", 3), incremental)
+
+    def test_update_taint_shortens_hops(self):
+        taint.propagate(3, sync=False)
+        new = self._store(utils.records([("C", "S", 300)]))
+        taint.update_taint(new)
+        self.assertEqual(TaintRecord.objects.get(address="C").hop, 1)
+        self.assertEqual(TaintRecord.objects.get(address="C").path, ["C", "S"])
+
+    # One sync at a time: SQLite's shared-cache test database fails concurrent writers instead of waiting
+    @override_settings(AML_BACKEND_MAX_CONCURRENCY=1)
+    def test_propagate_syncs_the_listed_neighbourhoods(self):
+        Transaction.objects.all().delete()
+        backend = utils.records(self.BACKEND)
+        requested = []
+
+        def stream_items(path, key, params=None):
+            address = path.rsplit("/", 1)[1]
+            requested.append(address)
+            return iter([tx for tx in backend if address in (tx["sender"], tx["receiver"])])
+
+        with mock.patch.object(transaction_store, "stream_items", stream_items):
+            taint.propagate(3)
+            # Listed entities and everything up to two hops from them, not the third hop
+            self.assertEqual(sorted(requested), ["A", "B", "D", "M", "S"])
+            self.assertIn(("C", "sanctioned", 3), self._table())
+            result = analyze_sanctions("C", 3, TransactionSnapshot())
+        self.assertEqual(result["failedChecks"][0]["path"], ["C", "B", "A", "S"])
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TransactionTestCase, override_settings
+
+from core import transaction_store
+from core.models import AddressCursor, Transaction
+from core.agents.transactions import TransactionWindow
+from core.tests import utils
+
+
+@override_settings(AML_TRANSACTION_STORE=True, AML_TRANSACTION_STORE_SYNC_INTERVAL=3600, AML_FETCH_CHUNK_ROWS=2, AML_TAINT_TABLE=False)
+class TransactionStoreTests(TransactionTestCase):
+    HISTORY = [("A", "B", 0), ("B", "A", 60), ("A", "C", 120)]
+
+    def _backend(self, records: list, fail_after: int = None):
+        calls = []
+
+        def stream_items(path, key, params=None):
+            calls.append(params)
+            for i, tx in enumerate(records):
+                if fail_after is not None and i == fail_after:
+                    raise ValueError("truncated response")
+                yield tx
+
+        async def astream_items(path, key, params=None):
+            for tx in stream_items(path, key, params):
+                yield tx
+
+        patchers = [mock.patch.object(transaction_store, "stream_items", stream_items), mock.patch.object(transaction_store, "astream_items", astream_items)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        return calls
+
+    def test_first_sync_stores_the_history(self):
+        calls = self._backend(utils.records(self.HISTORY))
+        self.assertEqual(transaction_store.sync_address("A"), 3)
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(calls, [None])
+        cursor = AddressCursor.objects.get(address="A")
+        self.assertEqual(cursor.last_timestamp, utils.START + timedelta(seconds=120))
+
+    def test_fresh_cursor_skips_the_backend(self):
+        calls = self._backend(utils.records(self.HISTORY))
+        transaction_store.sync_address("A")
+        self.assertEqual(transaction_store.sync_address("A"), 0)
+        self.assertEqual(len(calls), 1)
+
+    def test_resync_keeps_only_newer_transfers(self):
+        history = utils.records(self.HISTORY)
+        self._backend(history)
+        transaction_store.sync_address("A")
+        # The backend resends the whole history: a new transfer at the cursor timestamp is kept, repeats are dropped
+        newer = utils.records(self.HISTORY + [("C", "A", 120), ("B", "A", 180)])[3:]
+        self._backend(history + newer)
+        with mock.patch.object(Transaction.objects, "bulk_create", wraps=Transaction.objects.bulk_create) as bulk_create:
+            self.assertEqual(transaction_store.sync_address("A", force=True), 2)
+        written = [tx.tx_hash for call in bulk_create.call_args_list for tx in call.args[0]]
+        self.assertEqual(written, ["t3", "t4"])
+        self.assertEqual(Transaction.objects.count(), 5)
+
+    def test_truncated_stream_keeps_the_cursor(self):
+        self._backend(utils.records(self.HISTORY), fail_after=2)
+        with self.assertRaises(ValueError):
+            transaction_store.sync_address("A")
+        cursor = AddressCursor.objects.get(address="A")
+        self.assertIsNone(cursor.last_timestamp)
+        self.assertIsNone(cursor.synced_at)
+        # The chunk written before the failure is kept and read again by the next sync
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_batches_are_windowed_and_chunked(self):
+        self._backend(utils.records(self.HISTORY + [("A", "D", 180)]))
+        window = TransactionWindow(since=int(utils.START.timestamp()) + 60)
+        batches = list(transaction_store.iter_batches("A", window, chunk_rows=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual([tx for batch in batches for tx in batch.hashes], ["t1", "t2", "t3"])
+
+    async def test_async_sync_and_batches(self):
+        self._backend(utils.records(self.HISTORY))
+        self.assertEqual(await transaction_store.async_address("A"), 3)
+        batches = [batch async for batch in transaction_store.aiter_batches("A", TransactionWindow(), chunk_rows=2)]
+        self.assertEqual([len(batch) for batch in batches], [2, 1])
+        self.assertEqual([tx for batch in batches for tx in batch.hashes], ["t0", "t1", "t2"])
@@ -0,0 +1,97 @@
+import hashlib
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.agents import watchlist
+from core.tests import utils
+
+
+class ListsBackend:
+    # The three list endpoints with ETags: a list sent with its current ETag answers 304
+    def __init__(self, **lists):
+        self.lists = {"sanctioned": [], "mixers": [], "darknet": [], **lists}
+        self.fetched = []
+
+    def get(self, path, headers=None):
+        key = {"/sanctions/all": "sanctioned", "/mixers/all": "mixers", "/darknet/all": "darknet"}[path]
+        response = utils.StubResponse({key: self.lists[key]})
+        response.headers = {"ETag": hashlib.sha1(response.content).hexdigest()}
+        if (headers or {}).get("If-None-Match") == response.headers["ETag"]:
+            response.status_code = 304
+        else:
+            self.fetched.append(key)
+        return response
+
+
+class WatchlistCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = ListsBackend(sanctioned=["S", "SM"], mixers=["M", "SM"])
+        patcher = mock.patch.object(watchlist, "get", self.backend.get)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = watchlist.WatchlistCache(ttl=3600)
+        self.cache.refresh()
+
+    def test_changed_lists_are_applied_as_deltas(self):
+        self.assertEqual(self.cache.index(), {"S": 1, "SM": 3, "M": 2})
+        version = self.cache.version
+        self.backend.fetched.clear()
+        self.backend.lists["mixers"] = ["M2", "SM"]
+        self.backend.lists["darknet"] = ["S"]
+        self.cache.refresh()
+        self.assertEqual(self.backend.fetched, ["mixers", "darknet"])
+        self.assertEqual(self.cache.index(), {"S": 5, "SM": 3, "M2": 2})
+        self.assertNotEqual(self.cache.version, version)
+
+        # Removing an address from every list drops it from the index
+        self.backend.lists["sanctioned"] = ["SM"]
+        self.backend.lists["darknet"] = []
+        self.cache.refresh()
+        self.assertEqual(self.cache.index(), {"SM": 3, "M2": 2})
+        self.assertEqual(self.cache._lists, {"sanctioned": {"SM"}, "mixer": {"M2", "SM"}, "darknet": set()})
+
+    def test_a_failed_list_keeps_the_previous_lists(self):
+        self.backend.lists["sanctioned"] = ["S2"]
+        with mock.patch.dict(self.backend.lists, {"mixers": None}):
+            with self.assertRaises(TypeError):
+                self.cache.refresh()
+        self.assertEqual(self.cache.index(), {"S": 1, "SM": 3, "M": 2})
+        self.assertEqual(self.cache._lists["sanctioned"], {"S", "SM"})
+        self.cache.refresh()
+        self.assertEqual(self.cache.index(), {"S2": 1, "SM": 2, "M": 2})
+
+    def test_failed_background_refresh_keeps_the_lists(self):
+        with mock.patch.object(watchlist, "get", side_effect=ConnectionError("backend down")):
+            with self.assertLogs("core.agents.watchlist", "ERROR") as logs:
+                self.cache._refreshing = True
+                self.cache._background_refresh()
+        self.assertIn("Watchlist refresh failed", logs.output[0])
+        self.assertFalse(self.cache._refreshing)
+        self.assertEqual(self.cache.lookup("S"), watchlist.SANCTIONED)
+
+    def test_one_background_refresh_at_a_time(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def blocking_get(path, headers=None):
+            calls.append(path)
+            started.set()
+            release.wait(5)
+            return self.backend.get(path, headers)
+
+        with mock.patch.object(watchlist, "get", blocking_get):
+            self.cache.refresh_in_background()
+            self.assertTrue(started.wait(5))
+            # A stale lookup while the refresh runs neither waits for it nor starts another one
+            self.cache._loaded_at = 0.0
+            self.assertEqual(self.cache.lookup("S"), watchlist.SANCTIONED)
+            self.assertEqual(len(calls), 1)
+            self.assertTrue(self.cache._refreshing)
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == "watchlist-refresh":
+                    thread.join(5)
+        self.assertFalse(self.cache._refreshing)
+        self.assertEqual(len(calls), len(watchlist.CATEGORIES))
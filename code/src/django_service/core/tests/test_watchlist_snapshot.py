@@ -0,0 +1,117 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.agents import watchlist, watchlist_snapshot
+from core.agents.watchlist_snapshot import WatchlistSnapshot, write_snapshot
+from core.tests import utils
+
+
+class WatchlistSnapshotTests(SimpleTestCase):
+    INDEX = {"S": watchlist.SANCTIONED, "M": watchlist.MIXER, "SX": watchlist.SANCTIONED | watchlist.DARKNET}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "watchlist.snapshot")
+
+    def test_round_trip(self):
+        write_snapshot(self.path, self.INDEX, "0123456789abcdef-ignored")
+        snapshot = WatchlistSnapshot(self.path)
+        self.assertEqual(snapshot.version, "0123456789abcdef")
+        self.assertEqual(len(snapshot), 3)
+        for address, mask in self.INDEX.items():
+            self.assertEqual(snapshot.lookup(address), mask)
+        self.assertEqual(snapshot.lookup("clean"), 0)
+        self.assertEqual(list(snapshot.lookup_many(["M", "clean", "SX", "S", "M"])), [2, 0, 5, 1, 2])
+        self.assertEqual(list(snapshot.lookup_many([])), [])
+        # The temporary file was renamed into place
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ["watchlist.snapshot"])
+
+    def test_empty_snapshot(self):
+        write_snapshot(self.path, {}, "v0")
+        snapshot = WatchlistSnapshot(self.path)
+        self.assertEqual((len(snapshot), snapshot.lookup("S")), (0, 0))
+        self.assertEqual(list(snapshot.lookup_many(["S", "M"])), [0, 0])
+
+    def test_colliding_hashes_are_confirmed_against_the_address(self):
+        with mock.patch.object(watchlist_snapshot, "address_hash", lambda address: 7):
+            write_snapshot(self.path, self.INDEX, "v1")
+            snapshot = WatchlistSnapshot(self.path)
+            self.assertEqual(len(snapshot), 3)
+            for address, mask in self.INDEX.items():
+                self.assertEqual(snapshot.lookup(address), mask)
+            # Same hash as every listed address, but not listed itself
+            self.assertEqual(snapshot.lookup("clean"), 0)
+            self.assertEqual(list(snapshot.lookup_many(["clean", "SX"])), [0, 5])
+
+    def test_addresses(self):
+        write_snapshot(self.path, {**self.INDEX, "caf\u00e9": watchlist.MIXER}, "v1")
+        self.assertEqual(sorted(WatchlistSnapshot(self.path).addresses()), sorted([*self.INDEX, "caf\u00e9"]))
+
+    def test_rejects_other_and_truncated_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertRaises(ValueError):
+            WatchlistSnapshot(self.path)
+        write_snapshot(self.path, self.INDEX, "v1")
+        with open(self.path, "r+b") as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            WatchlistSnapshot(self.path)
+
+    def test_close(self):
+        write_snapshot(self.path, self.INDEX, "v1")
+        snapshot = WatchlistSnapshot(self.path)
+        snapshot.close()
+        self.assertTrue(snapshot._map.closed)
+        self.assertEqual(snapshot.lookup("S"), 0)
+        # Views still held by a running lookup keep the map open
+        snapshot = WatchlistSnapshot(self.path)
+        view = snapshot.hashes
+        snapshot.close()
+        self.assertFalse(snapshot._map.closed)
+        self.assertEqual(len(view), 3)
+
+    def test_mapped_reader_picks_up_a_refresh(self):
+        write_snapshot(self.path, {"S": watchlist.SANCTIONED}, "v1")
+        reader = watchlist.SnapshotWatchlist(self.path, check_interval=0)
+        self.assertEqual((reader.version, reader.lookup("S"), reader.lookup("M")), ("v1", watchlist.SANCTIONED, 0))
+        previous = reader._snapshot
+
+        write_snapshot(self.path, {"M": watchlist.MIXER}, "v2")
+        self.assertEqual((reader.version, reader.lookup("S"), reader.lookup("M")), ("v2", 0, watchlist.MIXER))
+        self.assertEqual(list(reader.lookup_many(["S", "M"])), [0, watchlist.MIXER])
+        # A lookup still holding the replaced map keeps reading the old, complete snapshot
+        self.assertIsNot(reader._snapshot, previous)
+        self.assertEqual((previous.version, previous.lookup("S")), ("v1", watchlist.SANCTIONED))
+
+        # The superseded map is closed at the next swap
+        write_snapshot(self.path, {"X": watchlist.DARKNET}, "v3")
+        self.assertEqual((reader.version, reader.lookup("X")), ("v3", watchlist.DARKNET))
+        self.assertTrue(previous._map.closed)
+
+    def test_refresh_waits_for_the_check_interval(self):
+        write_snapshot(self.path, {"S": watchlist.SANCTIONED}, "v1")
+        reader = watchlist.SnapshotWatchlist(self.path, check_interval=3600)
+        self.assertEqual(reader.version, "v1")
+        write_snapshot(self.path, {"M": watchlist.MIXER}, "v2")
+        self.assertEqual(reader.lookup("S"), watchlist.SANCTIONED)
+        reader.refresh()
+        self.assertEqual((reader.version, reader.lookup("S")), ("v2", 0))
+
+    def test_missing_and_unreadable_snapshots_are_logged(self):
+        reader = watchlist.SnapshotWatchlist(self.path, check_interval=3600)
+        with mock.patch.object(watchlist, "WatchlistCache", return_value=utils.canned_watchlist(mixers=["M"])):
+            with self.assertLogs("core.agents.watchlist", "WARNING") as logs:
+                self.assertEqual(reader.lookup("M"), watchlist.MIXER)
+        self.assertIn("No watchlist snapshot", logs.output[0])
+
+        with open(self.path, "wb") as f:
+            f.write(b"\0" * 64)
+        with self.assertLogs("core.agents.watchlist", "WARNING") as logs:
+            reader.refresh()
+        self.assertIn("Cannot map the watchlist snapshot", logs.output[0])
+        self.assertIsNone(reader._snapshot)
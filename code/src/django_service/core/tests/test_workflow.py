@@ -0,0 +1,101 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import result_cache, workflow
+from core.models import AddressCursor, AMLRequest, Transaction
+from core.agents import watchlist
+from core.tests import utils
+
+
+class FailedChecksTests(SimpleTestCase):
+    def test_clear_results_are_not_failed_checks(self):
+        clear = ["No sanctioned, mixer, or darknet entity transactions detected.", "No structuring behaviour detected.", "Layering analysis: 0 cycles detected"]
+        self.assertEqual(workflow._collect_failed_checks(clear), [])
+
+    def test_findings_are_failed_checks(self):
+        flagged = {"message": "Flagged transactions detected for wallet A.", "failedChecks": []}
+        contents = [flagged, "Layering analysis: 2 cycles detected\nCyclic transfer A -> B -> A", "The wallet was not detected anywhere."]
+        self.assertEqual(workflow._collect_failed_checks(contents), [str(flagged), contents[1]])
+
+
+class WarmUpTests(SimpleTestCase):
+    @override_settings(AML_WARMUP=False)
+    def test_disabled_by_setting(self):
+        with mock.patch.object(workflow, "warm_up") as warm_up:
+            self.assertIsNone(workflow.warm_up_if_enabled())
+        warm_up.assert_not_called()
+
+    @override_settings(AML_WARMUP=True)
+    def test_runs_off_the_calling_thread(self):
+        threads = []
+        with mock.patch.object(workflow, "warm_up", lambda: threads.append(threading.current_thread())):
+            workflow.warm_up_if_enabled().join(5)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    @override_settings(AML_WARMUP=True)
+    def test_failure_is_logged(self):
+        with mock.patch.object(workflow, "warm_up", side_effect=ConnectionError("backend down")):
+            with self.assertLogs("core.workflow", "ERROR") as logs:
+                workflow.warm_up_if_enabled().join(5)
+        self.assertIn("Warm-up failed", logs.output[0])
+
+
+@override_settings(AML_TRANSACTION_STORE=True, AML_TAINT_TABLE=False, AML_TRANSACTION_STORE_SYNC_INTERVAL=3600, AML_PIPELINE_MODE="fast")
+class StoredWalletsTestCase(TransactionTestCase):
+    # A -> M (mixer), E -> F is clean; both served from a freshly synced local store
+    TRANSFERS = [("A", "M", 0), ("E", "F", 60)]
+
+    def setUp(self):
+        now = timezone.now()
+        records = utils.records(self.TRANSFERS)
+        Transaction.objects.bulk_create([
+            Transaction(tx_hash=tx["hash"], sender=tx["sender"], receiver=tx["receiver"], amount=tx["amount"], denom=tx["denom"], timestamp=tx["timestamp"])
+            for tx in records
+        ])
+        AddressCursor.objects.bulk_create([AddressCursor(address=address, synced_at=now) for address in "AMEF"])
+        patcher = mock.patch.object(watchlist, "_watchlist", utils.canned_watchlist(mixers=["M"]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        result_cache._lru.clear()
+        self.addCleanup(result_cache._lru.clear)
+
+
+class FastModeViewTests(StoredWalletsTestCase):
+    def _screen(self, wallet: str) -> dict:
+        response = APIClient().get("/compute-risk/", {"wallet_address": wallet, "mode": "fast"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_clean_wallet_has_no_failed_checks(self):
+        self.assertEqual(self._screen("E")["failed_checks"], [])
+
+    def test_flagged_wallet_reports_the_exposure(self):
+        failed_checks = self._screen("A")["failed_checks"]
+        self.assertEqual(len(failed_checks), 1)
+        self.assertIn("mixer", failed_checks[0])
+
+
+@override_settings(AML_BATCH_SAVE_CHUNK=1)
+class BatchViewTests(StoredWalletsTestCase):
+    def _batch(self, wallets: list, refresh: bool = False) -> dict:
+        response = APIClient().post("/compute-risk/batch/", {"wallet_addresses": wallets, "mode": "fast", "refresh": refresh}, format="json")
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        return {line["wallet_address"]: line for line in lines}
+
+    def test_results_are_upserted_per_wallet_and_mode(self):
+        results = self._batch(["E", "A", "E"])
+        self.assertEqual(sorted(results), ["A", "E"])
+        self.assertEqual((results["E"]["failed_checks"], len(results["A"]["failed_checks"])), ([], 1))
+        AMLRequest.objects.filter(wallet_address="A").update(risk_score=0)
+
+        self._batch(["A", "E"], refresh=True)
+        rows = sorted(AMLRequest.objects.values_list("wallet_address", "mode", "risk_score"))
+        self.assertEqual([row[:2] for row in rows], [("A", "fast"), ("E", "fast")])
+        self.assertEqual(rows[0][2], results["A"]["risk_score"])
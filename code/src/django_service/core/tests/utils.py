@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from core.agents import watchlist
+
+START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def records(transfers: list) -> list:
+    # (sender, receiver, seconds after START[, amount]) -> backend transaction records
+    return [
+        {
+            "hash": f"t{i}",
+            "sender": sender,
+            "receiver": receiver,
+            "amount": str(rest[0] if rest else 100),
+            "denom": "u",
+            "timestamp": (START + timedelta(seconds=seconds)).isoformat().replace("+00:00", "Z"),
+        }
+        for i, (sender, receiver, seconds, *rest) in enumerate(transfers)
+    ]
+
+
+class StubResponse:
+    def __init__(self, data: dict):
+        self.status_code = 200
+        self.headers = {}
+        self.content = repr(sorted(data.items())).encode()
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+def canned_watchlist(sanctioned=(), mixers=(), darknet=()) -> watchlist.WatchlistCache:
+    # A watchlist loaded from canned backend responses
+    lists = {"/sanctions/all": {"sanctioned": list(sanctioned)}, "/mixers/all": {"mixers": list(mixers)}, "/darknet/all": {"darknet": list(darknet)}}
+    with mock.patch.object(watchlist, "get", lambda path, headers=None: StubResponse(lists[path])):
+        cache = watchlist.WatchlistCache(ttl=3600)
+        cache.refresh()
+    return cache
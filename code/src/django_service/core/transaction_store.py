@@ -0,0 +1,214 @@
+# Local transaction store. Each address is ingested incrementally: only transactions newer than its
+# cursor are written, and an address synced less than AML_TRANSACTION_STORE_SYNC_INTERVAL seconds ago is
+# served with one indexed query and no backend call at all. The backend response is streamed and written
+# AML_FETCH_CHUNK_ROWS transactions at a time, so ingesting a long history never holds it whole.
+# Ingested transactions are folded into the taint table (core/taint.py) when it is enabled.
+#
+# The oracle-service's /transactions/:address has no cursor support and ignores `since` (it is sent for
+# backends that honour it): every sync of a stale address downloads and parses the address's full
+# history again. Records older than the cursor, or already stored at its timestamp, are dropped on
+# their raw timestamps, before any Transaction is built or written; the sync interval is what bounds
+# the download cost.
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import metrics
+from core.models import AddressCursor, Transaction
+from core.taint import update_taint
+from core.agents.transactions import TransactionBatch, TransactionWindow, to_epoch_seconds
+from core.agents.backend_client import stream_items, astream_items
+
+
+def _format_timestamp(value) -> str:
+    return value.isoformat().replace("+00:00", "Z")
+
+
+def _is_fresh(cursor, now) -> bool:
+    return bool(cursor.synced_at) and now - cursor.synced_at < timedelta(seconds=settings.AML_TRANSACTION_STORE_SYNC_INTERVAL)
+
+
+def _since_params(cursor):
+    return {"since": _format_timestamp(cursor.last_timestamp)} if cursor.last_timestamp else None
+
+
+def _transfer_key(tx_hash, sender, receiver, amount, denom) -> tuple:
+    # Fields of the unique_transaction_transfer constraint
+    return tx_hash, sender, receiver, str(amount), denom
+
+
+def _stored_at_cursor_query(address: str, cursor):
+    # Transfers stored in the cursor's second: several can share a timestamp, so the cursor second is
+    # read again and only the transfers it already holds are dropped
+    return (
+        Transaction.objects
+        .filter(Q(sender=address) | Q(receiver=address), timestamp__gte=cursor.last_timestamp.replace(microsecond=0))
+        .values_list("tx_hash", "sender", "receiver", "amount", "denom")
+    )
+
+
+def _stored_at_cursor(address: str, cursor) -> set:
+    if cursor.last_timestamp is None:
+        return set()
+    return {_transfer_key(*row) for row in _stored_at_cursor_query(address, cursor)}
+
+
+async def _astored_at_cursor(address: str, cursor) -> set:
+    if cursor.last_timestamp is None:
+        return set()
+    return {_transfer_key(*row) async for row in _stored_at_cursor_query(address, cursor)}
+
+
+def _new_transactions(cursor, records: list, stored: set) -> list:
+    if not records:
+        return []
+    seconds = to_epoch_seconds([tx["timestamp"] for tx in records]).tolist()
+    cutoff = int(cursor.last_timestamp.timestamp()) if cursor.last_timestamp else None
+    new_transactions = []
+    for tx, second in zip(records, seconds):
+        if cutoff is not None and second < cutoff:
+            continue
+        key = _transfer_key(tx.get("hash", ""), tx["sender"], tx["receiver"], tx["amount"], tx.get("denom") or "")
+        if cutoff is not None and second == cutoff and key in stored:
+            continue
+        new_transactions.append(Transaction(
+            tx_hash=key[0], sender=key[1], receiver=key[2], amount=key[3], denom=key[4], timestamp=parse_datetime(tx["timestamp"]),
+        ))
+    return new_transactions
+
+
+def _latest(latest, new_transactions):
+    for tx in new_transactions:
+        if latest is None or tx.timestamp > latest:
+            latest = tx.timestamp
+    return latest
+
+
+def _advance_cursor(cursor, latest, now):
+    # Only once the whole response is written: a sync that breaks off reads the same range again
+    if latest is not None and (cursor.last_timestamp is None or latest > cursor.last_timestamp):
+        cursor.last_timestamp = latest
+    cursor.synced_at = now
+
+
+def _ingest(cursor, records: list, stored: set) -> list:
+    new_transactions = _new_transactions(cursor, records, stored)
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="transaction"):
+        Transaction.objects.bulk_create(new_transactions, ignore_conflicts=True, batch_size=1000)
+    update_taint(new_transactions)
+    return new_transactions
+
+
+async def _aingest(cursor, records: list, stored: set) -> list:
+    new_transactions = _new_transactions(cursor, records, stored)
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="transaction"):
+        await Transaction.objects.abulk_create(new_transactions, ignore_conflicts=True, batch_size=1000)
+    await sync_to_async(update_taint)(new_transactions)
+    return new_transactions
+
+
+def sync_address(address: str, force: bool = False) -> int:
+    """
+    Ingests the address's transactions newer than its cursor and returns how many were new. The backend
+    sends the whole history every time (it ignores `since`), older records are dropped unparsed.
+    """
+    cursor, _ = AddressCursor.objects.get_or_create(address=address)
+    now = timezone.now()
+    metrics.cache_lookup("transaction_store", not force and _is_fresh(cursor, now))
+    if not force and _is_fresh(cursor, now):
+        return 0
+
+    stored = _stored_at_cursor(address, cursor)
+    received, latest, records = 0, None, []
+    for tx in stream_items(f"/transactions/{address}", "transactions", _since_params(cursor)):
+        records.append(tx)
+        if len(records) == settings.AML_FETCH_CHUNK_ROWS:
+            new_transactions = _ingest(cursor, records, stored)
+            received, latest, records = received + len(new_transactions), _latest(latest, new_transactions), []
+    if records:
+        new_transactions = _ingest(cursor, records, stored)
+        received, latest = received + len(new_transactions), _latest(latest, new_transactions)
+
+    _advance_cursor(cursor, latest, now)
+    cursor.save(update_fields=["last_timestamp", "synced_at"])
+    return received
+
+
+async def async_address(address: str, force: bool = False) -> int:
+    """
+    Async variant of sync_address using the async backend client and the async ORM.
+    """
+    cursor, _ = await AddressCursor.objects.aget_or_create(address=address)
+    now = timezone.now()
+    metrics.cache_lookup("transaction_store", not force and _is_fresh(cursor, now))
+    if not force and _is_fresh(cursor, now):
+        return 0
+
+    stored = await _astored_at_cursor(address, cursor)
+    received, latest, records = 0, None, []
+    async for tx in astream_items(f"/transactions/{address}", "transactions", _since_params(cursor)):
+        records.append(tx)
+        if len(records) == settings.AML_FETCH_CHUNK_ROWS:
+            new_transactions = await _aingest(cursor, records, stored)
+            received, latest, records = received + len(new_transactions), _latest(latest, new_transactions), []
+    if records:
+        new_transactions = await _aingest(cursor, records, stored)
+        received, latest = received + len(new_transactions), _latest(latest, new_transactions)
+
+    _advance_cursor(cursor, latest, now)
+    await cursor.asave(update_fields=["last_timestamp", "synced_at"])
+    return received
+
+
+RECORD_FIELDS = ("tx_hash", "sender", "receiver", "amount", "timestamp", "denom")
+
+
+def _records_query(address: str, window: TransactionWindow, as_dicts: bool = False):
+    query = Transaction.objects.filter(Q(sender=address) | Q(receiver=address))
+    if window.since is not None:
+        query = query.filter(timestamp__gte=datetime.fromtimestamp(window.since, tz=dt_timezone.utc))
+    if window.until is not None:
+        query = query.filter(timestamp__lt=datetime.fromtimestamp(window.until, tz=dt_timezone.utc))
+    query = query.order_by("timestamp", "id")
+    # aiterator() runs a values_list() query on the event loop thread (its iterable is not a generator), values() rows stream
+    query = query.values(*RECORD_FIELDS) if as_dicts else query.values_list(*RECORD_FIELDS)
+    return query[:window.max_rows] if window.max_rows is not None else query
+
+
+def _to_batch(rows: list) -> TransactionBatch:
+    if not rows:
+        return TransactionBatch.empty()
+    return TransactionBatch.from_columns(*zip(*rows))
+
+
+def iter_batches(address: str, window: TransactionWindow, chunk_rows: int):
+    """
+    Syncs the address and yields its stored transactions inside the window as typed chunks of
+    chunk_rows, oldest first, paging through the query instead of loading it whole.
+    """
+    sync_address(address)
+    rows = []
+    for row in _records_query(address, window).iterator(chunk_size=chunk_rows):
+        rows.append(row)
+        if len(rows) == chunk_rows:
+            yield _to_batch(rows)
+            rows = []
+    if rows:
+        yield _to_batch(rows)
+
+
+async def aiter_batches(address: str, window: TransactionWindow, chunk_rows: int):
+    await async_address(address)
+    rows = []
+    async for row in _records_query(address, window, as_dicts=True).aiterator(chunk_size=chunk_rows):
+        rows.append(tuple(row[field] for field in RECORD_FIELDS))
+        if len(rows) == chunk_rows:
+            yield _to_batch(rows)
+            rows = []
+    if rows:
+        yield _to_batch(rows)
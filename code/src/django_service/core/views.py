@@ -1,9 +1,23 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework import status
-from .models import AMLRequest
-from .serializers import AMLRequestSerializer
-from .workflow import invoke_agent
+from .models import AMLRequest, ScreeningJob
+from .serializers import AMLRequestSerializer, ScreeningJobSerializer
+from .workflow import PIPELINE_MODES, stream_agent, astream_agent, short_circuit, ashort_circuit
+from .agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
+from .result_cache import screen_wallet, ascreen_wallet, fingerprint, afingerprint, get_cached_result, aget_cached_result, cache_result
+from .jobs import enqueue, webhook_error, PRIORITIES
+from . import metrics
 
 
 @api_view(['GET'])
@@ -12,19 +26,271 @@ def compute_risk_score(request):
     wallet_address = request.query_params.get('wallet_address') or request.data.get('wallet_address')
     if not wallet_address:
         return Response({"error": "Wallet address is required."}, status=status.HTTP_400_BAD_REQUEST)
-    
 
+    mode = request.query_params.get('mode') or request.data.get('mode')
+    if mode and mode not in PIPELINE_MODES:
+        return Response({"error": f"Mode must be one of {', '.join(PIPELINE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
 
-    risk_score, failed_checks = invoke_agent(wallet_address)
+    risk_score, failed_checks, fields = screen_wallet(wallet_address, mode, TransactionSnapshot(), _is_refresh(request))
+    if fields is None:
+        # Served from the result cache, nothing new to persist
+        data = {'wallet_address': wallet_address, 'risk_score': risk_score, 'failed_checks': failed_checks}
+        return Response(data, status=status.HTTP_200_OK)
 
     # Ensure the saved risk_score is an integer and overwrite existing value
-    obj, created = AMLRequest.objects.update_or_create(
-        wallet_address=wallet_address,
-        defaults={'risk_score': int(risk_score)},
-    )
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"):
+        obj, created = AMLRequest.objects.update_or_create(
+            wallet_address=wallet_address,
+            mode=fields['mode'],
+            defaults=fields,
+        )
 
     serializer = AMLRequestSerializer(obj)
     data = serializer.data
     data['failed_checks'] = failed_checks
     return Response(data, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+
+
+async def compute_risk_score_async(request):
+    # Native async variant of compute_risk_score for ASGI: the screening awaits the async backend client,
+    # agent.ainvoke and the async ORM, so a single event loop serves many screenings waiting on I/O.
+    # DRF's @api_view is sync only, the query string is read directly.
+    if request.method != 'GET':
+        return JsonResponse({"error": f"Method \"{request.method}\" not allowed."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    wallet_address = request.GET.get('wallet_address')
+    if not wallet_address:
+        return JsonResponse({"error": "Wallet address is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.GET.get('mode')
+    if mode and mode not in PIPELINE_MODES:
+        return JsonResponse({"error": f"Mode must be one of {', '.join(PIPELINE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    refresh = str(request.GET.get('refresh')).lower() in ('1', 'true', 'yes')
+    risk_score, failed_checks, fields = await ascreen_wallet(wallet_address, mode, AsyncTransactionSnapshot(), refresh)
+    if fields is None:
+        data = {'wallet_address': wallet_address, 'risk_score': risk_score, 'failed_checks': failed_checks}
+        return JsonResponse(data, status=status.HTTP_200_OK)
+
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"):
+        obj, created = await AMLRequest.objects.aupdate_or_create(
+            wallet_address=wallet_address,
+            mode=fields['mode'],
+            defaults=fields,
+        )
+
+    data = AMLRequestSerializer(obj).data
+    data['failed_checks'] = failed_checks
+    return JsonResponse(data, status=status.HTTP_200_OK)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@require_GET
+def compute_risk_score_stream(request):
+    # Server-Sent Events variant of compute_risk_score: a "check" event is sent as soon as each check
+    # completes, then a "result" event with the final score (or an "error" event).
+    # A plain Django view, DRF content negotiation would reject EventSource's text/event-stream Accept header.
+    # Under ASGI the events come from an async generator, Django buffers a sync iterator there until it is exhausted.
+    wallet_address = request.GET.get('wallet_address')
+    if not wallet_address:
+        return JsonResponse({"error": "Wallet address is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.GET.get('mode')
+    if mode and mode not in PIPELINE_MODES:
+        return JsonResponse({"error": f"Mode must be one of {', '.join(PIPELINE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = mode or settings.AML_PIPELINE_MODE
+    refresh = str(request.GET.get('refresh')).lower() in ('1', 'true', 'yes')
+
+    def stream():
+        try:
+            snapshot = TransactionSnapshot()
+            # A directly flagged wallet is reported by stream_agent without fetching its transactions
+            wallet_fingerprint = ''
+            if short_circuit(wallet_address) is None:
+                wallet_fingerprint = fingerprint(wallet_address, snapshot)
+                cached = None if refresh else get_cached_result(wallet_address, mode, wallet_fingerprint)
+                if cached is not None:
+                    yield _sse("result", {"wallet_address": wallet_address, "risk_score": cached[0], "failed_checks": cached[1]})
+                    return
+
+            for event, data in stream_agent(wallet_address, mode, snapshot):
+                if event == "result":
+                    fields = cache_result(wallet_address, mode, wallet_fingerprint, data["risk_score"], data["failed_checks"])
+                    with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"):
+                        AMLRequest.objects.update_or_create(wallet_address=wallet_address, mode=mode, defaults=fields)
+                yield _sse(event, {"wallet_address": wallet_address, **data})
+        except Exception as e:
+            yield _sse("error", {"wallet_address": wallet_address, "error": str(e)})
+
+    async def astream():
+        try:
+            snapshot = AsyncTransactionSnapshot()
+            wallet_fingerprint = ''
+            if await ashort_circuit(wallet_address) is None:
+                wallet_fingerprint = await afingerprint(wallet_address, snapshot)
+                cached = None if refresh else await aget_cached_result(wallet_address, mode, wallet_fingerprint)
+                if cached is not None:
+                    yield _sse("result", {"wallet_address": wallet_address, "risk_score": cached[0], "failed_checks": cached[1]})
+                    return
+
+            async for event, data in astream_agent(wallet_address, mode, snapshot):
+                if event == "result":
+                    fields = cache_result(wallet_address, mode, wallet_fingerprint, data["risk_score"], data["failed_checks"])
+                    with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"):
+                        await AMLRequest.objects.aupdate_or_create(wallet_address=wallet_address, mode=mode, defaults=fields)
+                yield _sse(event, {"wallet_address": wallet_address, **data})
+        except Exception as e:
+            yield _sse("error", {"wallet_address": wallet_address, "error": str(e)})
+
+    events = astream() if isinstance(request, ASGIRequest) else stream()
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep reverse proxies from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _is_refresh(request) -> bool:
+    refresh = request.query_params.get('refresh') or request.data.get('refresh')
+    return str(refresh).lower() in ('1', 'true', 'yes')
+
+
+def _save_risk_scores(results: dict, mode: str):
+    # Bulk equivalent of update_or_create for every wallet screened in the mode: one upsert on (wallet_address, mode)
+    with metrics.span("db write", "aml_db_write_duration_seconds", table="amlrequest"), transaction.atomic():
+        AMLRequest.objects.bulk_create(
+            [AMLRequest(wallet_address=wallet_address, **fields) for wallet_address, fields in results.items()],
+            update_conflicts=True,
+            unique_fields=['wallet_address', 'mode'],
+            update_fields=['risk_score', 'fingerprint', 'failed_checks', 'computed_at'],
+            batch_size=1000,
+        )
+
+
+def _batch_line(wallet_address: str, future, results: dict) -> str:
+    try:
+        risk_score, failed_checks, fields = future.result()
+    except Exception as e:
+        return json.dumps({"wallet_address": wallet_address, "error": str(e)}) + "\n"
+    if fields is not None:
+        results[wallet_address] = fields
+    return json.dumps({"wallet_address": wallet_address, "risk_score": risk_score, "failed_checks": failed_checks}) + "\n"
+
+
+def _screen_batch(wallet_addresses: list, mode: str, refresh: bool):
+    # One NDJSON line per wallet as soon as its screening completes. Results are saved every AML_BATCH_SAVE_CHUNK
+    # wallets; when the generator is closed early (client gone) the remaining screenings finish and are saved.
+    # Transactions fetched for one wallet (and its hops) are reused by every other wallet in the batch
+    snapshot = TransactionSnapshot()
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(settings.AML_BATCH_MAX_WORKERS, len(wallet_addresses))) as executor:
+        futures = {
+            executor.submit(screen_wallet, wallet_address, mode, snapshot, refresh): wallet_address
+            for wallet_address in wallet_addresses
+        }
+        completed = as_completed(futures)
+        try:
+            for future in completed:
+                line = _batch_line(futures[future], future, results)
+                if len(results) >= settings.AML_BATCH_SAVE_CHUNK:
+                    _save_risk_scores(results, mode)
+                    results = {}
+                yield line
+        finally:
+            # Only left over when the client stopped reading
+            for future in completed:
+                _batch_line(futures[future], future, results)
+            if results:
+                _save_risk_scores(results, mode)
+
+
+async def _threaded_lines(lines):
+    # Drives a sync line generator on a worker thread and hands the lines to the event loop through an
+    # asyncio.Queue. The thread runs to completion even if the client disconnects.
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def produce():
+        try:
+            for line in lines:
+                loop.call_soon_threadsafe(queue.put_nowait, line)
+        finally:
+            lines.close()
+            connections.close_all()
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    threading.Thread(target=produce, name="batch-screening", daemon=True).start()
+    while (line := await queue.get()) is not None:
+        yield line
+
+
+@api_view(['POST'])
+def compute_risk_score_batch(request):
+    # Body: {"wallet_addresses": [...], "mode": "fast" | "agent", "refresh": bool}; responds with one NDJSON line per wallet
+    wallet_addresses = request.data.get('wallet_addresses')
+    if not isinstance(wallet_addresses, list) or not wallet_addresses or not all(isinstance(a, str) and a for a in wallet_addresses):
+        return Response({"error": "wallet_addresses must be a non-empty list of wallet addresses."}, status=status.HTTP_400_BAD_REQUEST)
+
+    wallet_addresses = list(dict.fromkeys(wallet_addresses))
+    if len(wallet_addresses) > settings.AML_BATCH_MAX_SIZE:
+        return Response({"error": f"At most {settings.AML_BATCH_MAX_SIZE} wallet addresses per batch."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.data.get('mode')
+    if mode and mode not in PIPELINE_MODES:
+        return Response({"error": f"Mode must be one of {', '.join(PIPELINE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = mode or settings.AML_PIPELINE_MODE
+    refresh = _is_refresh(request)
+
+    lines = _screen_batch(wallet_addresses, mode, refresh)
+    if isinstance(request._request, ASGIRequest):
+        # Django buffers a sync iterator under ASGI until it is exhausted
+        lines = _threaded_lines(lines)
+    return StreamingHttpResponse(lines, content_type='application/x-ndjson')
+
+
+@api_view(['POST'])
+def create_screening_job(request):
+    # Body: {"wallet_address": ..., "priority": "oracle" | "default" | "backfill", "mode": ..., "webhook_url": ...}
+    wallet_address = request.data.get('wallet_address')
+    if not wallet_address:
+        return Response({"error": "Wallet address is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+    priority = request.data.get('priority') or 'default'
+    if priority not in PRIORITIES:
+        return Response({"error": f"Priority must be one of {', '.join(PRIORITIES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    mode = request.data.get('mode')
+    if mode and mode not in PIPELINE_MODES:
+        return Response({"error": f"Mode must be one of {', '.join(PIPELINE_MODES)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+    webhook_url = request.data.get('webhook_url') or ''
+    if webhook_url:
+        error = webhook_error(webhook_url)
+        if error is not None:
+            return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = enqueue(wallet_address, priority=priority, mode=mode, webhook_url=webhook_url)
+    return Response(ScreeningJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(['GET'])
+def get_screening_job(request, job_id):
+    job = ScreeningJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ScreeningJobSerializer(job).data, status=status.HTTP_200_OK)
+
+
+@require_GET
+def metrics_view(request):
+    # Prometheus scrape endpoint (text exposition format)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,64 +1,354 @@
-from langgraph.prebuilt import create_react_agent
+# Entry points of a screening: the ReAct agent ("agent" mode) or the deterministic pipeline ("fast" mode).
+#
+# Importing this module is cheap: LangGraph, LangChain, the OpenAI client and the AML tools are imported,
+# and the chat model, checkpointer and agent built, on first use. warm_up() does all of it up front so
+# that a worker's first request does not pay for it; the WSGI / ASGI entry points call
+# warm_up_if_enabled(), which runs it on a background thread when AML_WARMUP is set (off by default),
+# management commands and tests never do.
+
 from dotenv import load_dotenv
+import asyncio
+import logging
 import os
-from pydantic import SecretStr
+import threading
+import uuid
+import weakref
+from contextlib import nullcontext
+
+from django.conf import settings
 
-from langchain_openai import ChatOpenAI
-from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import InMemorySaver
-from core.agents.tools.behaviour_check import check_structuring
-from core.agents.models.aml_state import AmlState
-from core.agents.tools.sanction_check import check_sanctions
-from core.agents.tools.risk_score_calculation import compute_risk_score
-from core.agents.tools.layering_check import check_layering
+from core.agents.scoring import normalize_findings
+from core.agents.tools.fetch_transactions import TransactionSnapshot, AsyncTransactionSnapshot
 
 
 load_dotenv()
-model = ChatOpenAI(
-    model="gpt-4o", 
-    temperature=0, 
-    api_key= SecretStr(os.getenv('OPENAI_API_KEY', ''))
-)
 
-checkpointer = InMemorySaver()
+logger = logging.getLogger(__name__)
+
+AGENT_PROMPT = "Analyze the wallet address for any money laundering behavior with the help of tools provided Do not call tools in parallel. You are getting the transaction details, mixers, sanctioned wallets. you have to perform layering analysis, behavior_check and sanction_check After all tool calls are done, call the risk_score tool to get the final risk score."
+
+_agent = None
+_agent_lock = threading.Lock()
+_checkpointer = None
+# Async checkpointer per event loop: AsyncSqliteSaver is bound to the loop it was built on
+_async_checkpointers = weakref.WeakKeyDictionary()
 
-agent = create_react_agent(
-    model= model,
-    tools= [check_structuring, check_sanctions, compute_risk_score],
-    checkpointer= checkpointer,
-    prompt= "Analyze the wallet address for any money laundering behavior with the help of tools provided Do not call tools in parallel. You are getting the transaction details, mixers, sanctioned wallets. you have to perform layering analysis, behavior_check and sanction_check After all tool calls are done, call the risk_score tool to get the final risk score.",
-    state_schema= AmlState
-)
 
-config = {"configurable": {"thread_id": "1"}}
+def _get_checkpointer():
+    global _checkpointer
+    if _checkpointer is None:
+        from core.checkpoint import build_checkpointer
+        _checkpointer = build_checkpointer()
+    return _checkpointer
 
 
-def invoke_agent(wallet_address: str):
-    response = agent.invoke(
-        {"wallet_address": wallet_address, "max_hops": 1, "risk_score": 0.0},
-        config=config
+def _get_async_checkpointer():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_checkpointers:
+        from core.checkpoint import build_async_checkpointer
+        _async_checkpointers[loop] = build_async_checkpointer()
+    return _async_checkpointers[loop]
+
+
+def build_agent(chat_model):
+    # The ReAct agent over the AML tools; the benchmarks build it with a scripted chat model
+    from langgraph.prebuilt import create_react_agent
+    from core import llm_metrics  # noqa: F401 (measures every run)
+    from core.agents.models.aml_state import AmlState
+    from core.agents.tools.behaviour_check import check_structuring
+    from core.agents.tools.layering_check import check_layering
+    from core.agents.tools.risk_score_calculation import compute_risk_score
+    from core.agents.tools.sanction_check import check_sanctions
+
+    return create_react_agent(
+        model= chat_model,
+        tools= [check_structuring, check_sanctions, check_layering, compute_risk_score],
+        checkpointer= _get_checkpointer(),
+        prompt= AGENT_PROMPT,
+        state_schema= AmlState
     )
 
-    # Extract risk score
-    raw_score = response.get('risk_score', 0)
-    try:
-        risk_score = int(float(raw_score))
-    except Exception:
-        risk_score = 0
 
-    # Collect failed checks from tool messages
-    failed_checks = []
-    tool_messages = response.get('messages', [])
-    for msg in tool_messages:
+def get_agent():
+    """
+    The process-wide ReAct agent over gpt-4o, built on first use.
+    """
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from langchain_openai import ChatOpenAI
+                from pydantic import SecretStr
+
+                _agent = build_agent(ChatOpenAI(
+                    model="gpt-4o",
+                    temperature=0,
+                    api_key= SecretStr(os.getenv('OPENAI_API_KEY', ''))
+                ))
+    return _agent
+
+
+def get_async_agent():
+    """
+    The agent of ainvoke / astream: get_agent() checkpointing through the async checkpointer when the
+    backend has one.
+    """
+    agent = get_agent()
+    checkpointer = _get_async_checkpointer()
+    return agent if checkpointer is None else agent.copy(update={"checkpointer": checkpointer})
+
+
+def _running(agent, config):
+    # The screening's checkpoint thread is not evicted while the agent runs
+    active = getattr(agent.checkpointer, "active", None)
+    return active(config["configurable"]["thread_id"]) if active else nullcontext()
+
+
+def set_agent(agent):
+    # Replaces the agent (benchmarks use a scripted chat model); None rebuilds the default on next use
+    global _agent
+    _agent = agent
+
+
+def warm_up():
+    """
+    Imports the screening stack, builds the agent, the fast pipeline and the scoring chain, and loads the watchlist.
+    """
+    import core.pipeline  # noqa: F401 (compiles the fast pipeline)
+    from core.agents.structuring import StructuringConfig
+    from core.agents.tools.risk_score_calculation import get_chain
+    from core.agents.watchlist import get_watchlist
+
+    get_agent()
+    get_chain()
+    StructuringConfig.from_settings()
+    # Last, it is the only step that needs the backend
+    get_watchlist().version
+
+
+def warm_up_if_enabled():
+    """
+    Starts warm_up() on a daemon thread when AML_WARMUP is set, so that the worker boots without waiting
+    for it: requests arriving meanwhile build what they need on first use. Returns the thread, or None.
+    """
+    if not settings.AML_WARMUP:
+        return None
+
+    def run():
+        try:
+            warm_up()
+        except Exception:
+            logger.exception("Warm-up failed, the screening stack is built on first use instead")
+
+    thread = threading.Thread(target=run, name="aml-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+PIPELINE_MODES = ("agent", "fast")
+
+
+def _is_failed_check(content) -> bool:
+    # A check fails when it reports a recognised finding other than a "*:clear" one; free text never does
+    return any(not label.startswith("text:") and not label.endswith(":clear") for label in normalize_findings([content]))
+
+
+def _collect_failed_checks(contents):
+    return [str(content) for content in contents if _is_failed_check(content)]
+
+
+def _validate_mode(mode: str) -> str:
+    mode = mode or settings.AML_PIPELINE_MODE
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{mode}', expected one of {PIPELINE_MODES}.")
+    return mode
+
+
+def _agent_input(wallet_address: str):
+    # Every screening gets its own conversation so history never leaks between wallets
+    config = {"configurable": {"thread_id": f"{wallet_address}:{uuid.uuid4().hex}"}}
+    return {"wallet_address": wallet_address, "max_hops": 1, "risk_score": 0.0}, config
+
+
+def _message_contents(messages):
+    contents = []
+    for msg in messages:
         if isinstance(msg, dict):
-            content = msg.get('content', '')
+            contents.append(msg.get('content', ''))
         else:
-            content = getattr(msg, 'content', '')
-        if 'detected' in content or 'detected for address' in content or 'cycles detected' in content:
-            failed_checks.append(content)
+            contents.append(getattr(msg, 'content', ''))
+    return contents
+
+
+def _risk_score(raw_score) -> int:
+    try:
+        return int(float(raw_score))
+    except Exception:
+        return 0
+
+
+def _summarize(response, mode: str):
+    if mode == "fast":
+        contents = list(response.get('analysis_results', []))
+    else:
+        # Collect failed checks from tool messages
+        contents = _message_contents(response.get('messages', []))
+
+    # Extract risk score
+    return _risk_score(response.get('risk_score', 0)), _collect_failed_checks(contents)
+
+
+def short_circuit(wallet_address: str):
+    """
+    (risk_score, failed_checks) of a wallet directly flagged with a finding of the short-circuit policy, or None.
+    """
+    # The ReAct loop cannot be stopped from inside a tool, so the policy's direct watchlist hits are
+    # checked before it starts; findings of later checks short-circuit the scoring step instead
+    from core.pipeline import short_circuit_result
+    response = short_circuit_result(wallet_address)
+    if response is None:
+        return None
+    return _summarize(response, "fast")
+
+
+async def ashort_circuit(wallet_address: str):
+    # Async variant of short_circuit, a watchlist that is not loaded yet is loaded off the event loop
+    from core.pipeline import ashort_circuit_result
+    response = await ashort_circuit_result(wallet_address)
+    if response is None:
+        return None
+    return _summarize(response, "fast")
 
-    return risk_score, failed_checks
- 
 
+def invoke_agent(wallet_address: str, mode: str = None, snapshot: TransactionSnapshot = None):
+    # "agent" runs the ReAct loop, "fast" runs the deterministic pipeline in core/pipeline.py.
+    # A snapshot shares fetched transactions between screenings (fast mode only).
+    mode = _validate_mode(mode)
+    if mode == "fast":
+        from core.pipeline import run_pipeline
+        response = run_pipeline(wallet_address, max_hops= 1, snapshot= snapshot)
+    else:
+        flagged = short_circuit(wallet_address)
+        if flagged is not None:
+            return flagged
+        agent, (agent_input, config) = get_agent(), _agent_input(wallet_address)
+        with _running(agent, config):
+            response = agent.invoke(agent_input, config=config)
+    return _summarize(response, mode)
 
 
+async def ainvoke_agent(wallet_address: str, mode: str = None, snapshot: AsyncTransactionSnapshot = None):
+    # Async variant of invoke_agent: agent.ainvoke runs the tools' native coroutines
+    mode = _validate_mode(mode)
+    if mode == "fast":
+        from core.pipeline import arun_pipeline
+        response = await arun_pipeline(wallet_address, max_hops= 1, snapshot= snapshot)
+    else:
+        flagged = await ashort_circuit(wallet_address)
+        if flagged is not None:
+            return flagged
+        agent, (agent_input, config) = get_async_agent(), _agent_input(wallet_address)
+        with _running(agent, config):
+            response = await agent.ainvoke(agent_input, config=config)
+    return _summarize(response, mode)
+
+
+def _check_results(node: str, update: dict):
+    # (check name, result) pairs carried by one node update of either graph
+    from langchain_core.messages import ToolMessage
+    from core.pipeline import CHECK_NODES
+
+    if node in CHECK_NODES:
+        return [(node, result) for result in update.get('analysis_results', [])]
+    if node == "screen_watchlist":
+        # The short-circuit watchlist screen reports a direct sanctions hit
+        return [("check_sanctions", result) for result in update.get('analysis_results', [])]
+    if node == "tools":
+        return [
+            (msg.name, msg.artifact or msg.content) for msg in update.get('messages', [])
+            if isinstance(msg, ToolMessage) and msg.name in CHECK_NODES
+        ]
+    return []
+
+
+def _chunk_events(chunk: dict, mode: str, contents: list, raw_score):
+    # The ("check", ...) events of one "updates" chunk of either graph. Collects the contents failed checks
+    # are read from and returns the events with the latest raw risk score.
+    events = []
+    for node, node_updates in chunk.items():
+        # A node whose tools return Commands reports one update per Command
+        for update in node_updates if isinstance(node_updates, list) else [node_updates]:
+            if not isinstance(update, dict):
+                continue
+            raw_score = update.get('risk_score', raw_score)
+            if mode == "agent":
+                contents.extend(_message_contents(update.get('messages', [])))
+            for check, result in _check_results(node, update):
+                if mode == "fast":
+                    contents.append(result)
+                message = result.get('message', '') if isinstance(result, dict) else result
+                events.append(("check", {"check": check, "result": message, "findings": list(normalize_findings([result]))}))
+    return events, raw_score
+
+
+def stream_agent(wallet_address: str, mode: str = None, snapshot: TransactionSnapshot = None):
+    """
+    Streaming variant of invoke_agent. Yields ("check", {"check", "result", "findings"}) as soon as each check
+    completes, then ("result", {"risk_score", "failed_checks"}) once the graph has finished. "findings" are the
+    normalized labels of core/agents/scoring.py, e.g. "direct:sanctioned" for a wallet on the sanctions list.
+    """
+    from core.pipeline import stream_pipeline, short_circuit_result
+
+    mode = _validate_mode(mode)
+    running = nullcontext()
+    response = short_circuit_result(wallet_address)
+    if response is not None:
+        # Reported like the fast pipeline's watchlist screen, before any transaction is fetched
+        mode = "fast"
+        updates = [{"screen_watchlist": response}]
+    elif mode == "fast":
+        updates = stream_pipeline(wallet_address, max_hops= 1, snapshot= snapshot)
+    else:
+        agent, (agent_input, config) = get_agent(), _agent_input(wallet_address)
+        running = _running(agent, config)
+        updates = agent.stream(agent_input, config=config, stream_mode="updates")
+
+    contents = []
+    raw_score = 0
+    with running:
+        for chunk in updates:
+            events, raw_score = _chunk_events(chunk, mode, contents, raw_score)
+            yield from events
+
+    yield "result", {"risk_score": _risk_score(raw_score), "failed_checks": _collect_failed_checks(contents)}
+
+
+async def astream_agent(wallet_address: str, mode: str = None, snapshot: AsyncTransactionSnapshot = None):
+    """
+    Async variant of stream_agent over pipeline.astream / agent.astream, the checks await the async backend client.
+    """
+    from core.pipeline import astream_pipeline, ashort_circuit_result
+
+    mode = _validate_mode(mode)
+    contents = []
+    raw_score = 0
+    response = await ashort_circuit_result(wallet_address)
+    if response is not None:
+        events, raw_score = _chunk_events({"screen_watchlist": response}, "fast", contents, raw_score)
+        for event in events:
+            yield event
+    else:
+        running = nullcontext()
+        if mode == "fast":
+            updates = astream_pipeline(wallet_address, max_hops= 1, snapshot= snapshot)
+        else:
+            agent, (agent_input, config) = get_async_agent(), _agent_input(wallet_address)
+            running = _running(agent, config)
+            updates = agent.astream(agent_input, config=config, stream_mode="updates")
+        with running:
+            async for chunk in updates:
+                events, raw_score = _chunk_events(chunk, mode, contents, raw_score)
+                for event in events:
+                    yield event
+
+    yield "result", {"risk_score": _risk_score(raw_score), "failed_checks": _collect_failed_checks(contents)}
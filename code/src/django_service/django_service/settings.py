@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -122,3 +123,163 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# AML screening
+# "agent" runs the ReAct LLM loop, "fast" runs the deterministic check pipeline (core/pipeline.py).
+# Can be overridden per request with the `mode` query parameter of /compute-risk/.
+
+AML_PIPELINE_MODE = os.getenv('AML_PIPELINE_MODE', 'agent')
+
+# Checkpointer of the ReAct agent: "memory" or "sqlite" (langgraph-checkpoint-sqlite; async entry points use its AsyncSqliteSaver).
+# Only the AML_CHECKPOINT_MAX_THREADS most recent screenings younger than AML_CHECKPOINT_TTL seconds, and running ones, are kept.
+
+AML_CHECKPOINT_BACKEND = os.getenv('AML_CHECKPOINT_BACKEND', 'memory')
+AML_CHECKPOINT_MAX_THREADS = int(os.getenv('AML_CHECKPOINT_MAX_THREADS', '256'))
+AML_CHECKPOINT_TTL = float(os.getenv('AML_CHECKPOINT_TTL', '900'))
+AML_CHECKPOINT_SQLITE_PATH = os.getenv('AML_CHECKPOINT_SQLITE_PATH', str(BASE_DIR / 'checkpoints.sqlite3'))
+
+# The agent, model clients and their imports are built on first use (core/workflow.py); with AML_WARMUP the
+# WSGI / ASGI entry points start building them on a background thread while the worker boots, so that the
+# first request is not slowed down (boot itself is not: warm-up never blocks it)
+
+AML_WARMUP = os.getenv('AML_WARMUP', 'false').lower() == 'true'
+
+# oracle-service backend (core/agents/backend_client.py)
+
+AML_BACKEND_URL = os.getenv('AML_BACKEND_URL', 'http://localhost:8080')
+AML_BACKEND_CONNECT_TIMEOUT = float(os.getenv('AML_BACKEND_CONNECT_TIMEOUT', '3'))
+AML_BACKEND_READ_TIMEOUT = float(os.getenv('AML_BACKEND_READ_TIMEOUT', '10'))
+AML_BACKEND_RETRIES = int(os.getenv('AML_BACKEND_RETRIES', '3'))
+AML_BACKEND_BACKOFF = float(os.getenv('AML_BACKEND_BACKOFF', '0.2'))
+AML_BACKEND_POOL_SIZE = int(os.getenv('AML_BACKEND_POOL_SIZE', '32'))
+AML_BACKEND_MAX_CONCURRENCY = int(os.getenv('AML_BACKEND_MAX_CONCURRENCY', '16'))
+
+# Transaction sets are read as a stream of typed chunks of AML_FETCH_CHUNK_ROWS rows (the backend response is
+# parsed incrementally, the store is paged); AML_FETCH_MAX_ROWS caps the rows read per address, 0 for no cap
+
+AML_FETCH_CHUNK_ROWS = int(os.getenv('AML_FETCH_CHUNK_ROWS', '5000'))
+AML_FETCH_MAX_ROWS = int(os.getenv('AML_FETCH_MAX_ROWS', '0'))
+
+# Sanctions / mixer / darknet lists are cached per process and refreshed in the background
+# once older than AML_WATCHLIST_TTL seconds (core/agents/watchlist.py)
+
+AML_WATCHLIST_TTL = float(os.getenv('AML_WATCHLIST_TTL', '300'))
+
+# With AML_WATCHLIST_SNAPSHOT_PATH the worker processes instead share one read-only mapped snapshot of the
+# lists, written by `manage.py build_watchlist_snapshot --watch` and checked for a new version every
+# AML_WATCHLIST_SNAPSHOT_CHECK_INTERVAL seconds (core/agents/watchlist_snapshot.py)
+
+AML_WATCHLIST_SNAPSHOT_PATH = os.getenv('AML_WATCHLIST_SNAPSHOT_PATH', '')
+AML_WATCHLIST_SNAPSHOT_CHECK_INTERVAL = float(os.getenv('AML_WATCHLIST_SNAPSHOT_CHECK_INTERVAL', '5'))
+
+# POST /compute-risk/batch/
+
+AML_BATCH_MAX_SIZE = int(os.getenv('AML_BATCH_MAX_SIZE', '500'))
+AML_BATCH_MAX_WORKERS = int(os.getenv('AML_BATCH_MAX_WORKERS', '8'))
+# Screened results are written every AML_BATCH_SAVE_CHUNK wallets instead of once the whole batch is done
+AML_BATCH_SAVE_CHUNK = int(os.getenv('AML_BATCH_SAVE_CHUNK', '50'))
+
+# Risk score result cache (core/result_cache.py): results are reused for AML_RESULT_CACHE_MAX_AGE
+# seconds while the wallet's transactions and the watchlists are unchanged; pass refresh=true to bypass
+
+AML_RESULT_CACHE_MAX_AGE = float(os.getenv('AML_RESULT_CACHE_MAX_AGE', '3600'))
+AML_RESULT_CACHE_SIZE = int(os.getenv('AML_RESULT_CACHE_SIZE', '10000'))
+
+# Structuring: transactions below AML_STRUCTURING_TRANSACTION_LIMIT from one sender whose sum within
+# AML_STRUCTURING_WINDOW (pandas offset, e.g. "24h") exceeds AML_STRUCTURING_THRESHOLD
+
+AML_STRUCTURING_TRANSACTION_LIMIT = float(os.getenv('AML_STRUCTURING_TRANSACTION_LIMIT', '10000'))
+AML_STRUCTURING_THRESHOLD = float(os.getenv('AML_STRUCTURING_THRESHOLD', '10000'))
+AML_STRUCTURING_WINDOW = os.getenv('AML_STRUCTURING_WINDOW', '24h')
+
+# Online structuring detector (core/structuring_monitor.py): `manage.py monitor_structuring --follow` keeps
+# per-sender windows up to date; with AML_STRUCTURING_MONITOR, check_structuring reads their flags and only
+# replays newer transactions. The monitor reads AML_STRUCTURING_MONITOR_BATCH_SIZE transactions at a time and
+# polls every AML_STRUCTURING_MONITOR_INTERVAL seconds once it has caught up. It reads the store up to the rows
+# ingested AML_STRUCTURING_MONITOR_LAG seconds ago, longer than any ingestion transaction stays open
+
+AML_STRUCTURING_MONITOR = os.getenv('AML_STRUCTURING_MONITOR', 'false').lower() == 'true'
+AML_STRUCTURING_MONITOR_BATCH_SIZE = int(os.getenv('AML_STRUCTURING_MONITOR_BATCH_SIZE', '1000'))
+AML_STRUCTURING_MONITOR_INTERVAL = float(os.getenv('AML_STRUCTURING_MONITOR_INTERVAL', '5'))
+AML_STRUCTURING_MONITOR_LAG = float(os.getenv('AML_STRUCTURING_MONITOR_LAG', '30'))
+
+# Layering cycle search (core/agents/layering.py)
+
+AML_LAYERING_TIME_RESPECTING = os.getenv('AML_LAYERING_TIME_RESPECTING', 'true').lower() == 'true'
+AML_LAYERING_PRUNE_TO_RAPID_WINDOW = os.getenv('AML_LAYERING_PRUNE_TO_RAPID_WINDOW', 'false').lower() == 'true'
+AML_LAYERING_MAX_NODES = int(os.getenv('AML_LAYERING_MAX_NODES', '500'))
+AML_LAYERING_MAX_EDGES = int(os.getenv('AML_LAYERING_MAX_EDGES', '20000'))
+
+# Multi-hop sanctions exposure: addresses with more than AML_SANCTIONS_HUB_DEGREE transactions are
+# screened but not expanded, each hop follows at most AML_SANCTIONS_MAX_FRONTIER counterparties and
+# AML_KNOWN_HUBS (comma separated, e.g. exchange hot wallets) are never expanded
+
+AML_SANCTIONS_MAX_FRONTIER = int(os.getenv('AML_SANCTIONS_MAX_FRONTIER', '200'))
+AML_SANCTIONS_HUB_DEGREE = int(os.getenv('AML_SANCTIONS_HUB_DEGREE', '1000'))
+AML_KNOWN_HUBS = [address for address in os.getenv('AML_KNOWN_HUBS', '').split(',') if address]
+
+# Local transaction store (core/transaction_store.py): tools read transactions from the database and
+# only ask the backend for newer ones once an address is older than AML_TRANSACTION_STORE_SYNC_INTERVAL seconds.
+# Off by default: enabling it moves every tool's reads onto the database
+
+AML_TRANSACTION_STORE = os.getenv('AML_TRANSACTION_STORE', 'false').lower() == 'true'
+AML_TRANSACTION_STORE_SYNC_INTERVAL = float(os.getenv('AML_TRANSACTION_STORE_SYNC_INTERVAL', '60'))
+
+# Risk scoring (core/agents/scoring.py): the rule scorer answers when every finding has a weight (heaviest
+# weight + AML_SCORING_COMBINATION_BONUS per extra finding, exposure weights drop by AML_SCORING_HOP_DECAY
+# per hop), otherwise the LLM is asked; LLM scores are cached per normalized findings set
+
+AML_SCORING_RULES_ENABLED = os.getenv('AML_SCORING_RULES_ENABLED', 'true').lower() == 'true'
+AML_SCORING_CACHE_SIZE = int(os.getenv('AML_SCORING_CACHE_SIZE', '4096'))
+AML_SCORING_COMBINATION_BONUS = 1
+AML_SCORING_HOP_DECAY = 1
+AML_SCORING_WEIGHTS = {
+    'direct:sanctioned': 10,
+    'direct:mixer': 10,
+    'direct:darknet': 10,
+    'exposure:sanctioned': 8,
+    'exposure:darknet': 7,
+    'exposure:mixer': 6,
+    'exposure': 6,
+    'layering:rapid': 8,
+    'layering:cyclic': 4,
+    'layering:cycles': 5,
+    'structuring': 6,
+    'sanctions:clear': 0,
+    'structuring:clear': 0,
+    'layering:clear': 0,
+}
+
+# Short-circuit policy: a screening with any of these findings (labels of core/agents/scoring.py, comma
+# separated) ends with AML_SHORT_CIRCUIT_SCORE without further checks or LLM scoring. Direct watchlist
+# hits are checked with one lookup before any transaction is fetched.
+
+AML_SHORT_CIRCUIT_FINDINGS = [label for label in os.getenv('AML_SHORT_CIRCUIT_FINDINGS', 'direct:sanctioned,layering:rapid').split(',') if label]
+AML_SHORT_CIRCUIT_SCORE = int(os.getenv('AML_SHORT_CIRCUIT_SCORE', '10'))
+
+# Taint table (core/taint.py): with AML_TAINT_TABLE, check_sanctions answers max_hops up to the hop
+# limit the table was built with (AML_TAINT_MAX_HOPS unless --max-hops is given) with one lookup in the
+# table that `manage.py propagate_taint` builds from the local transaction store (rebuilt whenever the watchlist changes, checked every AML_TAINT_REFRESH_INTERVAL seconds)
+# after syncing the listed entities and their neighbourhood up to the hop limit into the store
+
+AML_TAINT_TABLE = os.getenv('AML_TAINT_TABLE', 'false').lower() == 'true'
+AML_TAINT_MAX_HOPS = int(os.getenv('AML_TAINT_MAX_HOPS', '3'))
+AML_TAINT_REFRESH_INTERVAL = float(os.getenv('AML_TAINT_REFRESH_INTERVAL', '300'))
+
+# Asynchronous screening jobs (core/jobs.py, `manage.py run_screening_workers`)
+
+AML_JOBS_WORKERS = int(os.getenv('AML_JOBS_WORKERS', '4'))
+AML_JOBS_POLL_INTERVAL = float(os.getenv('AML_JOBS_POLL_INTERVAL', '0.5'))
+AML_JOBS_RUNNING_TIMEOUT = float(os.getenv('AML_JOBS_RUNNING_TIMEOUT', '600'))
+AML_JOBS_WEBHOOK_TIMEOUT = float(os.getenv('AML_JOBS_WEBHOOK_TIMEOUT', '5'))
+# Jobs left running longer than AML_JOBS_RUNNING_TIMEOUT are requeued, checked every AML_JOBS_REQUEUE_INTERVAL seconds
+AML_JOBS_REQUEUE_INTERVAL = float(os.getenv('AML_JOBS_REQUEUE_INTERVAL', '60'))
+# Hosts webhooks may be delivered to (comma separated, ".example.com" allows subdomains); no webhooks when empty
+AML_JOBS_WEBHOOK_ALLOWED_HOSTS = [host.strip() for host in os.getenv('AML_JOBS_WEBHOOK_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+# Metrics (core/metrics.py) exposed in the Prometheus text format on /metrics/; with AML_OTEL_ENABLED
+# every span is also exported through OpenTelemetry (needs the optional requirements-otel.txt and a configured SDK)
+
+AML_METRICS_ENABLED = os.getenv('AML_METRICS_ENABLED', 'true').lower() == 'true'
+AML_OTEL_ENABLED = os.getenv('AML_OTEL_ENABLED', 'false').lower() == 'true'
@@ -17,9 +17,15 @@ Including another URLconf
 
 
 from django.urls import path
-from core.views import compute_risk_score
+from core.views import compute_risk_score, compute_risk_score_async, compute_risk_score_stream, compute_risk_score_batch, create_screening_job, get_screening_job, metrics_view
 
 
 urlpatterns = [
-    path('compute-risk/', compute_risk_score, name='compute-risk')
+    path('compute-risk/', compute_risk_score, name='compute-risk'),
+    path('compute-risk/async/', compute_risk_score_async, name='compute-risk-async'),
+    path('compute-risk/stream/', compute_risk_score_stream, name='compute-risk-stream'),
+    path('compute-risk/batch/', compute_risk_score_batch, name='compute-risk-batch'),
+    path('compute-risk/jobs/', create_screening_job, name='compute-risk-jobs'),
+    path('compute-risk/jobs/<uuid:job_id>/', get_screening_job, name='compute-risk-job'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
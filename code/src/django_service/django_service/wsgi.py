@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'django_service.settings')
 
 application = get_wsgi_application()
+
+
+from core.workflow import warm_up_if_enabled  # noqa: E402 (needs the configured settings)
+
+warm_up_if_enabled()